@@ -1,38 +1,139 @@
 import json
-import boto3
 import os
-import uuid
-import pdfkit
-import requests
-from jinja2 import Environment, FileSystemLoader
-from botocore.config import Config
-
-# 初始化 S3 客戶端
-s3_client = boto3.client(
-    's3', 
-    region_name='ap-northeast-1',
-    aws_access_key_id=os.environ.get('MY_AWS_ACCESS_KEY'),
-    aws_secret_access_key=os.environ.get('MY_AWS_SECRET_KEY'),
-    config=Config(s3={'addressing_style': 'virtual'}) # 強制虛擬託管樣式
-)
+import hashlib
+import http_client
+import metrics
+import renderers
+from lazy_init import Lazy
+
+# 初始化 S3 客戶端 (第一次上傳才建立；boto3、pdfkit、jinja2 都延到真的要產 PDF 才 import)
+def _create_s3_client():
+    import boto3
+    from botocore.config import Config
+    return boto3.client(
+        's3', 
+        region_name='ap-northeast-1',
+        aws_access_key_id=os.environ.get('MY_AWS_ACCESS_KEY'),
+        aws_secret_access_key=os.environ.get('MY_AWS_SECRET_KEY'),
+        config=Config(s3={'addressing_style': 'virtual'}) # 強制虛擬託管樣式
+    )
+
+s3_client = Lazy(_create_s3_client)
 
 # S3 Access Point Alias
 S3_AP_ALIAS = os.environ.get('S3_AP_ALIAS', 'travel-helper-s3-ap-iz8sxtni358ka78i843d4y4uy9uzkapn1a-s3alias')
 
+# 轉檔後端：wkhtmltopdf (每次啟動一個行程) 或 weasyprint (行程內排版，暖機容器重複使用)
+PDF_RENDERER = os.environ.get('PDF_RENDERER', 'wkhtmltopdf')
+# Layer 內的 wkhtmltopdf 與 template.html 的 @font-face 字型
+WKHTMLTOPDF_PATH = os.environ.get('WKHTMLTOPDF_PATH', '/opt/bin/wkhtmltopdf')
+PDF_FONT_PATH = os.environ.get('PDF_FONT_PATH', '/opt/python/NotoSansTC-Regular.ttf')
+# Jinja 編譯好的模板 bytecode 放在 /tmp，同一個容器重建 Environment 時不必重新編譯
+JINJA_CACHE_DIR = os.environ.get('JINJA_CACHE_DIR', '/tmp/jinja2')
 
-def lambda_handler(event, context):
-    print(f"DEBUG - Agent Call: {json.dumps(event)}")
-    
-    # --- 診斷區塊：檢查環境 ---
-    bin_path = '/opt/bin/wkhtmltopdf'
-    font_path = '/opt/python/lib/python3.12/site-packages/NotoSansTC-Regular.ttf'
-    
+# 改了 template.html 就把版本調高，舊的快取 PDF 自然不會再被用到
+PDF_TEMPLATE_VERSION = os.environ.get('PDF_TEMPLATE_VERSION', '2')
+
+
+def render_context(data):
+    """template.html 用到的欄位；同樣的內容一定產出同樣的 PDF"""
+    return {
+        "title": data.get('title', '旅遊行程'),
+        "style": data.get('style', ''),
+        "days": data.get('days', []),
+        "transportation": data.get('transportation', ''),
+        "budget_info": data.get('budget_info', ''),    # ✨ 關鍵：補上這一行
+        "reminders": data.get('reminders', '')
+    }
+
+
+def itinerary_key(render_ctx):
+    """以內容為 key：排序欄位後的 JSON + 模板版本取 sha256，同一份行程重複要 PDF 時直接沿用"""
+    canonical = json.dumps(render_ctx, ensure_ascii=False, sort_keys=True, separators=(',', ':'))
+    # 不同後端的排版結果不完全相同，各自快取 (預設的 wkhtmltopdf 沿用原本的 key)
+    version = PDF_TEMPLATE_VERSION if PDF_RENDERER == 'wkhtmltopdf' else f"{PDF_TEMPLATE_VERSION}-{PDF_RENDERER}"
+    digest = hashlib.sha256(f"{version}\n{canonical}".encode('utf-8')).hexdigest()
+    return f"itineraries/{digest[:32]}.pdf"
+
+
+def pdf_exists(file_key):
+    try:
+        with metrics.timer("s3.head"):
+            s3_client().head_object(Bucket=S3_AP_ALIAS, Key=file_key)
+        return True
+    except Exception as e:
+        # 404 就是還沒產生過；其他錯誤也當作沒有，重新產生一份
+        if getattr(e, 'response', {}).get('Error', {}).get('Code') not in ('404', 'NoSuchKey', 'NotFound'):
+            print(f"PDF 快取檢查失敗: {str(e)}")
+        return False
+
+
+def load_template():
+    # 3. 使用 Jinja2 讀取外部 HTML 模板 (template.html 放在 Lambda 根目錄)
+    from jinja2 import Environment, FileSystemLoader, FileSystemBytecodeCache
+    os.makedirs(JINJA_CACHE_DIR, exist_ok=True)
+    env = Environment(
+        loader=FileSystemLoader(os.path.dirname(os.path.abspath(__file__))),
+        bytecode_cache=FileSystemBytecodeCache(JINJA_CACHE_DIR),
+        auto_reload=False  # 部署後模板不會變，不必每次檢查檔案時間
+    )
+    env.globals['font_path'] = PDF_FONT_PATH
+    return env.get_template('template.html')
+
+
+def _create_renderer():
+    """模板與轉檔後端：每個容器只準備一次 (jinja2 與後端套件也在這裡才 import)"""
+    # --- 診斷區塊：檢查環境 (只在容器第一次產 PDF 時檢查) ---
     check_results = {
-        "wkhtmltopdf_exists": os.path.exists(bin_path),
-        "font_exists": os.path.exists(font_path),
+        "renderer": PDF_RENDERER,
+        "wkhtmltopdf_exists": os.path.exists(WKHTMLTOPDF_PATH),
+        "font_exists": os.path.exists(PDF_FONT_PATH),
         "python_path": os.environ.get('PYTHONPATH')
     }
     print(f"環境檢查: {json.dumps(check_results)}")
+    if not check_results["font_exists"]:
+        print(f"找不到字型 {PDF_FONT_PATH}，中文會改用系統字型")
+
+    template_dir = os.path.dirname(os.path.abspath(__file__))
+    return {
+        "template": load_template(),
+        "backend": renderers.build_renderer(
+            PDF_RENDERER, WKHTMLTOPDF_PATH, template_dir + os.sep,
+            PDF_FONT_PATH if check_results["font_exists"] else None
+        )
+    }
+
+renderer = Lazy(_create_renderer)
+
+
+def render_and_upload(render_ctx, file_key):
+    r = renderer()
+    with metrics.timer("jinja.render"):
+        html_out = r["template"].render(**render_ctx)
+    remote = renderers.find_remote_urls(html_out)
+    if remote:
+        # 行程內容夾帶的 <img src="http..."> 之類：轉檔會去連網，記錄下來方便追查
+        metrics.count("pdf.remote_refs", len(remote))
+        print(f"HTML 引用了遠端資源: {remote[:5]}")
+
+    # 4. HTML 轉 PDF (wkhtmltopdf 或 weasyprint，見 renderers.py)
+    backend = r["backend"]
+    with metrics.timer(f"{backend.name}.render"):
+        pdf_output = backend.render(html_out)
+
+    # 5. 上傳 S3
+    with metrics.timer("s3.upload"):
+        s3_client().put_object(
+            Bucket=S3_AP_ALIAS,
+            Key=file_key,
+            Body=pdf_output,
+            ContentType='application/pdf'
+        )
+
+
+@metrics.instrument("pdf")
+def lambda_handler(event, context):
+    print(f"DEBUG - Agent Call: {json.dumps(event)}")
 
     try:
         # 1. 提取參數
@@ -47,56 +148,23 @@ def lambda_handler(event, context):
         end_index = itinerary_raw.rfind('}') + 1
         data = json.loads(itinerary_raw[start_index:end_index], strict=False)
 
-        # 3. 使用 Jinja2 讀取外部 HTML 模板
-        # 假設 template.html 放在 Lambda 根目錄
-        env = Environment(loader=FileSystemLoader(os.path.dirname(__file__)))
-        template = env.get_template('template.html')
-
-        config = pdfkit.configuration(wkhtmltopdf='/opt/bin/wkhtmltopdf')
-        options = {
-            'encoding': "UTF-8",
-            'enable-local-file-access': None,
-            'javascript-delay': '2000',       # ✨ 加上這個確保 Icon 抓取更穩定
-            'no-stop-slow-scripts': None,
-            'quiet': ''
-        }
-        
-        html_out = template.render(
-            title=data.get('title', '旅遊行程'),
-            style=data.get('style', ''),
-            days=data.get('days', []),
-            transportation=data.get('transportation', ''),
-            budget_info=data.get('budget_info', ''),    # ✨ 關鍵：補上這一行
-            reminders=data.get('reminders', '')
-        )
-
-        # 4. HTML 轉 PDF (使用 wkhtmltopdf Layer)
-        # 注意：wkhtmltopdf 的執行檔路徑需與您的 Layer 一致
-        config = pdfkit.configuration(wkhtmltopdf='/opt/bin/wkhtmltopdf')
-        options = {
-            'encoding': "UTF-8",
-            'enable-local-file-access': None,
-            'quiet': ''
-        }
-        pdf_output = pdfkit.from_string(html_out, False, configuration=config, options=options)
-
-        
-        # 5. 上傳 S3
-        file_key = f"itineraries/{str(uuid.uuid4())[:12]}.pdf"
-        s3_client.put_object(
-            Bucket=S3_AP_ALIAS,
-            Key=file_key, 
-            Body=pdf_output, 
-            ContentType='application/pdf'
-        )
+        render_ctx = render_context(data)
+        file_key = itinerary_key(render_ctx)
 
+        if pdf_exists(file_key):
+            # 同一份行程已經產生過：不重新轉檔、上傳，只重新簽一個下載網址
+            metrics.count("pdf_cache.hit")
+        else:
+            metrics.count("pdf_cache.miss")
+            render_and_upload(render_ctx, file_key)
 
         # 6. 生成 URL (使用 Access Point 隱藏原始 Bucket)
-        url = s3_client.generate_presigned_url('get_object', Params={'Bucket': S3_AP_ALIAS, 'Key': file_key}, ExpiresIn=3600)
+        with metrics.timer("s3.presign"):
+            url = s3_client().generate_presigned_url('get_object', Params={'Bucket': S3_AP_ALIAS, 'Key': file_key}, ExpiresIn=3600)
 
         # --- ✨ 新增：封面照片 URL (assets 部分) ---
         # 您已經手動在 S3 建立 assets 資料夾並放了 cover.jpg
-        image_url = s3_client.generate_presigned_url(
+        image_url = s3_client().generate_presigned_url(
             'get_object',
              Params={
                 'Bucket': S3_AP_ALIAS,
@@ -140,7 +208,6 @@ def send_line_button(user_id, file_url, title, image_url):
     api_url = "https://api.line.me/v2/bot/message/push"
     
     headers = {
-        "Content-Type": "application/json",
         "Authorization": f"Bearer {LINE_ACCESS_TOKEN}"
     }
     
@@ -172,9 +239,11 @@ def send_line_button(user_id, file_url, title, image_url):
     }
 
     try:
-        response = requests.post(api_url, headers=headers, json=payload)
-        print(f"LINE API Status: {response.status_code}, Response: {response.text}")
-        return response.status_code
+        # 共用連線池 (Layer)，並帶明確的 timeout
+        with metrics.timer("line.push"):
+            response = http_client.post_json(api_url, payload, headers=headers, timeout=10)
+        print(f"LINE API Status: {response.status}, Response: {response.text}")
+        return response.status
     except Exception as e:
         print(f"LINE API Request Error: {str(e)}")
         return 500
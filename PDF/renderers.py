@@ -0,0 +1,85 @@
+"""HTML → PDF 的轉檔後端 (PDF_RENDERER 選擇)
+
+- wkhtmltopdf：原本的做法，透過 pdfkit 每次啟動一個 wkhtmltopdf 行程 (需要 wkhtmltopdf Layer)
+- weasyprint ：在 Lambda 行程內排版，字型設定與載入過的字型在暖機容器內重複使用，
+               不必每次付行程啟動的成本 (需要含 pango 的 WeasyPrint Layer)
+
+每個後端提供 name 與 render(html) → PDF bytes；建立時檢查所需的檔案，之後在容器內沿用同一個物件。
+"""
+import os
+import re
+
+# wkhtmltopdf 參數 (全部呼叫共用這一份)
+WKHTMLTOPDF_OPTIONS = {
+    'encoding': "UTF-8",               # 模板是 UTF-8 中文
+    'enable-local-file-access': None,  # 允許讀取 Layer 內的字型檔
+    'quiet': ''                        # 不輸出轉檔進度，避免塞滿 CloudWatch
+}
+
+# WeasyPrint 的預設頁邊距比 wkhtmltopdf 大；對齊 wkhtmltopdf 的 A4 + 10mm，版面才會一致
+WEASYPRINT_PAGE_CSS = "@page { size: A4; margin: 10mm; }"
+
+
+# HTML 內會讓轉檔引擎去連網的寫法：src / href 屬性、CSS 的 url() 與 @import
+_REMOTE_REF = re.compile(
+    r"""(?:\b(?:src|href)\s*=\s*["']?|url\(\s*["']?|@import\s+["']?)((?:https?:)?//[^"')\s>]+)""",
+    re.IGNORECASE
+)
+
+
+def find_remote_urls(html):
+    """回傳 HTML 內引用的遠端網址 (內文裡的網址文字不算)"""
+    return _REMOTE_REF.findall(html)
+
+
+class WkhtmltopdfRenderer:
+    name = "wkhtmltopdf"
+
+    def __init__(self, binary_path, options=None):
+        import pdfkit
+        if not os.path.exists(binary_path):
+            raise Exception(f"找不到 wkhtmltopdf：{binary_path}")
+        self._pdfkit = pdfkit
+        self.config = pdfkit.configuration(wkhtmltopdf=binary_path)
+        self.options = options or WKHTMLTOPDF_OPTIONS
+
+    def render(self, html):
+        return self._pdfkit.from_string(html, False, configuration=self.config, options=self.options)
+
+
+class WeasyPrintRenderer:
+    name = "weasyprint"
+
+    def __init__(self, base_url, font_path=None):
+        from weasyprint import HTML, CSS, default_url_fetcher
+        from weasyprint.text.fonts import FontConfiguration
+        self._html = HTML
+        self._default_fetcher = default_url_fetcher
+        self.base_url = base_url
+        # 字型設定跨呼叫共用：@font-face 載入過的字型不用每次重新解析
+        self.font_config = FontConfiguration()
+        self.stylesheets = [CSS(string=WEASYPRINT_PAGE_CSS, font_config=self.font_config)]
+        if font_path:
+            # 先排版一次，讓字型與排版引擎在初始化時就載入，第一個使用者不用等
+            self.render(
+                f"<style>@font-face {{ font-family: 'NotoSansTC'; src: url('{font_path}'); }}</style>"
+                "<p style=\"font-family: 'NotoSansTC'\">行程</p>"
+            )
+
+    def _local_only(self, url, *args, **kwargs):
+        # 只讀本機檔案與 data URI；遠端資源直接略過，不讓轉檔等網路
+        if not url.startswith(("file:", "data:")):
+            raise ValueError(f"不載入遠端資源：{url}")
+        return self._default_fetcher(url, *args, **kwargs)
+
+    def render(self, html):
+        document = self._html(string=html, base_url=self.base_url, url_fetcher=self._local_only)
+        return document.write_pdf(stylesheets=self.stylesheets, font_config=self.font_config)
+
+
+def build_renderer(name, wkhtmltopdf_path, base_url, font_path=None):
+    if name == WkhtmltopdfRenderer.name:
+        return WkhtmltopdfRenderer(wkhtmltopdf_path)
+    if name == WeasyPrintRenderer.name:
+        return WeasyPrintRenderer(base_url, font_path)
+    raise Exception(f"不支援的 PDF_RENDERER：{name} (可用 wkhtmltopdf、weasyprint)")
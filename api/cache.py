@@ -0,0 +1,105 @@
+import os
+import hashlib
+import logging
+import unicodedata
+import urllib.parse
+
+# TTLCache / DynamoCacheTier 放在 Layer，linebot 的回答快取也共用
+from ttl_cache import TTLCache, DynamoCacheTier
+
+logger = logging.getLogger()
+
+# --- 各端點的快取秒數 (依 URL 片段比對，先比對到先用) ---
+ENDPOINT_TTLS = [
+    ("maps/api/geocode", 30 * 24 * 3600),      # 地標座標幾乎不變
+    ("maps/api/place/details", 5 * 60),        # 回覆含「營業中 / 已打烊」，要夠即時
+    ("maps/api/place/textsearch", 6 * 3600),
+    ("maps/api/directions", 10 * 60),          # 路況會變，短一點
+    ("maps/api/distancematrix", 10 * 60),
+    ("openweathermap.org", 10 * 60),
+    ("tripadvisor.com/api/v1/location/search", 24 * 3600),
+    ("tripadvisor.com/api/v1/location", 24 * 3600),
+]
+DEFAULT_TTL = 10 * 60
+
+# 這些參數是金鑰，不能進快取 Key
+SECRET_PARAMS = {"key", "appid", "api_key"}
+
+
+def endpoint_ttl(url):
+    for fragment, ttl in ENDPOINT_TTLS:
+        if fragment in url:
+            return ttl
+    return DEFAULT_TTL
+
+
+def normalize_text(value):
+    # 全形/半形統一、去頭尾空白、連續空白縮成一個 (不轉小寫，place_id 有分大小寫)
+    text = unicodedata.normalize("NFKC", str(value))
+    return " ".join(text.split())
+
+
+def make_key(url, params):
+    """用「端點 + 排序後的參數 (去掉金鑰)」產生快取 Key"""
+    clean = sorted(
+        (k, normalize_text(v)) for k, v in (params or {}).items()
+        if k not in SECRET_PARAMS and v is not None
+    )
+    raw = f"{url}?{urllib.parse.urlencode(clean)}"
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """API 回應快取：先查程序內 LRU，再查 (可選的) 共用第二層"""
+
+    def __init__(self, maxsize=1024, shared=None):
+        self.local = TTLCache(maxsize)
+        self.shared = shared
+        self.shared_hits = 0
+        self.shared_errors = 0
+
+    def get(self, url, params):
+        key = make_key(url, params)
+        value = self.local.get(key)
+        if value is not None or self.shared is None:
+            return value
+        try:
+            value = self.shared.get(key)
+        except Exception as e:
+            # 第二層壞掉就當作沒命中，不能讓快取拖垮查詢
+            self.shared_errors += 1
+            logger.warning(f"Shared cache get error: {str(e)}")
+            return None
+        if value is not None:
+            self.shared_hits += 1
+            self.local.set(key, value, endpoint_ttl(url))
+        return value
+
+    def set(self, url, params, value):
+        key = make_key(url, params)
+        ttl = endpoint_ttl(url)
+        self.local.set(key, value, ttl)
+        if self.shared is not None:
+            try:
+                self.shared.set(key, value, ttl)
+            except Exception as e:
+                self.shared_errors += 1
+                logger.warning(f"Shared cache set error: {str(e)}")
+
+    def stats(self):
+        stats = self.local.stats()
+        stats.update({"shared_hits": self.shared_hits, "shared_errors": self.shared_errors})
+        return stats
+
+
+def build_response_cache():
+    """依環境變數建立快取；有設 API_CACHE_TABLE 才會啟用第二層"""
+    maxsize = int(os.environ.get("API_CACHE_MAXSIZE", "1024"))
+    table_name = os.environ.get("API_CACHE_TABLE")
+    shared = None
+    if table_name:
+        try:
+            shared = DynamoCacheTier(table_name, os.environ.get("API_CACHE_REGION", "ap-northeast-1"))
+        except Exception as e:
+            logger.error(f"Shared cache init error: {str(e)}")
+    return ResponseCache(maxsize, shared)
@@ -1,38 +1,125 @@
 import os
 import json
-import urllib.request
+import re
+import time
 import urllib.parse
 import logging
-from aws_xray_sdk.core import xray_recorder
-from aws_xray_sdk.core import patch_all
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+import http_client
+import metrics
+from lazy_init import Lazy, init_xray
+from cache import TTLCache, build_response_cache, normalize_text
+from singleflight import SingleFlight, coalesced
+import route_optimizer
+import poi_index
 
-# 啟動 X-Ray
-patch_all()
+# 啟動 X-Ray (設定 XRAY_PATCH_ALL=1 才會載入 SDK，省下冷啟動時間)
+init_xray()
 
 logger = logging.getLogger()
 logger.setLevel(logging.INFO)
 TRIPADVISOR_API_KEY = os.environ.get("TRIPADVISOR_API_KEY", "")
+
+# 放在模組層級，Lambda 暖機時會沿用同一份快取
+response_cache = build_response_cache()
+
+# 熱門地點索引：打包在 Lambda 內的唯讀檔案 (tools/build_poi_index.py 產生)，沒有檔案就直接走 API
+POI_INDEX_PATH = os.environ.get("POI_INDEX_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "poi_index.bin"))
+POI_INDEX_MAX_AGE_DAYS = float(os.environ.get("POI_INDEX_MAX_AGE_DAYS", "30"))
+poi = Lazy(lambda: poi_index.open_index(POI_INDEX_PATH))
+poi_stats = {"hits": 0, "misses": 0}
+
+# 同時進行中的相同查詢 (同地點、同路線) 只打一次上游
+inflight = SingleFlight()
+
+# 並行查詢的上限：同時幾條連線、整批最多等幾秒
+FAN_OUT_WORKERS = int(os.environ.get("FAN_OUT_WORKERS", "5"))
+FAN_OUT_TIMEOUT = float(os.environ.get("FAN_OUT_TIMEOUT", "8"))
+
+# 天氣專用快取：地標座標記很久；天氣依網格 (預設 0.01 度，約 1 公里) 共用，TTL 短
+GEOCODE_TTL = int(os.environ.get("GEOCODE_TTL", str(30 * 24 * 3600)))
+WEATHER_GRID_DEG = float(os.environ.get("WEATHER_GRID_DEG", "0.01"))
+WEATHER_TTL = int(os.environ.get("WEATHER_TTL", "600"))
+geocode_memo = TTLCache(maxsize=4096)
+weather_cache = TTLCache(maxsize=512)
+
 # --- 共用工具 ---
 def get_api_key():
     key = os.environ.get('GOOGLE_API_KEY')
     if not key: logger.error("缺少 GOOGLE_API_KEY")
     return key
 
+def _is_cacheable(data):
+    # 只快取成功的回應；Google 的錯誤狀態 (OVER_QUERY_LIMIT 等) 不能留下來
+    if not isinstance(data, dict) or "error" in data:
+        return False
+    return data.get("status", "OK") in ("OK", "ZERO_RESULTS")
+
+def _upstream_stage(url):
+    # 例如 upstream.maps.googleapis.com/maps/api/geocode/json；路徑裡的 ID 換成 {id} 以免指標名稱爆量
+    parts = urllib.parse.urlsplit(url)
+    return "upstream." + parts.netloc + re.sub(r"/\d+(?=/|$)", "/{id}", parts.path)
+
+def fetch_json(url, params, timeout=5, use_cache=True):
+    """所有外部 GET 都走這裡：先查快取，沒命中才打 API"""
+    cached = response_cache.get(url, params) if use_cache else None
+    if cached is not None:
+        metrics.count("api_cache.hit")
+        return cached
+
+    # 共用連線池 (Layer)：同一 host 沿用 keep-alive 連線，GET 失敗會自動重試
+    with metrics.timer(_upstream_stage(url)):
+        response = http_client.get(url, params=params, timeout=timeout)
+    if response.status != 200: return {"error": f"HTTP {response.status}"}
+    data = response.json()
+
+    if use_cache and _is_cacheable(data):
+        response_cache.set(url, params, data)
+    return data
+
+def _is_true(value):
+    return str(value or '').lower() in ('true', '1', 'yes')
+
+def _fresh_poi_index(refresh=False):
+    """要求即時資料 (refresh) 或索引太舊時不用索引"""
+    if refresh: return None
+    index = poi()
+    if index is None or index.age_days() > POI_INDEX_MAX_AGE_DAYS: return None
+    return index
+
+def fan_out(func, items, timeout=FAN_OUT_TIMEOUT):
+    """並行執行 func(item)，結果照 items 的順序回傳；逾時或失敗的那筆給 None，不拖垮整批"""
+    if not items: return []
+    executor = ThreadPoolExecutor(max_workers=min(FAN_OUT_WORKERS, len(items)))
+    try:
+        futures = [executor.submit(func, item) for item in items]
+        deadline = time.monotonic() + timeout
+        results = []
+        for item, future in zip(items, futures):
+            try:
+                results.append(future.result(timeout=max(0, deadline - time.monotonic())))
+            except FutureTimeout:
+                logger.warning(f"Fan-out timeout: {func.__name__}({item})")
+                results.append(None)
+            except Exception as e:
+                logger.warning(f"Fan-out error: {func.__name__}({item}): {str(e)}")
+                results.append(None)
+        return results
+    finally:
+        # 不等還沒回來的子呼叫，它們各自有 HTTP timeout 會自己結束
+        executor.shutdown(wait=False, cancel_futures=True)
+
 def call_api_get(url, params):
     try:
         api_key = get_api_key()
         if not api_key: return {"error": "API Key 未設定"}
         params['key'] = api_key
-        query_string = urllib.parse.urlencode(params)
-        full_url = f"{url}?{query_string}"
-        
-        with urllib.request.urlopen(full_url) as response:
-            if response.status != 200: return {"error": f"HTTP {response.status}"}
-            return json.loads(response.read().decode('utf-8'))
+        return fetch_json(url, params)
     except Exception as e:
         return {"error": str(e)}
 
 # --- 1. 交通導航 ---
+@coalesced(inflight)
 def get_directions(origin, destination, mode="driving"):
     url = "https://maps.googleapis.com/maps/api/directions/json"
     params = {"origin": origin, "destination": destination, "mode": mode, "language": "zh-TW"}
@@ -56,10 +143,124 @@ def get_directions(origin, destination, mode="driving"):
             f"• 路線: {summary}\n"
             f"• 連結: {map_link}")
 
+# --- 1b. 行程排序 (一次取得距離矩陣，本地計算順序) ---
+ROUTE_MAX_PLACES = int(os.environ.get("ROUTE_MAX_PLACES", "25"))
+
+def get_distance_matrix(places, mode="driving"):
+    """所有兩兩交通時間 (秒) 與距離 (公尺)；超過 10 個地點時切塊並行查詢"""
+    url = "https://maps.googleapis.com/maps/api/distancematrix/json"
+    n = len(places)
+    durations = route_optimizer.empty_matrix(n)
+    distances = route_optimizer.empty_matrix(n)
+    blocks = [(rows, cols) for rows in route_optimizer.chunk_ranges(n) for cols in route_optimizer.chunk_ranges(n)]
+
+    def fetch_block(block):
+        (r0, r1), (c0, c1) = block
+        params = {
+            "origins": "|".join(places[r0:r1]),
+            "destinations": "|".join(places[c0:c1]),
+            "mode": mode,
+            "language": "zh-TW",
+        }
+        data = call_api_get(url, params)
+        if "error" in data or data.get("status") != "OK":
+            raise Exception(data.get("error") or data.get("status"))
+        return data
+
+    for block, data in zip(blocks, fan_out(fetch_block, blocks)):
+        if data:
+            (r0, _), (c0, _) = block
+            route_optimizer.fill_matrix(durations, distances, data, r0, c0)
+    return durations, distances
+
+def _format_minutes(seconds):
+    minutes = round(seconds / 60)
+    if minutes >= 60:
+        return f"{minutes // 60} 小時 {minutes % 60} 分"
+    return f"{minutes} 分"
+
+def _parse_places(places):
+    # 接受 JSON 陣列字串，或用換行 / 逗號 / 頓號 / | 分隔的文字
+    if isinstance(places, list):
+        items = places
+    else:
+        text = (places or "").strip()
+        try:
+            items = json.loads(text) if text.startswith("[") else re.split(r"[\n,，、|]", text)
+        except ValueError:
+            items = re.split(r"[\n,，、|]", text)
+    return [str(i).strip() for i in items if str(i).strip()]
+
+def optimize_route(places, mode="driving", return_to_start=False):
+    places = _parse_places(places)
+    if len(places) < 2: return "請至少提供兩個地點"
+    if len(places) > ROUTE_MAX_PLACES: return f"地點太多了，最多 {ROUTE_MAX_PLACES} 個"
+
+    durations, distances = get_distance_matrix(places, mode)
+    if all(durations[i][j] is None for i in range(len(places)) for j in range(len(places)) if i != j):
+        return "目前無法取得交通時間，請稍後再試。"
+
+    # 起點固定為第一個地點
+    order, _ = route_optimizer.solve(durations, start=0, return_to_start=return_to_start)
+    legs = list(zip(order, order[1:]))
+    if return_to_start:
+        legs.append((order[-1], order[0]))
+
+    lines = [f"🗺️ 建議造訪順序 ({mode})："]
+    total = 0
+    for step, (a, b) in enumerate(legs, start=1):
+        if step == 1:
+            lines.append(f"{step}. {places[a]}")
+        if durations[a][b] is None:
+            lines.append("   ↓ (查無路線)")
+        else:
+            total += durations[a][b]
+            lines.append(f"   ↓ {_format_minutes(durations[a][b])} ({distances[a][b] / 1000:.1f} 公里)")
+        lines.append(f"{step + 1}. {places[b]}")
+
+    # Google Maps 多點導航連結
+    stops = [places[i] for i in order] + ([places[order[0]]] if return_to_start else [])
+    map_link = (f"https://www.google.com/maps/dir/?api=1&origin={urllib.parse.quote(stops[0])}"
+                f"&destination={urllib.parse.quote(stops[-1])}&travelmode={mode}")
+    if len(stops) > 2:
+        map_link += f"&waypoints={urllib.parse.quote('|'.join(stops[1:-1]))}"
+
+    lines.append(f"• 總交通時間: {_format_minutes(total)}")
+    lines.append(f"• 連結: {map_link}")
+    return "\n".join(lines)
+
 # --- 2. 查詢詳情 (內部工具) ---
-def get_place_details(place_id):
+def _format_place(name, place_id, phone, address, rating, google_map_url, opening_info):
+    # 修正版：最穩定的 Google Maps 官方連結
+    if not google_map_url:
+        safe_name = urllib.parse.quote(name)
+        google_map_url = f"https://www.google.com/maps/search/?api=1&query={safe_name}&query_place_id={place_id}"
+
+    # ⚠️ 這裡回傳 Place ID 讓 Agent 看得見
+    return (f"名稱: {name} ({rating}星)\n"
+            f"ID: {place_id}\n"
+            f"電話: {phone}\n"
+            f"地址: {address}\n"
+            f"狀態: {opening_info}\n"
+            f"連結: {google_map_url}")
+
+def _format_poi(record):
+    # 索引沒有即時營業狀態，請使用者看連結
+    return _format_place(record.get("name", "未知地點"), record["place_id"], record.get("phone") or "無電話",
+                         record.get("address") or "無地址", record.get("rating") or "無", record.get("url"),
+                         "請以連結查看即時營業資訊")
+
+@coalesced(inflight)
+def get_place_details(place_id, refresh=False):
+    index = _fresh_poi_index(refresh)
+    record = index.get_by_place_id(place_id) if index else None
+    if record:
+        poi_stats["hits"] += 1
+        return _format_poi(record)
+    poi_stats["misses"] += 1
+
     url = "https://maps.googleapis.com/maps/api/place/details/json"
-    params = {"place_id": place_id, "fields": "name,formatted_phone_number,formatted_address,opening_hours,rating,url", "language": "zh-TW"}
+    params = {"place_id": place_id, "fields": "place_id,name,formatted_phone_number,formatted_address,opening_hours,rating,url", "language": "zh-TW"}
     data = call_api_get(url, params)
     
     if "error" in data: return f"目前無法取得資訊，請稍後再試。"
@@ -70,12 +271,6 @@ def get_place_details(place_id):
     phone = result.get("formatted_phone_number", "無電話")
     address = result.get("formatted_address", "無地址")
     rating = result.get("rating", "無")
-    
-    # 修正版：最穩定的 Google Maps 官方連結
-    safe_name = urllib.parse.quote(name)
-    google_map_url = result.get("url")
-    if not google_map_url:
-        google_map_url = f"https://www.google.com/maps/search/?api=1&query={safe_name}&query_place_id={place_id}"
 
     # 簡化營業時間
     opening_info = "無營業資訊"
@@ -84,18 +279,46 @@ def get_place_details(place_id):
         status_text = "🟢 營業中" if open_now else "🔴 已打烊"
         opening_info = status_text 
 
-    # ⚠️ 這裡回傳 Place ID 讓 Agent 看得見
-    return (f"名稱: {name} ({rating}星)\n"
-            f"ID: {place_id}\n"
-            f"電話: {phone}\n"
-            f"地址: {address}\n"
-            f"狀態: {opening_info}\n"
-            f"連結: {google_map_url}")
+    return _format_place(name, place_id, phone, address, rating, result.get("url"), opening_info)
 
 # --- 3. 搜尋地點 (整合版) ---
-def search_places(keyword, location=""):
+def _format_brief(name, pid, rating, addr):
+    # 修正版：最穩定的 Google Maps 官方連結
+    safe_name = urllib.parse.quote(name)
+    map_url = f"https://www.google.com/maps/search/?api=1&query={safe_name}"
+    
+    # ⚠️ 這裡也加上 ID，預防 Agent 想查別家
+    return f"- {name} ({rating}星)\n  ID: {pid}\n  地址: {addr}\n  (連結: {map_url})"
+
+def _search_poi_index(index, keyword, location, final_query):
+    """熱門地標完全相符才用索引回答；「淺草 拉麵」這類搜尋仍交給 Google"""
+    record = index.get(final_query)
+    if not record and not location:
+        # 有指定地點時不退回只查關鍵字，否則「大阪 + 一蘭拉麵」會拿到索引裡別處的一蘭
+        record = index.get(keyword)
+    if not record:
+        return None
+    final_output = [f"【最佳結果】\n{_format_poi(record)}"]
+    others = [r for r in index.prefix(keyword, limit=3) if r["place_id"] != record["place_id"]][:2]
+    if others:
+        final_output.append("\n【其他結果】")
+        for r in others:
+            final_output.append(_format_brief(r["name"], r["place_id"], r.get("rating") or "無", r.get("address")))
+    return "\n".join(final_output)
+
+@coalesced(inflight)
+def search_places(keyword, location="", refresh=False):
     url = "https://maps.googleapis.com/maps/api/place/textsearch/json"
     final_query = f"{location} {keyword}".strip()
+
+    index = _fresh_poi_index(refresh)
+    if index:
+        answer = _search_poi_index(index, keyword, location, final_query)
+        if answer:
+            poi_stats["hits"] += 1
+            return answer
+    poi_stats["misses"] += 1
+
     params = {"query": final_query, "language": "zh-TW"}
     
     data = call_api_get(url, params)
@@ -113,8 +336,14 @@ def search_places(keyword, location=""):
     final_output = []
     
     # ⚠️ 關鍵修正：確保這裡有呼叫 get_place_details
+    # 詳情查詢有自己的逾時，查不到就退回簡略資訊，不讓整個搜尋失敗
+    top_details = None
     if top_result.get('place_id'):
-        final_output.append(f"【最佳結果】\n{get_place_details(top_result.get('place_id'))}")
+        top_details = fan_out(get_place_details, [top_result.get('place_id')])[0]
+    if top_details:
+        final_output.append(f"【最佳結果】\n{top_details}")
+    elif top_result.get('place_id'):
+        final_output.append(f"【最佳結果】\n{top_result.get('name')}\nID: {top_result.get('place_id')}\n地址: {top_result.get('formatted_address')}\n(詳情暫時無法取得)")
     else:
         final_output.append(f"【最佳結果】\n{top_result.get('name')}\n(無詳情)")
 
@@ -122,21 +351,59 @@ def search_places(keyword, location=""):
     if len(results) > 1:
         final_output.append("\n【其他結果】")
         for r in results[1:3]:
-            name = r.get('name')
-            pid = r.get('place_id', '無ID')
-            rating = r.get('rating', '無')
-            addr = r.get('formatted_address')
-            
-            # 修正版：最穩定的 Google Maps 官方連結
-            safe_name = urllib.parse.quote(name)
-            map_url = f"https://www.google.com/maps/search/?api=1&query={safe_name}"
-            
-            # ⚠️ 這裡也加上 ID，預防 Agent 想查別家
-            final_output.append(f"- {name} ({rating}星)\n  ID: {pid}\n  地址: {addr}\n  (連結: {map_url})")
+            final_output.append(_format_brief(r.get('name'), r.get('place_id', '無ID'), r.get('rating', '無'), r.get('formatted_address')))
 
     return "\n".join(final_output)
 
 # --- 4. 天氣查詢  ---
+WEATHER_NOTE = "• 提醒: 座標定位由 Google 提供，氣象數據由 OpenWeather 提供。祝您旅途愉快！"
+
+def geocode(location, google_key):
+    """地標 → (緯度, 經度, 正式名稱)；以正規化後的地名記住結果，找不到回傳 None"""
+    memo_key = normalize_text(location).lower()
+    hit = geocode_memo.get(memo_key)
+    if hit is not None:
+        return hit
+
+    # Google 的定位能力極強，能輕鬆辨識「東京車站」
+    geo_url = "https://maps.googleapis.com/maps/api/geocode/json"
+    geo_data = fetch_json(geo_url, {"address": location, "key": google_key, "language": "zh-TW"}, use_cache=False)
+    if geo_data.get("status") != "OK":
+        return None
+
+    loc = geo_data["results"][0]["geometry"]["location"]
+    result = (loc["lat"], loc["lng"], geo_data["results"][0]["formatted_address"])
+    geocode_memo.set(memo_key, result, GEOCODE_TTL)
+    return result
+
+def grid_cell(lat, lon):
+    """座標對齊到網格中心，同一格內的地點共用一份天氣資料"""
+    cell_lat = round(round(lat / WEATHER_GRID_DEG) * WEATHER_GRID_DEG, 4)
+    cell_lon = round(round(lon / WEATHER_GRID_DEG) * WEATHER_GRID_DEG, 4)
+    return cell_lat, cell_lon
+
+def weather_at(cell, ow_key):
+    hit = weather_cache.get(cell)
+    if hit is not None:
+        return hit
+
+    # 使用 lat, lon 參數代替 q 參數，這在日本地區 100% 穩定
+    weather_url = "https://api.openweathermap.org/data/2.5/weather"
+    data = fetch_json(weather_url, {"lat": cell[0], "lon": cell[1], "appid": ow_key, "units": "metric", "lang": "zh_tw"}, use_cache=False)
+    if "error" in data:
+        raise Exception(data["error"])
+    weather_cache.set(cell, data, WEATHER_TTL)
+    return data
+
+def _split_locations(location):
+    # 「東京、大阪」「東京,京都」這類一次問多個地點的情況
+    parts = [p.strip() for p in re.split(r"[,，、/／;；]", location or "")]
+    unique = []
+    for part in parts:
+        if part and part not in unique:
+            unique.append(part)
+    return unique or [location]
+
 def get_weather(location):
     # 讀取環境變數中的兩把鑰匙
     google_key = os.environ.get('GOOGLE_API_KEY')
@@ -146,90 +413,169 @@ def get_weather(location):
         return "目前無法取得資訊，請稍後再試。"
 
     try:
-        # 步驟 1：使用 Google Geocoding 將「地標」轉換為「經緯度」
-        # Google 的定位能力極強，能輕鬆辨識「東京車站」
-        geo_url = f"https://maps.googleapis.com/maps/api/geocode/json?address={urllib.parse.quote(location)}&key={google_key}&language=zh-TW"
-        
-        with urllib.request.urlopen(geo_url, timeout=5) as resp:
-            geo_data = json.loads(resp.read().decode('utf-8'))
-        
-        if geo_data.get("status") != "OK":
-            return f"找不到地點：{location}，請嘗試輸入更準確的地標名稱。"
-        
-        # 提取精確座標
-        loc = geo_data["results"][0]["geometry"]["location"]
-        lat, lon = loc["lat"], loc["lng"]
-        formatted_name = geo_data["results"][0]["formatted_address"]
-
-        # 步驟 2：使用座標呼叫 OpenWeather API
-        # 使用 lat, lon 參數代替 q 參數，這在日本地區 100% 穩定
-        weather_url = f"https://api.openweathermap.org/data/2.5/weather?lat={lat}&lon={lon}&appid={ow_key}&units=metric&lang=zh_tw"
-        
-        with urllib.request.urlopen(weather_url, timeout=5) as resp:
-            data = json.loads(resp.read().decode('utf-8'))
-            
-        main = data.get("main", {})
-        weather = data.get("weather", [{}])[0]
-        
-        # 回傳親切的導遊格式
-        return (f"🌡️ {formatted_name} 目前天氣：\n"
-                f"• 狀態: {weather.get('description', '未知')}\n"
-                f"• 氣溫: {main.get('temp')}°C (體感 {main.get('feels_like')}°C)\n"
-                f"• 濕度: {main.get('humidity')}%\n"
-                f"• 提醒: 座標定位由 Google 提供，氣象數據由 OpenWeather 提供。祝您旅途愉快！")
+        locations = _split_locations(location)
+
+        # 步驟 1：Google Geocoding 將「地標」轉換為「經緯度」(多個地點同時查)
+        geos = fan_out(lambda loc: geocode(loc, google_key), locations)
+
+        # 步驟 2：依座標查 OpenWeather (同一網格只查一次)
+        cells = []
+        for geo in geos:
+            if geo and grid_cell(geo[0], geo[1]) not in cells:
+                cells.append(grid_cell(geo[0], geo[1]))
+        weather_by_cell = dict(zip(cells, fan_out(lambda cell: weather_at(cell, ow_key), cells)))
+
+        blocks = []
+        for loc_name, geo in zip(locations, geos):
+            if not geo:
+                blocks.append(f"找不到地點：{loc_name}，請嘗試輸入更準確的地標名稱。")
+                continue
+            data = weather_by_cell.get(grid_cell(geo[0], geo[1]))
+            if not data:
+                blocks.append(f"暫時無法取得 {loc_name} 的天氣資訊，請稍後再試。")
+                continue
+
+            formatted_name = geo[2]
+            main = data.get("main", {})
+            weather = data.get("weather", [{}])[0]
+            # 回傳親切的導遊格式
+            blocks.append(f"🌡️ {formatted_name} 目前天氣：\n"
+                          f"• 狀態: {weather.get('description', '未知')}\n"
+                          f"• 氣溫: {main.get('temp')}°C (體感 {main.get('feels_like')}°C)\n"
+                          f"• 濕度: {main.get('humidity')}%")
+
+        if not any(geos):
+            return blocks[0] if len(blocks) == 1 else "\n".join(blocks)
+        return "\n\n".join(blocks) + "\n" + WEATHER_NOTE
 
     except Exception as e:
         logger.error(f"Weather Tool Error: {str(e)}")
         return f"暫時無法取得 {location} 的天氣資訊，請稍後再試。"
 
 
+@coalesced(inflight)
 def get_location_id(query):
     """第一步：將地名換成 Location ID"""
-    encoded_query = urllib.parse.quote(query)
-    url = f"https://api.content.tripadvisor.com/api/v1/location/search?key={TRIPADVISOR_API_KEY}&searchQuery={encoded_query}&category=hotels&address={encoded_query}&language=zh_TW"
+    url = "https://api.content.tripadvisor.com/api/v1/location/search"
+    params = {"key": TRIPADVISOR_API_KEY, "searchQuery": query, "category": "hotels", "address": query, "language": "zh_TW"}
 
-    with urllib.request.urlopen(url) as resp:
-        data = json.loads(resp.read().decode())
-        if data.get('data'):
-            return data.get('data', [])
+    data = fetch_json(url, params, timeout=10)
+    if data.get('data'):
+        return data.get('data', [])
     return None, None
 
+@coalesced(inflight)
 def get_hotels_by_id(location_id):
     """第二步：拿 Location ID 換取飯店清單與評分"""
     # 注意這裡的路徑：location/{id}/search
     print(location_id)
-    url = f"https://api.content.tripadvisor.com/api/v1/location/{location_id}/details?key={TRIPADVISOR_API_KEY}&language=zh_TW&currency=TWD"
-    print(url)
-    with urllib.request.urlopen(url) as resp:
-        return json.loads(resp.read().decode())
+    url = f"https://api.content.tripadvisor.com/api/v1/location/{location_id}/details"
+    return fetch_json(url, {"key": TRIPADVISOR_API_KEY, "language": "zh_TW", "currency": "TWD"}, timeout=10)
+
+def _hotel_section(location):
+    """單一地點的飯店段落；TripAdvisor 回錯誤時丟例外，交給 fan_out 處理"""
+    actual_name = location.get('name')
+    # 2. 取得飯店
+    hotels_data = get_hotels_by_id(location.get('location_id'))
+    if "error" in hotels_data:
+        raise Exception(hotels_data["error"])
+
+    # 3. 解析評分與資料
+    name = hotels_data.get('name', '未知飯店')
+    rating = hotels_data.get('rating', '暫無') # 抓取評分欄位
+    price_level = hotels_data.get('price_level', '暫無') # 抓取價格欄位
+    web_url = hotels_data.get('web_url','暫無') 
+    hotel_line = f"- {name} (評分: {rating}\n⭐ 價格 {price_level}\n網址{web_url}\n"
+    return f"為您找到{actual_name}附近的推薦飯店：\n" + hotel_line + "\n"
 
 def get_hotels(data1):
-    result_text =""
-    for i in data1[::3]:
-        print(i)
-        print(i.get('name'))
-        actual_name = i.get('name')
-        loc_id = i.get('location_id')
-        if loc_id:
-            # 2. 取得飯店
-            hotels_data = get_hotels_by_id(loc_id)
-                
-            # 3. 解析評分與資料
-            hotel_lines = []
-
-            name = hotels_data.get('name', '未知飯店')
-            rating = hotels_data.get('rating', '暫無') # 抓取評分欄位
-            price_level = hotels_data.get('price_level', '暫無') # 抓取價格欄位
-            web_url = hotels_data.get('web_url','暫無') 
-            hotel_lines.append(f"- {name} (評分: {rating}\n⭐ 價格 {price_level}\n網址{web_url}\n")
-                                  
-            if hotel_lines:
-                result_text += f"為您找到{actual_name}附近的推薦飯店：\n" + "\n".join(hotel_lines)+"\n"
-            else:
-                result_text = f"找到地點{actual_name}，但查無飯店資料。"
+    # get_location_id 查無資料時會回傳 (None, None)，先濾掉
+    locations = [i for i in (data1 or [])[::3] if isinstance(i, dict) and i.get('location_id')]
 
+    # 各地點同時查詢，順序維持不變；個別失敗只少一段，不影響其他地點
+    sections = fan_out(_hotel_section, locations)
+
+    result_text = ""
+    for location, section in zip(locations, sections):
+        if section:
+            result_text += section
+        else:
+            result_text += f"找到地點{location.get('name')}，但暫時查不到飯店資料。\n"
     return result_text    
 
+def dispatch(function_name, p):
+    """根據 Bedrock 請求的 function 名稱進行路由"""
+    if function_name == 'get_directions':
+        # 假設你已有 get_directions 函數
+        return get_directions(p.get('origin'), p.get('destination'), p.get('mode', 'driving'))
+        
+    elif function_name == 'search_places':
+        # 假設你已有 search_places 函數
+        return search_places(p.get('keyword'), p.get('location', ''), _is_true(p.get('refresh')))
+        
+    elif function_name == 'get_place_details':
+        # 假設你已有 get_place_details 函數
+        return get_place_details(p.get('place_id'), _is_true(p.get('refresh')))
+        
+    elif function_name == 'get_weather':
+        # 執行剛剛寫好的 Google Weather API 查詢
+        return get_weather(p.get('location'))
+    elif function_name == 'optimize_route':
+        return optimize_route(p.get('places'), p.get('mode', 'driving'), _is_true(p.get('return_to_start')))
+    elif function_name == "search_hotels_by_name":
+        location_name = p.get("locationName")
+        data1 = get_location_id(location_name)
+        return get_hotels(data1)
+    else:
+        return f"不支援的功能：{function_name}"
+
+# --- 批次模式：一次 event 帶多個 {function, parameters}，同時執行 ---
+BATCH_FUNCTION = "batch_calls"
+BATCH_MAX_CALLS = int(os.environ.get("BATCH_MAX_CALLS", "10"))
+BATCH_TIMEOUT = float(os.environ.get("BATCH_TIMEOUT", "20"))
+
+def _to_param_dict(parameters):
+    # 同時接受 Bedrock 的 [{name, value}] 與一般的 {name: value}
+    if isinstance(parameters, dict):
+        return parameters
+    return {param['name']: param['value'] for param in (parameters or [])}
+
+def _run_call(call):
+    function_name = call.get('function', '')
+    try:
+        body = dispatch(function_name, _to_param_dict(call.get('parameters')))
+        return {"function": function_name, "status": "ok", "body": str(body)}
+    except Exception as e:
+        logger.error(f"Batch call error ({function_name}): {str(e)}")
+        return {"function": function_name, "status": "error", "body": f"執行例外: {str(e)}"}
+
+def run_batch(calls):
+    """各呼叫並行執行，結果照原本順序回傳，每筆都有自己的 status"""
+    if isinstance(calls, str):
+        calls = json.loads(calls)
+    if not isinstance(calls, list):
+        raise Exception("calls 必須是 [{function, parameters}, ...] 陣列")
+
+    # 格式不對或超過上限的呼叫不執行，但照樣回一筆結果，Agent 才知道要重送哪些
+    results = [None] * len(calls)
+    runnable = []
+    for i, call in enumerate(calls):
+        if not isinstance(call, dict) or not call.get('function'):
+            results[i] = {"function": "", "status": "invalid", "body": "格式錯誤：每筆呼叫需要是含 function 的物件。"}
+        elif len(runnable) >= BATCH_MAX_CALLS:
+            results[i] = {"function": call['function'], "status": "rejected",
+                          "body": f"超過單次批次上限 {BATCH_MAX_CALLS} 筆，請分批再送。"}
+        else:
+            runnable.append(i)
+
+    outputs = fan_out(_run_call, [calls[i] for i in runnable], timeout=BATCH_TIMEOUT)
+    for i, result in zip(runnable, outputs):
+        if result is None:
+            result = {"function": calls[i]['function'], "status": "timeout", "body": "查詢逾時，請稍後再試。"}
+        results[i] = result
+    return json.dumps(results, ensure_ascii=False)
+
+@metrics.instrument("api")
 def lambda_handler(event, context):
     # 紀錄完整的 Event 內容，方便在 CloudWatch 查看 Bedrock 傳了什麼
     logger.info("Received Event: " + json.dumps(event, ensure_ascii=False))
@@ -240,39 +586,27 @@ def lambda_handler(event, context):
     parameters = event.get('parameters', [])
     
     # 將參數轉成字典格式，方便讀取
-    p = {param['name']: param['value'] for param in parameters}
+    p = _to_param_dict(parameters)
     
     # 預設回應內容
     response_body = "功能執行異常"
     
     try:
-        # 根據 Bedrock 請求的 function 名稱進行路由
-        if function_name == 'get_directions':
-            # 假設你已有 get_directions 函數
-            response_body = get_directions(p.get('origin'), p.get('destination'), p.get('mode', 'driving'))
-            
-        elif function_name == 'search_places':
-            # 假設你已有 search_places 函數
-            response_body = search_places(p.get('keyword'), p.get('location', ''))
-            
-        elif function_name == 'get_place_details':
-            # 假設你已有 get_place_details 函數
-            response_body = get_place_details(p.get('place_id'))
-            
-        elif function_name == 'get_weather':
-            # 執行剛剛寫好的 Google Weather API 查詢
-            response_body = get_weather(p.get('location'))
-        elif function_name == "search_hotels_by_name":
-            location_name = p.get("locationName")
-            data1 = get_location_id(location_name)
-            response_body = get_hotels(data1)
+        if function_name == BATCH_FUNCTION or 'calls' in event:
+            # 批次：calls 可以放在參數 (JSON 字串) 或直接放在 event 裡
+            response_body = run_batch(event.get('calls') or p.get('calls') or [])
         else:
-            response_body = f"不支援的功能：{function_name}"
+            response_body = dispatch(function_name, p)
             
     except Exception as e:
         logger.error(f"Lambda Handler Crash: {str(e)}")
         response_body = f"執行例外: {str(e)}"
 
+    logger.info(f"API cache stats: {json.dumps(response_cache.stats())}")
+    logger.info(f"HTTP stats: {json.dumps(http_client.stats())}")
+    logger.info(f"Single-flight stats: {json.dumps(inflight.stats())}")
+    logger.info(f"POI index stats: {json.dumps(poi_stats)}")
+
     # ⚠️ 重要：回傳格式必須嚴格遵守 Bedrock Action Group 規範
     return {
         "messageVersion": "1.0",
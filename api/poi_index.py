@@ -0,0 +1,146 @@
+"""唯讀的熱門地點索引 (POI index)：常被問的地標、車站、餐廳直接從本地檔案回答，不打 Google API
+
+檔案格式 (little-endian，整個檔案用 mmap 開啟，不需要先讀進記憶體)：
+    header   : magic "POI1" | built_at u64 | n_keys u32 | n_records u32
+    key 表   : n_keys 筆 (key_offset u32, key_len u16, record_id u32)，依 key 的 UTF-8 位元組排序
+    record 表: n_records 筆 (offset u32, length u32)，指到 data 區的 JSON
+    data 區  : 所有 key 字串與 record JSON
+
+查詢：正規化後的名稱做二分搜尋 (完全相符或前綴)；place_id 也會以 "id:<place_id>" 建成 key。
+"""
+import os
+import re
+import json
+import mmap
+import time
+import struct
+import unicodedata
+
+MAGIC = b"POI1"
+HEADER = struct.Struct("<4sQII")
+KEY_ENTRY = struct.Struct("<IHI")
+RECORD_ENTRY = struct.Struct("<II")
+
+# 正規化時移除的字元：空白與常見標點 (「東京 車站」「東京車站！」都視為同一個名稱)
+_STRIP = re.compile(r"[\s\-_・·.,，。、!！?？'\"()（）「」【】]+")
+
+
+def normalize_name(name):
+    text = unicodedata.normalize("NFKC", str(name or "")).casefold()
+    return _STRIP.sub("", text)
+
+
+def place_key(place_id):
+    return f"id:{place_id}"
+
+
+class PoiIndex:
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self.built_at, self.n_keys, self.n_records = HEADER.unpack_from(self._mm, 0)
+        if magic != MAGIC:
+            raise ValueError(f"not a POI index: {path}")
+        self._keys_at = HEADER.size
+        self._records_at = self._keys_at + self.n_keys * KEY_ENTRY.size
+
+    def age_days(self):
+        return (time.time() - self.built_at) / 86400
+
+    def _key_at(self, i):
+        offset, length, record_id = KEY_ENTRY.unpack_from(self._mm, self._keys_at + i * KEY_ENTRY.size)
+        return self._mm[offset:offset + length], record_id
+
+    def _record(self, record_id):
+        offset, length = RECORD_ENTRY.unpack_from(self._mm, self._records_at + record_id * RECORD_ENTRY.size)
+        return json.loads(self._mm[offset:offset + length].decode("utf-8"))
+
+    def _lower_bound(self, target):
+        lo, hi = 0, self.n_keys
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._key_at(mid)[0] < target:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def get(self, name):
+        """完全相符；找不到回傳 None"""
+        target = normalize_name(name).encode("utf-8")
+        if not target:
+            return None
+        i = self._lower_bound(target)
+        if i < self.n_keys:
+            key, record_id = self._key_at(i)
+            if key == target:
+                return self._record(record_id)
+        return None
+
+    def get_by_place_id(self, place_id):
+        target = place_key(place_id).encode("utf-8")
+        i = self._lower_bound(target)
+        if i < self.n_keys:
+            key, record_id = self._key_at(i)
+            if key == target:
+                return self._record(record_id)
+        return None
+
+    def prefix(self, name, limit=5):
+        """以 name 開頭的地點 (同一地點的多個別名只回傳一次)"""
+        target = normalize_name(name).encode("utf-8")
+        if not target:
+            return []
+        results, seen = [], set()
+        i = self._lower_bound(target)
+        while i < self.n_keys and len(results) < limit:
+            key, record_id = self._key_at(i)
+            if not key.startswith(target):
+                break
+            if record_id not in seen:
+                seen.add(record_id)
+                results.append(self._record(record_id))
+            i += 1
+        return results
+
+    def close(self):
+        self._mm.close()
+
+
+def open_index(path):
+    """檔案不存在就回傳 None (沒有打包索引時照常走 API)"""
+    if not path or not os.path.exists(path):
+        return None
+    return PoiIndex(path)
+
+
+def build_index(records, aliases=None, built_at=None):
+    """records: [{place_id, name, address, rating, url, phone}]；aliases: {place_id: [別名, ...]}"""
+    aliases = aliases or {}
+    record_blobs = []
+    keys = {}
+    for record_id, record in enumerate(records):
+        record_blobs.append(json.dumps(record, ensure_ascii=False, separators=(",", ":")).encode("utf-8"))
+        names = [record.get("name")] + list(aliases.get(record["place_id"], []))
+        for name in names:
+            key = normalize_name(name)
+            if key:
+                # 同名時保留第一個 (records 應該依熱門程度排序)
+                keys.setdefault(key.encode("utf-8"), record_id)
+        keys[place_key(record["place_id"]).encode("utf-8")] = record_id
+
+    sorted_keys = sorted(keys.items())
+    data_at = HEADER.size + len(sorted_keys) * KEY_ENTRY.size + len(record_blobs) * RECORD_ENTRY.size
+    data = bytearray()
+    key_table = bytearray()
+    for key, record_id in sorted_keys:
+        key_table += KEY_ENTRY.pack(data_at + len(data), len(key), record_id)
+        data += key
+    record_table = bytearray()
+    for blob in record_blobs:
+        record_table += RECORD_ENTRY.pack(data_at + len(data), len(blob))
+        data += blob
+
+    header = HEADER.pack(MAGIC, int(built_at or time.time()), len(sorted_keys), len(record_blobs))
+    return bytes(header + key_table + record_table + data)
@@ -0,0 +1,82 @@
+"""行程排序：用一次 Distance Matrix 取得所有兩兩交通時間，在本地算出較佳的造訪順序
+
+演算法：最近鄰 (nearest neighbour) 先排出初始路線，再用 2-opt 反轉區段改善。
+起點固定為第一個地點；交通時間可以不對稱 (A→B 與 B→A 不同)。
+"""
+
+# Distance Matrix 單次限制：origins、destinations 各最多 25，元素最多 100
+MAX_CHUNK = 10
+
+# 查不到路線的兩點，給一個很大的成本讓演算法避開
+UNREACHABLE = 10 ** 9
+
+
+def chunk_ranges(n, size=MAX_CHUNK):
+    return [(i, min(i + size, n)) for i in range(0, n, size)]
+
+
+def empty_matrix(n):
+    return [[0 if i == j else None for j in range(n)] for i in range(n)]
+
+
+def fill_matrix(durations, distances, response, row_offset, col_offset):
+    """把一個 Distance Matrix 回應 (一個 origins × destinations 區塊) 填進完整矩陣"""
+    for r, row in enumerate(response.get("rows", [])):
+        for c, element in enumerate(row.get("elements", [])):
+            i, j = row_offset + r, col_offset + c
+            if i == j or element.get("status") != "OK":
+                continue
+            durations[i][j] = element["duration"]["value"]
+            distances[i][j] = element["distance"]["value"]
+
+
+def _cost(matrix, i, j):
+    value = matrix[i][j]
+    return UNREACHABLE if value is None else value
+
+
+def path_cost(order, matrix, return_to_start=False):
+    total = sum(_cost(matrix, a, b) for a, b in zip(order, order[1:]))
+    if return_to_start and len(order) > 1:
+        total += _cost(matrix, order[-1], order[0])
+    return total
+
+
+def nearest_neighbour(matrix, start=0):
+    n = len(matrix)
+    order = [start]
+    remaining = set(range(n)) - {start}
+    while remaining:
+        last = order[-1]
+        nxt = min(remaining, key=lambda j: (_cost(matrix, last, j), j))
+        order.append(nxt)
+        remaining.remove(nxt)
+    return order
+
+
+def two_opt(order, matrix, return_to_start=False, max_passes=50):
+    """反轉 order[i:j+1]，有變短就接受；起點 (index 0) 不動"""
+    best = list(order)
+    best_cost = path_cost(best, matrix, return_to_start)
+    n = len(best)
+    for _ in range(max_passes):
+        improved = False
+        for i in range(1, n - 1):
+            for j in range(i + 1, n):
+                candidate = best[:i] + best[i:j + 1][::-1] + best[j + 1:]
+                cost = path_cost(candidate, matrix, return_to_start)
+                if cost < best_cost:
+                    best, best_cost = candidate, cost
+                    improved = True
+        if not improved:
+            break
+    return best, best_cost
+
+
+def solve(matrix, start=0, return_to_start=False):
+    """回傳 (造訪順序, 總成本)"""
+    if len(matrix) <= 2:
+        order = list(range(len(matrix)))
+        return order, path_cost(order, matrix, return_to_start)
+    order = nearest_neighbour(matrix, start)
+    return two_opt(order, matrix, return_to_start)
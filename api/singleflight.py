@@ -0,0 +1,77 @@
+import json
+import functools
+import threading
+
+from cache import normalize_text
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """同一個 Key 同時只打一次上游；其他同時進來的請求等待並共用同一份結果"""
+
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+        self.executed = 0
+        self.coalesced = 0
+
+    def do(self, key, fn, *args, **kwargs):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = _Call()
+                self._calls[key] = call
+                self.executed += 1
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn(*args, **kwargs)
+            return call.result
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            # 先移除再通知：之後進來的請求會重新查 (交給快取處理)，不會拿到過期的結果
+            with self._lock:
+                self._calls.pop(key, None)
+            call.done.set()
+
+    async def do_async(self, key, fn, *args, **kwargs):
+        # asyncio 的呼叫也走同一張表，才能和執行緒的呼叫互相合併
+        # (asyncio 在這裡才 import：模組本身很重，同步路徑用不到)
+        import asyncio
+        return await asyncio.to_thread(self.do, key, fn, *args, **kwargs)
+
+    def stats(self):
+        return {"executed": self.executed, "coalesced": self.coalesced, "in_flight": len(self._calls)}
+
+
+def make_call_key(name, args, kwargs):
+    """function 名稱 + 正規化後的參數"""
+    norm_args = [normalize_text(a) if a is not None else None for a in args]
+    norm_kwargs = sorted((k, normalize_text(v) if v is not None else None) for k, v in kwargs.items())
+    return json.dumps([name, norm_args, norm_kwargs], ensure_ascii=False)
+
+
+def coalesced(group):
+    """裝飾器：同一容器內參數相同、同時進行中的呼叫只執行一次"""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            return group.do(make_call_key(func.__name__, args, kwargs), func, *args, **kwargs)
+        return wrapper
+    return decorator
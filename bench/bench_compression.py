@@ -0,0 +1,134 @@
+"""db 對話記憶壓縮的離線基準測試
+
+隨機產生中文行程對話 (使用者提問 + 助理多天行程回覆，含時間、價格、交通)，
+比較各壓縮方式的壓縮率、編碼 / 解碼耗時，以及存進 DynamoDB 的讀寫單位。
+
+用法：python bench/bench_compression.py [--json 輸出檔]
+"""
+import os
+import sys
+import bz2
+import json
+import lzma
+import math
+import time
+import zlib
+import random
+import argparse
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "db"))
+
+import memory_codec  # noqa: E402
+
+CITIES = ["東京", "大阪", "京都", "札幌", "福岡", "沖繩", "名古屋", "奈良"]
+SPOTS = ["淺草寺", "東京晴空塔", "明治神宮", "新宿御苑", "伏見稻荷大社", "清水寺", "嵐山竹林", "大阪城",
+         "道頓堀", "黑門市場", "奈良公園", "東大寺", "小樽運河", "白色戀人公園", "太宰府天滿宮", "美麗海水族館",
+         "上野公園", "築地場外市場", "澀谷十字路口", "表參道", "金閣寺", "錦市場", "心齋橋", "通天閣"]
+FOODS = ["一蘭拉麵", "壽司郎", "敘敘苑燒肉", "蟹道樂", "Afuri 柚子鹽拉麵", "天丼金子半之助", "章魚燒", "湯豆腐",
+         "抹茶聖代", "和牛壽喜燒", "大阪燒", "鰻魚飯", "味噌拉麵", "海膽丼"]
+TRANSPORT = ["搭乘 JR 山手線", "轉乘地鐵銀座線", "步行約 10 分鐘", "搭計程車約 15 分鐘", "搭乘京阪電車", "搭乘市營巴士"]
+ASKS = ["幫我規劃{city}{days}天{people}人的行程", "第{day}天可以改成比較輕鬆的安排嗎？", "{spot}附近有什麼好吃的？",
+        "預算大概每人{budget}日圓，可以嗎？", "明天{city}的天氣如何？", "可以幫我把行程做成 PDF 嗎？"]
+
+
+def transcript(target_bytes, rng):
+    """產生約 target_bytes 大小的對話 (UTF-8)"""
+    lines, size = [], 0
+    while size < target_bytes:
+        city = rng.choice(CITIES)
+        ask = rng.choice(ASKS).format(city=city, days=rng.randint(2, 7), people=rng.randint(1, 6),
+                                      day=rng.randint(1, 5), spot=rng.choice(SPOTS), budget=rng.randint(3, 30) * 1000)
+        reply = [f"好的，以下是{city}的建議安排："]
+        for day in range(1, rng.randint(2, 5)):
+            stops = rng.sample(SPOTS, 3)
+            reply.append(
+                f"第{day}天：{rng.randint(8, 10)}:{rng.choice(['00', '30'])} 出發，{rng.choice(TRANSPORT)}前往{stops[0]}，"
+                f"午餐推薦{rng.choice(FOODS)} (約 {rng.randint(8, 40) * 100} 日圓)，下午逛{stops[1]}，"
+                f"傍晚{rng.choice(TRANSPORT)}到{stops[2]}，晚餐吃{rng.choice(FOODS)}。")
+        reply.append(f"交通費每人約 {rng.randint(5, 60) * 100} 日圓，住宿建議選在{rng.choice(SPOTS)}附近。")
+        turn = f"使用者：{ask}\n助理：" + "\n".join(reply)
+        lines.append(turn)
+        size += len(turn.encode("utf-8")) + 1
+    return "\n".join(lines)
+
+
+CODECS = {
+    "zlib-1": (lambda b: zlib.compress(b, 1), zlib.decompress),
+    "zlib-6": (lambda b: zlib.compress(b, 6), zlib.decompress),
+    "zlib-9": (lambda b: zlib.compress(b, 9), zlib.decompress),
+    "bz2-9": (lambda b: bz2.compress(b, 9), bz2.decompress),
+    "lzma-1": (lambda b: lzma.compress(b, preset=1), lzma.decompress),
+}
+try:
+    import zstandard
+    CODECS["zstd-3"] = (zstandard.ZstdCompressor(level=3).compress, zstandard.ZstdDecompressor().decompress)
+except ImportError:
+    pass
+
+
+def timed(fn, arg, repeats):
+    best = float("inf")
+    for _ in range(repeats):
+        start = time.perf_counter()
+        result = fn(arg)
+        best = min(best, time.perf_counter() - start)
+    return result, best * 1000
+
+
+def bench(sizes, repeats, seed=11):
+    rng = random.Random(seed)
+    results = []
+    for target in sizes:
+        text = transcript(target, rng)
+        raw = text.encode("utf-8")
+        row = {"raw_bytes": len(raw), "raw_wcu": math.ceil(len(raw) / 1024), "raw_rcu": math.ceil(len(raw) / 4096), "codecs": {}}
+        for name, (compress, decompress) in CODECS.items():
+            packed, enc_ms = timed(compress, raw, repeats)
+            unpacked, dec_ms = timed(decompress, packed, repeats)
+            assert unpacked == raw
+            row["codecs"][name] = {
+                "bytes": len(packed),
+                "ratio": round(len(raw) / len(packed), 2),
+                "encode_ms": round(enc_ms, 3),
+                "decode_ms": round(dec_ms, 3),
+            }
+        # 實際存進去的格式 (含版本標記與切 chunk)
+        stored, enc_ms = timed(memory_codec.encode, text, repeats)
+        _, dec_ms = timed(memory_codec.decode, stored, repeats)
+        stored_bytes = len(stored) if isinstance(stored, bytes) else len(stored.encode("utf-8"))
+        row["stored"] = {
+            "bytes": stored_bytes,
+            "wcu": math.ceil(stored_bytes / 1024),
+            "rcu": math.ceil(stored_bytes / 4096),
+            "chunks": len(memory_codec.split(stored)) if isinstance(stored, bytes) else 1,
+            "encode_ms": round(enc_ms, 3),
+            "decode_ms": round(dec_ms, 3),
+        }
+        results.append(row)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--json", help="結果另存成 JSON 檔")
+    parser.add_argument("--repeats", type=int, default=5)
+    args = parser.parse_args()
+
+    results = bench([2 * 1024, 20 * 1024, 100 * 1024, 400 * 1024, 1024 * 1024], args.repeats)
+
+    print(f"{'raw KB':>8} {'codec':>8} {'ratio':>7} {'enc ms':>8} {'dec ms':>8}")
+    for row in results:
+        for name, c in row["codecs"].items():
+            print(f"{row['raw_bytes'] / 1024:>8.1f} {name:>8} {c['ratio']:>7} {c['encode_ms']:>8} {c['decode_ms']:>8}")
+        s = row["stored"]
+        print(f"{'':>8} {'stored':>8} WCU {row['raw_wcu']} → {s['wcu']}, RCU {row['raw_rcu']} → {s['rcu']}, "
+              f"{s['chunks']} item(s), enc {s['encode_ms']} ms, dec {s['decode_ms']} ms")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
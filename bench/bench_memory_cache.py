@@ -0,0 +1,149 @@
+"""db 記憶快取的離線基準測試 (DynamoDB 用 bench/stubs.py 的記憶體替身，每次呼叫約 8 ms)
+
+1. 模擬 Agent 的對話節奏：每輪追加一次對話，中間反覆呼叫 /get_memory，
+   比較快取開 / 關時的 DynamoDB 呼叫次數與延遲，並確認兩邊讀到的內容完全相同。
+2. 讀取使用者最近的 N 個 session：/list_sessions + /get_memories 對上逐筆 /get_memory。
+3. 兩個容器 (各自的快取) 輪流寫入與讀取，確認讀到的永遠是另一個容器剛寫的最新內容。
+
+DynamoDB 替身跟 boto3 一樣把數字讀回成 Decimal，回傳內容要能 json.dumps。
+
+用法：python bench/bench_memory_cache.py [--turns 30] [--reads 3] [--sessions 20] [--latency-scale 1.0]
+"""
+import os
+import sys
+import json
+import time
+import argparse
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(os.path.dirname(ROOT), "layer", "python"))
+
+import stubs  # noqa: E402
+import run_bench  # noqa: E402
+
+
+def call(db, path, user_id="U-bench", session_id="S-bench", **params):
+    params = dict(userId=user_id, **({"sessionId": session_id} if session_id else {}), **params)
+    event = {
+        "actionGroup": "memory",
+        "apiPath": path,
+        "httpMethod": "POST",
+        "requestBody": {"content": {"application/json": {"properties": [
+            {"name": k, "value": v} for k, v in params.items()]}}},
+    }
+    res = db.lambda_handler(event, stubs.FakeContext())
+    return json.loads(res["response"]["responseBody"]["application/json"]["body"])
+
+
+def reset_calls(db):
+    db.table().calls.clear()
+    stubs.dynamodb.calls.clear()
+
+
+def dynamo_calls(db):
+    calls = dict(db.table().calls)
+    calls.update(stubs.dynamodb.calls)
+    return calls
+
+
+def conversation(db, session_id, turns, reads):
+    """回傳 (讀取延遲清單, 每次讀到的 history)"""
+    latencies, histories = [], []
+    call(db, "/save_memory", session_id=session_id, conversation="使用者：幫我規劃東京三天\n助理：好的。")
+    for i in range(turns):
+        call(db, "/append_turn", session_id=session_id, turn=f"使用者：第{i + 1}個問題\n助理：第{i + 1}個回答")
+        if i % 10 == 9:
+            call(db, "/save_summary", session_id=session_id, summary=f"摘要到第{i + 1}輪")
+        for _ in range(reads):
+            start = time.perf_counter()
+            res = call(db, "/get_memory", session_id=session_id, lastN="8")
+            latencies.append((time.perf_counter() - start) * 1000)
+            histories.append((res["history"], res["summary"]))
+    return latencies, histories
+
+
+def run_conversation(db, ttl, turns, reads):
+    db.memory_cache = db.MemoryCache(ttl=ttl)
+    reset_calls(db)
+    latencies, histories = conversation(db, f"S-conv-{ttl}", turns, reads)
+    return {
+        "calls": dynamo_calls(db),
+        "read_mean_ms": round(sum(latencies) / len(latencies), 2),
+        "read_p95_ms": round(run_bench.percentile(latencies, 0.95), 2),
+    }, histories
+
+
+def run_sessions(db, sessions):
+    db.memory_cache = db.MemoryCache(ttl=0)
+    user_id = "U-many"
+    for i in range(sessions):
+        call(db, "/save_memory", user_id=user_id, session_id=f"S{i:03d}", conversation=f"第{i}次旅行的對話")
+
+    result = {}
+    reset_calls(db)
+    start = time.perf_counter()
+    listed = call(db, "/list_sessions", user_id=user_id, session_id=None, limit=str(sessions))
+    for s in listed["sessions"]:
+        call(db, "/get_memory", user_id=user_id, session_id=s["sessionId"])
+    result["get_memory_each"] = {"ms": round((time.perf_counter() - start) * 1000, 2), "calls": dynamo_calls(db)}
+
+    reset_calls(db)
+    start = time.perf_counter()
+    memories = call(db, "/get_memories", user_id=user_id, session_id=None, limit=str(sessions))
+    result["get_memories"] = {"ms": round((time.perf_counter() - start) * 1000, 2), "calls": dynamo_calls(db)}
+    assert len(memories["memories"]) == len(listed["sessions"]) == sessions
+    return result
+
+
+def run_cross_container(db, other, rounds=5):
+    """db 與 other 是兩份各自載入的模組 (兩個容器)，共用同一個 DynamoDB 替身"""
+    db.memory_cache = db.MemoryCache(ttl=30)
+    other.memory_cache = other.MemoryCache(ttl=30)
+    session_id = "S-cross"
+    call(db, "/save_memory", session_id=session_id, conversation="使用者：幫我規劃大阪兩天\n助理：好的。")
+    for i in range(rounds):
+        writer, reader = (db, other) if i % 2 == 0 else (other, db)
+        call(reader, "/get_memory", session_id=session_id, lastN="3")
+        turn = f"使用者：第{i + 1}個問題\n助理：第{i + 1}個回答"
+        call(writer, "/append_turn", session_id=session_id, turn=turn)
+        history = call(reader, "/get_memory", session_id=session_id, lastN="3")["history"]
+        assert history.endswith(turn), "讀到另一個容器寫入之前的舊內容"
+    return {"rounds": rounds}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--turns", type=int, default=30)
+    parser.add_argument("--reads", type=int, default=3, help="每輪之間 /get_memory 的次數")
+    parser.add_argument("--sessions", type=int, default=20)
+    parser.add_argument("--latency-scale", type=float, default=1.0)
+    parser.add_argument("--json", help="結果另存成 JSON 檔")
+    args = parser.parse_args()
+
+    os.environ.update(run_bench.BENCH_ENV)
+    stubs.install_aws_stand_ins(args.latency_scale, decimal_numbers=True)
+    db = run_bench.load_lambda("db")
+
+    report = {}
+    report["cache_off"], off = run_conversation(db, 0, args.turns, args.reads)
+    report["cache_on"], on = run_conversation(db, 30, args.turns, args.reads)
+    report["cache_on"]["stats"] = db.memory_cache.stats()
+    assert on == off, "快取開 / 關讀到的內容不同"
+    report["sessions"] = run_sessions(db, args.sessions)
+    report["cross_container"] = run_cross_container(db, run_bench.load_lambda("db"))
+
+    for name in ("cache_off", "cache_on"):
+        r = report[name]
+        print(f"{name:>10}: /get_memory mean {r['read_mean_ms']} ms, p95 {r['read_p95_ms']} ms, DynamoDB {r['calls']}")
+    for name, r in report["sessions"].items():
+        print(f"{name:>16}: {args.sessions} sessions {r['ms']} ms, DynamoDB {r['calls']}")
+    print(f"cross_container: {report['cross_container']['rounds']} 輪互相寫入後讀取，沒有讀到舊內容")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+"""PDF 轉檔後端的基準測試：同一份 template.html，比較各後端在不同行程長度下的轉檔時間與檔案大小
+
+- 行程長度：1、3、7、14 天 (每天 3~5 個景點，加上交通、預算、注意事項)
+- first_ms：後端建立後的第一次轉檔 (含字型載入)，其餘為暖機後的 p50 / p95
+- 每個後端都是真的轉檔：wkhtmltopdf 需要執行檔 (--wkhtmltopdf)，weasyprint 需要套件與 pango；
+  沒裝的後端會略過
+
+用法：python bench/bench_pdf_render.py [-n 5] [--renderers wkhtmltopdf,weasyprint] [--font NotoSansTC-Regular.ttf] [--out-dir /tmp/pdf]
+"""
+import os
+import sys
+import json
+import time
+import random
+import argparse
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+PDF_DIR = os.path.join(os.path.dirname(ROOT), "PDF")
+sys.path.insert(0, ROOT)
+sys.path.insert(0, PDF_DIR)
+
+import renderers  # noqa: E402
+from run_bench import PLACES  # noqa: E402
+
+DAYS = [1, 3, 7, 14]
+
+
+def itinerary(days, rng):
+    return {
+        "title": f"東京 {days} 日遊",
+        "style": "混合型",
+        "days": [
+            {
+                "day_number": d, "date": f"2026-11-{d:02d}",
+                "activities": [{"time": f"{9 + i * 2:02d}:00", "location": rng.choice(PLACES),
+                                "description": "參觀與拍照，建議停留兩小時，附近有許多在地小吃可以順路品嚐。"}
+                               for i in range(rng.randint(3, 5))],
+            }
+            for d in range(1, days + 1)
+        ],
+        "transportation": ["東京地鐵 72 小時券", "JR 山手線", "機場利木津巴士"],
+        "budget_info": ["住宿：每晚約 NT$4,500", "交通：約 NT$1,200", "餐飲：每日約 NT$1,500"],
+        "reminders": ["寺廟參拜請保持安靜", "記得攜帶護照", "部分店家只收現金"],
+    }
+
+
+def render_html(data, font_path):
+    from jinja2 import Environment, FileSystemLoader
+    env = Environment(loader=FileSystemLoader(PDF_DIR))
+    env.globals["font_path"] = font_path
+    return env.get_template("template.html").render(**data)
+
+
+def bench_backend(backend, docs, n):
+    rows = {}
+    for days, html in docs.items():
+        samples, size = [], 0
+        for _ in range(n):
+            start = time.perf_counter()
+            pdf = backend.render(html)
+            samples.append((time.perf_counter() - start) * 1000)
+            size = len(pdf)
+        warm = sorted(samples[1:] or samples)
+        rows[days] = {
+            "first_ms": round(samples[0], 1),
+            "p50_ms": round(warm[len(warm) // 2], 1),
+            "p95_ms": round(warm[min(len(warm) - 1, int(len(warm) * 0.95))], 1),
+            "pdf_kb": round(size / 1024, 1),
+        }
+    return rows, pdf
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-n", type=int, default=5, help="每種長度轉檔幾次")
+    parser.add_argument("--renderers", default="wkhtmltopdf,weasyprint")
+    parser.add_argument("--wkhtmltopdf", default=os.environ.get("WKHTMLTOPDF_PATH", "/opt/bin/wkhtmltopdf"))
+    parser.add_argument("--font", default=os.environ.get("PDF_FONT_PATH", "/opt/python/NotoSansTC-Regular.ttf"))
+    parser.add_argument("--out-dir", help="另存各後端最長行程的 PDF，方便目視比對版面")
+    parser.add_argument("--json", help="結果另存成 JSON 檔")
+    args = parser.parse_args()
+
+    rng = random.Random(5)
+    font = args.font if os.path.exists(args.font) else None
+    docs = {days: render_html(itinerary(days, rng), args.font) for days in DAYS}
+
+    report = {}
+    for name in args.renderers.split(","):
+        try:
+            start = time.perf_counter()
+            backend = renderers.build_renderer(name, args.wkhtmltopdf, PDF_DIR + os.sep, font)
+            setup_ms = round((time.perf_counter() - start) * 1000, 1)
+        except Exception as e:
+            print(f"[skip] {name}: {e}")
+            continue
+        rows, last_pdf = bench_backend(backend, docs, args.n)
+        report[name] = {"setup_ms": setup_ms, "days": rows}
+        if args.out_dir:
+            os.makedirs(args.out_dir, exist_ok=True)
+            with open(os.path.join(args.out_dir, f"{name}-{DAYS[-1]}days.pdf"), "wb") as f:
+                f.write(last_pdf)
+
+    print(f"{'renderer':>12} {'days':>5} {'first ms':>9} {'p50 ms':>8} {'p95 ms':>8} {'PDF KB':>8}")
+    for name, r in report.items():
+        print(f"{name:>12} setup {r['setup_ms']} ms")
+        for days, row in r["days"].items():
+            print(f"{'':>12} {days:>5} {row['first_ms']:>9} {row['p50_ms']:>8} {row['p95_ms']:>8} {row['pdf_kb']:>8}")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
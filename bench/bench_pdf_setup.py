@@ -0,0 +1,94 @@
+"""PDF Lambda 每次呼叫的轉檔前準備時間 (不含 wkhtmltopdf 本身)
+
+- before：舊版 handler 每次都做的事：兩次 os.path.exists 診斷、新建 Jinja Environment、
+  讀取並編譯 template.html、建兩次 pdfkit.configuration 與參數 dict
+- after：容器內共用的 renderer() (第一次呼叫才準備，之後直接取用)
+兩者都再加上一次 template.render，看準備時間佔整體 Jinja 階段的比例。
+
+需要安裝 jinja2；pdfkit 使用 bench/stubs.py 的替身 (不執行 wkhtmltopdf)。
+用法：python bench/bench_pdf_setup.py [-n 200]
+"""
+import os
+import sys
+import json
+import time
+import random
+import argparse
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(os.path.dirname(ROOT), "layer", "python"))
+
+import stubs  # noqa: E402
+import run_bench  # noqa: E402
+
+
+def old_setup(template_dir):
+    """舊版 lambda_handler 內的準備步驟 (照原樣搬過來)"""
+    import pdfkit
+    from jinja2 import Environment, FileSystemLoader
+    os.path.exists('/opt/bin/wkhtmltopdf')
+    os.path.exists('/opt/python/lib/python3.12/site-packages/NotoSansTC-Regular.ttf')
+    env = Environment(loader=FileSystemLoader(template_dir))
+    template = env.get_template('template.html')
+    pdfkit.configuration(wkhtmltopdf='/opt/bin/wkhtmltopdf')
+    {'encoding': "UTF-8", 'enable-local-file-access': None, 'javascript-delay': '2000',
+     'no-stop-slow-scripts': None, 'quiet': ''}
+    pdfkit.configuration(wkhtmltopdf='/opt/bin/wkhtmltopdf')
+    {'encoding': "UTF-8", 'enable-local-file-access': None, 'quiet': ''}
+    return template
+
+
+def measure(fn, n):
+    samples = []
+    for _ in range(n):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    # 第一次另外列出 (after 的準備成本都在這一次)，其餘看暖機後的分布
+    warm = sorted(samples[1:] or samples)
+    return {
+        "first_ms": round(samples[0], 3),
+        "p50_ms": round(warm[len(warm) // 2], 4),
+        "p95_ms": round(warm[min(len(warm) - 1, int(len(warm) * 0.95))], 4),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-n", type=int, default=200)
+    parser.add_argument("--json", help="結果另存成 JSON 檔")
+    args = parser.parse_args()
+
+    try:
+        import jinja2  # noqa: F401
+    except ImportError:
+        sys.exit("需要先安裝 jinja2")
+
+    os.environ.update(run_bench.BENCH_ENV)
+    stubs.install_aws_stand_ins(0.0)
+    pdf = run_bench.load_lambda("PDF")
+    template_dir = os.path.dirname(pdf.__file__)
+
+    _, event = run_bench.pdf_event(random.Random(7))
+    raw = event["parameters"][0]["value"]
+    context = pdf.render_context(json.loads(raw[raw.find("{"):raw.rfind("}") + 1]))
+
+    report = {
+        "before_setup": measure(lambda: old_setup(template_dir), args.n),
+        "after_setup": measure(pdf.renderer, args.n),
+        "before_setup_render": measure(lambda: old_setup(template_dir).render(**context), args.n),
+        "after_setup_render": measure(lambda: pdf.renderer()["template"].render(**context), args.n),
+    }
+
+    print(f"{'':>20} {'first ms':>10} {'p50 ms':>10} {'p95 ms':>10}")
+    for name, r in report.items():
+        print(f"{name:>20} {r['first_ms']:>10} {r['p50_ms']:>10} {r['p95_ms']:>10}")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
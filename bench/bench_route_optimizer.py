@@ -0,0 +1,102 @@
+"""optimize_route 的離線基準測試
+
+1. 用錄好的 Distance Matrix 回應 (fixtures/) 重播，確認排序結果
+2. 隨機產生 N 個地點的矩陣，量測 solve() 耗時與 2-opt 相對最近鄰的改善幅度
+
+用法：python bench/bench_route_optimizer.py [--json 輸出檔]
+"""
+import os
+import sys
+import json
+import time
+import math
+import random
+import argparse
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "api"))
+
+import route_optimizer  # noqa: E402
+
+FIXTURE = os.path.join(ROOT, "bench", "fixtures", "distancematrix_tokyo_driving.json")
+
+
+def replay_fixture():
+    with open(FIXTURE, encoding="utf-8") as f:
+        response = json.load(f)
+    places = response["_recorded"]["places"]
+    n = len(places)
+    durations = route_optimizer.empty_matrix(n)
+    distances = route_optimizer.empty_matrix(n)
+    route_optimizer.fill_matrix(durations, distances, response, 0, 0)
+
+    naive_cost = route_optimizer.path_cost(list(range(n)), durations)
+    order, cost = route_optimizer.solve(durations)
+    return {
+        "places": [places[i] for i in order],
+        "input_order_minutes": round(naive_cost / 60, 1),
+        "optimized_minutes": round(cost / 60, 1),
+    }
+
+
+def random_matrix(n, rng):
+    # 東京 23 區範圍內的隨機點，車速約 20 km/h，去回程略有差異
+    points = [(rng.uniform(35.60, 35.78), rng.uniform(139.65, 139.85)) for _ in range(n)]
+    matrix = route_optimizer.empty_matrix(n)
+    for i, (lat1, lon1) in enumerate(points):
+        for j, (lat2, lon2) in enumerate(points):
+            if i != j:
+                meters = math.hypot((lat1 - lat2) * 111000, (lon1 - lon2) * 91000) * 1.35
+                matrix[i][j] = int(meters / 5.6 * rng.uniform(0.9, 1.1)) + 120
+    return matrix
+
+
+def bench_solve(sizes, repeats, seed=7):
+    rng = random.Random(seed)
+    results = []
+    for n in sizes:
+        timings, gains = [], []
+        for _ in range(repeats):
+            matrix = random_matrix(n, rng)
+            nn_cost = route_optimizer.path_cost(route_optimizer.nearest_neighbour(matrix), matrix)
+            start = time.perf_counter()
+            _, cost = route_optimizer.solve(matrix)
+            timings.append((time.perf_counter() - start) * 1000)
+            gains.append((nn_cost - cost) / nn_cost * 100)
+        timings.sort()
+        results.append({
+            "n": n,
+            "requests_pairwise": n * (n - 1),
+            "requests_matrix": len(route_optimizer.chunk_ranges(n)) ** 2,
+            "solve_ms_p50": round(timings[len(timings) // 2], 2),
+            "solve_ms_max": round(timings[-1], 2),
+            "two_opt_gain_pct": round(sum(gains) / len(gains), 1),
+        })
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--json", help="結果另存成 JSON 檔")
+    parser.add_argument("--repeats", type=int, default=5)
+    args = parser.parse_args()
+
+    report = {
+        "fixture": replay_fixture(),
+        "solve": bench_solve([5, 10, 15, 20, 25, 40], args.repeats),
+    }
+
+    print("Fixture replay:", " → ".join(report["fixture"]["places"]))
+    print(f"  input order {report['fixture']['input_order_minutes']} min, optimized {report['fixture']['optimized_minutes']} min")
+    print(f"{'N':>4} {'pairwise':>9} {'matrix':>7} {'p50 ms':>9} {'max ms':>9} {'2-opt gain':>11}")
+    for r in report["solve"]:
+        print(f"{r['n']:>4} {r['requests_pairwise']:>9} {r['requests_matrix']:>7} "
+              f"{r['solve_ms_p50']:>9} {r['solve_ms_max']:>9} {r['two_opt_gain_pct']:>10}%")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
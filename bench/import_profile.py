@@ -0,0 +1,106 @@
+"""各 Lambda 的冷啟動 import 時間分析 (python -X importtime)
+
+對每個 Lambda 另開 Python 行程 import lambda_function，列出總時間與最耗時的模組，
+並比較預設 (延後載入) 與 EAGER_INIT=1 / XRAY_PATCH_ALL=1 的差異。
+本機沒裝的 AWS 套件會換成 stubs 的替身，要量真實成本請在 Lambda 的 Python 映像內執行。
+
+用法：python bench/import_profile.py [--top 15] [--json 輸出檔]
+"""
+import os
+import sys
+import json
+import argparse
+import subprocess
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(BENCH_DIR)
+
+LAMBDAS = ["api", "linebot", "db", "PDF"]
+MODES = {
+    "lazy": {},
+    "eager": {"EAGER_INIT": "1"},
+    "eager+xray": {"EAGER_INIT": "1", "XRAY_PATCH_ALL": "1"},
+}
+
+# 子行程：只替換本機沒有的套件，再 import 指定的 lambda_function
+CHILD = r"""
+import importlib.util, sys, time
+sys.path[:0] = [{bench!r}, {layer!r}, {folder!r}]
+import stubs
+missing = [m for m in ("boto3", "aws_xray_sdk", "pdfkit") if importlib.util.find_spec(m) is None]
+if missing:
+    stubs.install_aws_stand_ins()
+sys.stderr.write("--- lambda import start ---\n")
+sys.stderr.flush()
+start = time.perf_counter()
+spec = importlib.util.spec_from_file_location("lambda_function", {path!r})
+module = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(module)
+print((time.perf_counter() - start) * 1000)
+"""
+
+
+def profile(name, extra_env):
+    folder = os.path.join(ROOT, name)
+    code = CHILD.format(bench=BENCH_DIR, layer=os.path.join(ROOT, "layer", "python"),
+                        folder=folder, path=os.path.join(folder, "lambda_function.py"))
+    env = {**os.environ, **extra_env}
+    out = subprocess.run([sys.executable, "-X", "importtime", "-c", code],
+                         capture_output=True, text=True, env=env)
+    if out.returncode != 0:
+        return {"error": (out.stderr.strip().splitlines() or ["failed"])[-1]}
+
+    # 只計算 lambda_function 自己帶進來的模組，不含量測工具本身
+    stderr = out.stderr.split("--- lambda import start ---", 1)[-1]
+    modules = []
+    for line in stderr.splitlines():
+        # 格式：import time:  self [us] | cumulative | imported package
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, package = line[len("import time:"):].split("|")
+        modules.append((package.rstrip(), int(self_us), int(cumulative_us)))
+
+    top_level = [m for m in modules if not m[0].startswith("  ")]
+    return {
+        # init_ms：整個模組初始化的實際耗時 (含 EAGER_INIT 建立 client)；import_ms：只算 import
+        "init_ms": round(float(out.stdout.strip().splitlines()[-1]), 2),
+        "import_ms": round(sum(m[2] for m in top_level) / 1000, 2),
+        "modules": len(modules),
+        "top": [{"module": m[0].strip(), "cumulative_ms": round(m[2] / 1000, 2), "self_ms": round(m[1] / 1000, 2)}
+                for m in sorted(modules, key=lambda m: m[2], reverse=True)],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--top", type=int, default=10)
+    parser.add_argument("--json", help="結果另存成 JSON 檔")
+    args = parser.parse_args()
+
+    report = {}
+    for name in LAMBDAS:
+        report[name] = {}
+        for mode, env in MODES.items():
+            result = profile(name, env)
+            if "top" in result:
+                result["top"] = result["top"][:args.top]
+            report[name][mode] = result
+
+    for name, modes in report.items():
+        print(f"== {name} ==")
+        for mode, result in modes.items():
+            if "error" in result:
+                print(f"  {mode:<11} error: {result['error']}")
+                continue
+            print(f"  {mode:<11} init {result['init_ms']:>8} ms  import {result['import_ms']:>8} ms  ({result['modules']} modules)")
+        lazy = modes["lazy"]
+        for entry in lazy.get("top", []):
+            print(f"      {entry['cumulative_ms']:>8} ms  {entry['module']}")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,356 @@
+"""四個 Lambda 的離線重播基準測試
+
+上游 API 由 stubs.StubUpstream 回放錄好的 fixtures (可注入延遲)，AWS 服務換成記憶體替身。
+量測每個 function 的 p50/p95/p99、並行下的吞吐量、冷啟動 import 時間，結果存成 JSON 方便跨 commit 比較。
+
+用法：
+    python bench/run_bench.py                         # 全部 Lambda，結果寫到 bench/results/latest.json
+    python bench/run_bench.py --lambdas api,db -n 200 --concurrency 1,8
+    python bench/run_bench.py --compare bench/results/<舊的>.json
+"""
+import os
+import sys
+import json
+import time
+import hmac
+import base64
+import random
+import hashlib
+import logging
+import argparse
+import contextlib
+import importlib.util
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, BENCH_DIR)
+sys.path.insert(0, os.path.join(ROOT, "layer", "python"))
+
+import stubs  # noqa: E402
+
+LAMBDAS = ["api", "linebot", "db", "PDF"]
+
+# 沒有替身、必須真的安裝的套件 (PDF 在 handler 內才 import，要先檢查)
+REQUIRES = {"PDF": ["jinja2"]}
+
+BENCH_ENV = {
+    "GOOGLE_API_KEY": "bench-google-key",
+    "OPENWEATHER_API_KEY": "bench-ow-key",
+    "TRIPADVISOR_API_KEY": "bench-ta-key",
+    "CHANNEL_SECRET": "bench-channel-secret",
+    "CHANNEL_ACCESS_TOKEN": "bench-access-token",
+    # pdfkit 是替身，不會真的執行；只要路徑存在就能通過 PDF Lambda 的啟動檢查
+    "WKHTMLTOPDF_PATH": sys.executable,
+}
+
+
+def load_lambda(name):
+    """用不同的模組名稱載入各資料夾的 lambda_function.py，避免互相覆蓋"""
+    folder = os.path.join(ROOT, name)
+    if folder not in sys.path:
+        sys.path.insert(0, folder)
+    spec = importlib.util.spec_from_file_location(f"{name}_lambda_function", os.path.join(folder, "lambda_function.py"))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    # Lambda 會把 root logger 設成 INFO；基準測試時只留警告以上，避免輸出拖慢量測
+    logging.getLogger().setLevel(logging.WARNING)
+    return module
+
+
+# ==========================================
+# 1. 各 Lambda 的事件組合
+# ==========================================
+PLACES = ["東京車站", "淺草寺", "東京晴空塔", "上野公園", "明治神宮", "築地場外市場", "新宿御苑", "澀谷十字路口"]
+CITIES = ["東京", "大阪", "京都", "札幌", "福岡", "東京車站", "新宿"]
+USER_TEXTS = [
+    "地區：東京\n天數：3\n人數：2",
+    "東京車站 詳細資訊",
+    "明天京都天氣如何？",
+    "幫我找淺草附近的拉麵",
+    "行程規劃使用規則",
+    "地點詳情查詢規則",
+    "幫我生成PDF",
+]
+
+
+def _bedrock_params(**kwargs):
+    return [{"name": k, "value": v} for k, v in kwargs.items()]
+
+
+def api_event(rng):
+    kind = rng.choices(
+        ["get_weather", "search_places", "get_place_details", "get_directions",
+         "search_hotels_by_name", "optimize_route", "batch_calls"],
+        weights=[30, 25, 15, 15, 5, 5, 5])[0]
+    if kind == "get_weather":
+        params = _bedrock_params(location=rng.choice(CITIES))
+    elif kind == "search_places":
+        params = _bedrock_params(keyword=rng.choice(["拉麵", "壽司", "咖啡廳", "燒肉"]), location=rng.choice(CITIES))
+    elif kind == "get_place_details":
+        params = _bedrock_params(place_id=f"ChIJ-bench-{rng.randint(1, 40)}")
+    elif kind == "get_directions":
+        a, b = rng.sample(PLACES, 2)
+        params = _bedrock_params(origin=a, destination=b, mode=rng.choice(["driving", "transit", "walking"]))
+    elif kind == "search_hotels_by_name":
+        params = _bedrock_params(locationName=rng.choice(CITIES))
+    elif kind == "optimize_route":
+        params = _bedrock_params(places="、".join(rng.sample(PLACES, rng.randint(3, 8))))
+    else:
+        calls = [
+            {"function": "get_weather", "parameters": {"location": rng.choice(CITIES)}},
+            {"function": "search_places", "parameters": {"keyword": "景點", "location": rng.choice(CITIES)}},
+            {"function": "get_directions", "parameters": dict(zip(["origin", "destination"], rng.sample(PLACES, 2)))},
+        ]
+        params = _bedrock_params(calls=json.dumps(calls, ensure_ascii=False))
+    return kind, {"actionGroup": "travel-tools", "function": kind, "parameters": params}
+
+
+# 送過的事件，用來模擬 LINE 逾時重送 (同一個 webhookEventId，isRedelivery = true)
+_sent_events = []
+
+
+def linebot_event(rng):
+    if _sent_events and rng.random() < 0.1:
+        events = [dict(rng.choice(_sent_events), deliveryContext={"isRedelivery": True})]
+        return "webhook_redelivery", _signed_webhook(events)
+    events = []
+    for _ in range(rng.choice([1, 1, 1, 2, 3])):
+        user = f"U{rng.randint(1, 50):032d}"
+        events.append({
+            "type": "message",
+            "webhookEventId": f"01H{rng.getrandbits(64):016X}",
+            "deliveryContext": {"isRedelivery": False},
+            "timestamp": int(time.time() * 1000),
+            "replyToken": f"{rng.getrandbits(128):032x}",
+            "source": {"type": "user", "userId": user},
+            "message": {"type": "text", "id": str(rng.getrandbits(60)), "text": rng.choice(USER_TEXTS)},
+        })
+    _sent_events.extend(events)
+    del _sent_events[:-200]
+    return "webhook_x%d" % len(events), _signed_webhook(events)
+
+
+def _signed_webhook(events):
+    body = json.dumps({"destination": "Ubench", "events": events}, ensure_ascii=False)
+    signature = base64.b64encode(
+        hmac.new(BENCH_ENV["CHANNEL_SECRET"].encode(), body.encode("utf-8"), hashlib.sha256).digest()).decode()
+    return {"body": body, "isBase64Encoded": False, "headers": {"x-line-signature": signature}}
+
+
+def _turn_text(rng):
+    return f"使用者：{rng.choice(USER_TEXTS)}\n助理：好的，幫您安排{rng.choice(PLACES)}。"
+
+
+def db_event(rng):
+    user = f"U{rng.randint(1, 50):032d}"
+    session = f"S{rng.randint(1, 5)}"
+    path = rng.choices(["/get_memory", "/save_memory", "/append_turn"], weights=[50, 15, 35])[0]
+    props = [{"name": "userId", "value": user}, {"name": "sessionId", "value": session}]
+    if path == "/save_memory":
+        turns = rng.randint(2, 30)
+        convo = "\n".join(_turn_text(rng) for _ in range(turns))
+        props.append({"name": "conversation", "value": convo})
+    elif path == "/append_turn":
+        props.append({"name": "turn", "value": _turn_text(rng)})
+    return path, {
+        "actionGroup": "memory", "apiPath": path, "httpMethod": "POST",
+        "requestBody": {"content": {"application/json": {"properties": props}}},
+    }
+
+
+_sent_itineraries = []
+
+
+def pdf_event(rng):
+    # 使用者常常對同一份行程再要一次 PDF
+    if _sent_itineraries and rng.random() < 0.3:
+        return "generate_pdf_again", rng.choice(_sent_itineraries)
+    days = []
+    for d in range(1, rng.randint(2, 5) + 1):
+        days.append({
+            "day_number": d, "date": f"2026-11-{d:02d}",
+            "activities": [{"time": f"{9 + i * 2:02d}:00", "location": rng.choice(PLACES), "description": "參觀與拍照，建議停留兩小時。"}
+                           for i in range(rng.randint(3, 5))],
+        })
+    itinerary = {
+        "title": f"東京 {len(days)} 日遊", "style": "混合型", "days": days,
+        "transportation": ["東京地鐵 72 小時券", "JR 山手線"],
+        "budget_info": ["住宿：每晚約 NT$4,500", "交通：約 NT$1,200"],
+        "reminders": ["寺廟參拜請保持安靜", "記得攜帶護照"],
+    }
+    raw = "```json\n" + json.dumps(itinerary, ensure_ascii=False) + "\n```"
+    event = {
+        "actionGroup": "pdf", "function": "generate_pdf",
+        "parameters": [{"name": "itinerary_content", "value": raw}],
+        "sessionAttributes": {"line_user_id": f"U{rng.randint(1, 50):032d}"},
+    }
+    _sent_itineraries.append(event)
+    del _sent_itineraries[:-50]
+    return "generate_pdf", event
+
+
+EVENT_MIX = {"api": api_event, "linebot": linebot_event, "db": db_event, "PDF": pdf_event}
+
+
+# ==========================================
+# 2. 量測
+# ==========================================
+def percentile(values, p):
+    if not values:
+        return None
+    ordered = sorted(values)
+    return round(ordered[min(len(ordered) - 1, int(len(ordered) * p))], 2)
+
+
+def summarize(samples):
+    return {
+        "n": len(samples),
+        "mean_ms": round(sum(samples) / len(samples), 2),
+        "p50_ms": percentile(samples, 0.50),
+        "p95_ms": percentile(samples, 0.95),
+        "p99_ms": percentile(samples, 0.99),
+    }
+
+
+def invoke(module, event):
+    start = time.perf_counter()
+    module.lambda_handler(event, stubs.FakeContext())
+    return (time.perf_counter() - start) * 1000
+
+
+def run_latency(name, module, n, seed):
+    rng = random.Random(seed)
+    samples = {}
+    for _ in range(n):
+        kind, event = EVENT_MIX[name](rng)
+        samples.setdefault(f"{name}:{kind}", []).append(invoke(module, event))
+    return {key: summarize(values) for key, values in sorted(samples.items())}
+
+
+def run_throughput(name, n, concurrency, seed):
+    """每個並行數都從同樣的初始狀態開始：重新載入 Lambda (容器內的快取、去重紀錄都是空的)、
+    清空替身裡的資料，事件也用各自的 seed，不會重播前一輪的事件而全部變成快取命中或重送"""
+    stubs.reset_state()
+    _sent_events.clear()
+    _sent_itineraries.clear()
+    module = load_lambda(name)
+    rng = random.Random(seed)
+    events = [EVENT_MIX[name](rng)[1] for _ in range(n)]
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(lambda e: invoke(module, e), events))
+    elapsed = time.perf_counter() - start
+    return round(n / elapsed, 2)
+
+
+def measure_cold_start(name, repeats=3):
+    """另開 Python 行程 import lambda_function，量測冷啟動的 import 時間"""
+    timings = []
+    for _ in range(repeats):
+        out = subprocess.run([sys.executable, __file__, "--import-only", name],
+                             capture_output=True, text=True, env={**os.environ, **BENCH_ENV})
+        if out.returncode != 0:
+            return {"error": (out.stderr.strip().splitlines() or ["import failed"])[-1]}
+        timings.append(float(out.stdout.strip().splitlines()[-1]))
+    return {"p50_ms": percentile(timings, 0.5), "max_ms": round(max(timings), 2)}
+
+
+def import_only(name):
+    stubs.install_aws_stand_ins()
+    start = time.perf_counter()
+    load_lambda(name)
+    print(round((time.perf_counter() - start) * 1000, 2))
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT,
+                              capture_output=True, text=True).stdout.strip()
+    except OSError:
+        return None
+
+
+def compare(report, baseline_path):
+    with open(baseline_path, encoding="utf-8") as f:
+        baseline = json.load(f)
+    print(f"\n--- 與 {baseline.get('commit')} 比較 (p50 / p95, 負值代表變快) ---")
+    for key, now in report["latency"].items():
+        before = baseline.get("latency", {}).get(key)
+        if not before:
+            continue
+        d50 = now["p50_ms"] - before["p50_ms"]
+        d95 = now["p95_ms"] - before["p95_ms"]
+        print(f"{key:<40} {d50:+9.1f} ms {d95:+9.1f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--lambdas", default=",".join(LAMBDAS))
+    parser.add_argument("-n", "--requests", type=int, default=100, help="每個 Lambda 的請求數")
+    parser.add_argument("--concurrency", default="1,8", help="吞吐量測試的並行數，逗號分隔")
+    parser.add_argument("--latency-scale", type=float, default=1.0, help="上游延遲倍率 (0 = 不加延遲)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--out", default=os.path.join(BENCH_DIR, "results", "latest.json"))
+    parser.add_argument("--compare", help="要比較的舊結果 JSON")
+    parser.add_argument("--import-only", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    os.environ.update(BENCH_ENV)
+    if args.import_only:
+        import_only(args.import_only)
+        return
+
+    stubs.install_aws_stand_ins(args.latency_scale)
+    upstream = stubs.StubUpstream(args.latency_scale).start()
+    http_client = stubs.route_http_client_to(upstream)
+
+    report = {
+        "commit": git_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "config": {"requests": args.requests, "concurrency": args.concurrency,
+                   "latency_scale": args.latency_scale, "seed": args.seed},
+        "latency": {}, "throughput_rps": {}, "cold_start": {}, "skipped": {},
+    }
+
+    for name in args.lambdas.split(","):
+        try:
+            for requirement in REQUIRES.get(name, []):
+                if importlib.util.find_spec(requirement) is None:
+                    raise ImportError(f"No module named '{requirement}'")
+            module = load_lambda(name)
+        except ImportError as e:
+            # 例如本機沒有 jinja2：記下原因，其他 Lambda 照跑
+            report["skipped"][name] = str(e)
+            print(f"[skip] {name}: {e}")
+            continue
+        report["cold_start"][name] = measure_cold_start(name)
+        # Lambda 內的 print 不算進量測輸出 (整段一起導掉，執行緒之間才不會互相蓋掉 stdout)
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            report["latency"].update(run_latency(name, module, args.requests, args.seed))
+            report["throughput_rps"][name] = {
+                str(c): run_throughput(name, args.requests, int(c), args.seed + 1 + i)
+                for i, c in enumerate(args.concurrency.split(","))
+            }
+
+    report["upstream"] = {"stub_requests": upstream.requests, "http_client": http_client.stats()}
+    upstream.stop()
+
+    print(f"{'function':<40} {'n':>5} {'p50':>9} {'p95':>9} {'p99':>9}")
+    for key, s in report["latency"].items():
+        print(f"{key:<40} {s['n']:>5} {s['p50_ms']:>9} {s['p95_ms']:>9} {s['p99_ms']:>9}")
+    print("throughput (req/s):", json.dumps(report["throughput_rps"]))
+    print("cold start import:", json.dumps(report["cold_start"], ensure_ascii=False))
+
+    os.makedirs(os.path.dirname(args.out), exist_ok=True)
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"saved → {args.out}")
+
+    if args.compare:
+        compare(report, args.compare)
+
+
+if __name__ == "__main__":
+    main()
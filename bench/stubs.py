@@ -0,0 +1,542 @@
+"""離線基準測試用的替身 (stand-ins)
+
+- StubUpstream：本機 HTTP 伺服器，依路徑回放 fixtures/upstream.json，可注入延遲
+- install_aws_stand_ins()：把 boto3 / botocore / aws_xray_sdk / pdfkit 換成記憶體版本，
+  讓四個 lambda_function 不連 AWS 也能執行
+"""
+import os
+import sys
+import json
+import re
+import time
+import types
+import threading
+import itertools
+from decimal import Decimal
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(BENCH_DIR)
+FIXTURE_DIR = os.path.join(BENCH_DIR, "fixtures")
+
+# 會被導到本機替身伺服器的外部 host
+UPSTREAM_HOSTS = [
+    "maps.googleapis.com",
+    "api.openweathermap.org",
+    "api.content.tripadvisor.com",
+    "api.line.me",
+]
+
+# 各路徑預設的模擬延遲 (毫秒)，大約是從東京區 Lambda 量到的中位數
+DEFAULT_LATENCY_MS = {
+    "/maps/api/": 120,
+    "/data/2.5/": 90,
+    "/api/v1/location": 250,
+    "/v2/bot/": 60,
+}
+
+
+def load_fixture(name):
+    with open(os.path.join(FIXTURE_DIR, name), encoding="utf-8") as f:
+        return json.load(f)
+
+
+# ==========================================
+# 1. 上游 API 替身
+# ==========================================
+class StubUpstream:
+    def __init__(self, latency_scale=1.0):
+        self.fixtures = load_fixture("upstream.json")
+        self.matrix = load_fixture("distancematrix_tokyo_driving.json")
+        self.latency_scale = latency_scale
+        self.requests = 0
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            # headers 與 body 分兩次送出；不關 Nagle 的話，keep-alive 的後續請求會卡在 delayed ACK 約 40 ms
+            disable_nagle_algorithm = True
+
+            def log_message(self, *args):
+                pass
+
+            def _reply(self):
+                stub.requests += 1
+                path = self.path.split("?", 1)[0]
+                time.sleep(stub.latency_for(path))
+                status, body = stub.respond(path, self.path)
+                data = json.dumps(body, ensure_ascii=False).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def do_GET(self):
+                self._reply()
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length") or 0)
+                self.rfile.read(length)
+                self._reply()
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.server.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self.server.server_port}"
+
+    def latency_for(self, path):
+        for prefix, ms in DEFAULT_LATENCY_MS.items():
+            if path.startswith(prefix):
+                return ms * self.latency_scale / 1000
+        return 0
+
+    def respond(self, path, full_path):
+        if path in self.fixtures:
+            return 200, self.fixtures[path]
+        if path.startswith("/api/v1/location/") and path.endswith("/details"):
+            return 200, self.fixtures["/api/v1/location/{id}/details"]
+        if path == "/maps/api/distancematrix/json":
+            return 200, self._matrix_for(full_path)
+        return 404, {"error": f"no fixture for {path}"}
+
+    def _matrix_for(self, full_path):
+        # 依 origins × destinations 的數量，從錄好的矩陣循環取值組成回應
+        import urllib.parse
+        query = urllib.parse.parse_qs(urllib.parse.urlsplit(full_path).query)
+        origins = query.get("origins", [""])[0].split("|")
+        dests = query.get("destinations", [""])[0].split("|")
+        rows = self.matrix["rows"]
+        size = len(rows)
+        return {
+            "origin_addresses": origins,
+            "destination_addresses": dests,
+            "rows": [{"elements": [rows[i % size]["elements"][(j + 1 + i) % size] for j in range(len(dests))]}
+                     for i in range(len(origins))],
+            "status": "OK",
+        }
+
+    def start(self):
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+
+
+def route_http_client_to(stub):
+    """共用 HTTP 客戶端的外部 host 全部導到替身伺服器"""
+    sys.path.insert(0, os.path.join(ROOT, "layer", "python"))
+    import http_client
+    for host in UPSTREAM_HOSTS:
+        http_client.default_client.host_overrides[host] = stub.url
+    return http_client
+
+
+# ==========================================
+# 2. AWS 替身
+# ==========================================
+class ClientError(Exception):
+    def __init__(self, code, operation="Operation"):
+        super().__init__(f"An error occurred ({code}) when calling the {operation} operation")
+        self.response = {"Error": {"Code": code}}
+
+
+_COMPARE = {"<": lambda a, b: a < b, "<=": lambda a, b: a <= b, ">": lambda a, b: a > b,
+            ">=": lambda a, b: a >= b, "=": lambda a, b: a == b, "<>": lambda a, b: a != b}
+
+
+def _check_condition(expression, item, values):
+    """ConditionExpression 字串的簡化版：attribute_(not_)exists(x)、x <op> :v，以 OR / AND 串接 (OR 優先拆開)"""
+    def atom(text):
+        text = text.strip()
+        for fn in ("attribute_not_exists", "attribute_exists"):
+            if text.startswith(fn + "("):
+                name = text[len(fn) + 1:-1].strip()
+                exists = item is not None and name in item
+                return not exists if fn == "attribute_not_exists" else exists
+        name, op, placeholder = text.split()
+        if item is None or name not in item:
+            return False
+        return _COMPARE[op](item[name], values[placeholder])
+
+    return any(all(atom(part) for part in clause.split(" AND ")) for clause in expression.split(" OR "))
+
+
+_KEY_CONDITION = re.compile(
+    r"^\w+ = (?P<pk_value>:\w+)"
+    r"(?: AND (?:\w+ BETWEEN (?P<low>:\w+) AND (?P<high>:\w+)|begins_with\(\w+, (?P<prefix>:\w+)\)))?$")
+
+
+def _split_top_level(text):
+    parts, depth, current = [], 0, ""
+    for ch in text:
+        if ch == "," and depth == 0:
+            parts.append(current.strip())
+            current = ""
+            continue
+        depth += ch == "("
+        depth -= ch == ")"
+        current += ch
+    if current.strip():
+        parts.append(current.strip())
+    return parts
+
+
+def _update_value(expr, item, values):
+    expr = expr.strip()
+    if expr.startswith("if_not_exists("):
+        name, default = _split_top_level(expr[len("if_not_exists("):-1])
+        return item[name] if name in item else _update_value(default, item, values)
+    if expr.startswith("list_append("):
+        a, b = _split_top_level(expr[len("list_append("):-1])
+        return list(_update_value(a, item, values)) + list(_update_value(b, item, values))
+    for op in (" + ", " - "):
+        if op in expr:
+            a, b = expr.split(op, 1)
+            a, b = _update_value(a, item, values), _update_value(b, item, values)
+            return a + b if op == " + " else a - b
+    if expr.startswith(":"):
+        return values[expr]
+    return item[expr]
+
+
+def _apply_update(item, expression, values):
+    """UpdateExpression 的簡化版：SET (含 if_not_exists / list_append / +、-)、ADD 數字或集合、REMOVE；回傳更新到的欄位"""
+    updated = []
+    for action, body in re.findall(r"(SET|ADD|REMOVE)\s+(.*?)(?=\s+(?:SET|ADD|REMOVE)\s|$)", expression.strip()):
+        for clause in _split_top_level(body):
+            if action == "SET":
+                name, expr = clause.split("=", 1)
+                name = name.strip()
+                item[name] = _update_value(expr, item, values)
+            elif action == "ADD":
+                name, placeholder = clause.split()
+                value = values[placeholder]
+                if isinstance(value, (set, frozenset)):
+                    item[name] = set(item.get(name, set())) | value
+                else:
+                    item[name] = item.get(name, 0) + value
+            else:
+                name = clause.strip()
+                item.pop(name, None)
+            updated.append(name)
+    return updated
+
+
+def _as_returned(value):
+    """真的 DynamoDB 讀回來的數字一律是 Decimal；DECIMAL_NUMBERS 開啟時照做，才測得到 json.dumps 之類的問題"""
+    if not DECIMAL_NUMBERS:
+        return value
+    if isinstance(value, bool):
+        return value
+    if isinstance(value, (int, float)):
+        return Decimal(str(value))
+    if isinstance(value, dict):
+        return {k: _as_returned(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_as_returned(v) for v in value]
+    return value
+
+
+def _project(item, expression):
+    """ProjectionExpression：只留列出的欄位 (item 存在但沒有這些欄位時是空的 dict，跟真的 DynamoDB 一樣)"""
+    if not expression:
+        return dict(item)
+    names = [n.strip() for n in expression.split(",")]
+    return {n: item[n] for n in names if n in item}
+
+
+class InMemoryTable:
+    """DynamoDB Table 的記憶體版本 (只實作這個專案用到的操作)"""
+
+    def __init__(self, name, key_names=("userId", "sessionId"), latency_ms=8):
+        self.name = name
+        self.key_names = key_names
+        self.latency_ms = latency_ms
+        self.items = {}
+        self.lock = threading.Lock()
+        self.calls = {}
+
+    def _tick(self, op):
+        self.calls[op] = self.calls.get(op, 0) + 1
+        if self.latency_ms:
+            time.sleep(self.latency_ms * LATENCY_SCALE / 1000)
+
+    def _key(self, item):
+        return tuple(item.get(k) for k in self.key_names if k in item)
+
+    def get_item(self, Key, ProjectionExpression=None, **kwargs):
+        self._tick("get_item")
+        with self.lock:
+            item = self.items.get(self._key(Key))
+        if item is None:
+            return {}
+        return {"Item": _as_returned(_project(item, ProjectionExpression))}
+
+    def put_item(self, Item, ConditionExpression=None, ExpressionAttributeValues=None, **kwargs):
+        self._tick("put_item")
+        with self.lock:
+            key = self._key(Item)
+            if ConditionExpression and not _check_condition(
+                    ConditionExpression, self.items.get(key), ExpressionAttributeValues or {}):
+                raise ClientError("ConditionalCheckFailedException", "PutItem")
+            self.items[key] = dict(Item)
+        return {}
+
+    def delete_item(self, Key, **kwargs):
+        self._tick("delete_item")
+        with self.lock:
+            self.items.pop(self._key(Key), None)
+        return {}
+
+    def update_item(self, Key, UpdateExpression, ConditionExpression=None, ExpressionAttributeValues=None,
+                    ReturnValues="NONE", **kwargs):
+        self._tick("update_item")
+        values = ExpressionAttributeValues or {}
+        with self.lock:
+            key = self._key(Key)
+            current = self.items.get(key)
+            if ConditionExpression and not _check_condition(ConditionExpression, current, values):
+                raise ClientError("ConditionalCheckFailedException", "UpdateItem")
+            item = dict(current) if current else dict(Key)
+            before = dict(item)
+            updated = _apply_update(item, UpdateExpression, values)
+            self.items[key] = item
+        if ReturnValues == "ALL_OLD":
+            return {"Attributes": _as_returned(dict(current))} if current else {}
+        if ReturnValues == "UPDATED_OLD":
+            return {"Attributes": _as_returned({k: before[k] for k in updated if k in before})}
+        if ReturnValues == "ALL_NEW":
+            return {"Attributes": _as_returned(dict(item))}
+        if ReturnValues == "UPDATED_NEW":
+            return {"Attributes": _as_returned({k: item[k] for k in updated if k in item})}
+        return {}
+
+    def query(self, KeyConditionExpression, ExpressionAttributeValues, ScanIndexForward=True, Limit=None,
+              ExclusiveStartKey=None, ProjectionExpression=None, **kwargs):
+        """只支援「分區鍵 = :v AND (排序鍵 BETWEEN :a AND :b | begins_with(排序鍵, :p))」"""
+        self._tick("query")
+        pk, sk = self.key_names
+        values = ExpressionAttributeValues
+        match = _KEY_CONDITION.match(KeyConditionExpression.strip())
+        if not match:
+            raise ValueError(f"unsupported KeyConditionExpression: {KeyConditionExpression}")
+        pk_value = values[match.group("pk_value")]
+        if match.group("prefix"):
+            prefix = values[match.group("prefix")]
+            in_range = lambda v: v.startswith(prefix)  # noqa: E731
+        elif match.group("low"):
+            low, high = values[match.group("low")], values[match.group("high")]
+            in_range = lambda v: low <= v <= high  # noqa: E731
+        else:
+            in_range = lambda v: True  # noqa: E731
+        with self.lock:
+            rows = sorted((dict(i) for i in self.items.values() if i.get(pk) == pk_value and in_range(i.get(sk, ""))),
+                          key=lambda i: i[sk], reverse=not ScanIndexForward)
+        if ExclusiveStartKey:
+            start = ExclusiveStartKey[sk]
+            rows = [r for r in rows if (r[sk] > start if ScanIndexForward else r[sk] < start)]
+        page = rows[:Limit] if Limit else rows
+        result = {"Items": _as_returned([_project(r, ProjectionExpression) for r in page]), "Count": len(page)}
+        if Limit and len(rows) > Limit:
+            result["LastEvaluatedKey"] = {pk: pk_value, sk: page[-1][sk]}
+        return result
+
+
+class FakeDynamoResource:
+    def __init__(self):
+        self.tables = {}
+        self.calls = {}
+
+    def batch_get_item(self, RequestItems, **kwargs):
+        """每張表最多 100 個 key；替身不會回 UnprocessedKeys"""
+        self.calls["batch_get_item"] = self.calls.get("batch_get_item", 0) + 1
+        responses = {}
+        for name, request in RequestItems.items():
+            keys = request["Keys"]
+            if len(keys) > 100:
+                raise ClientError("ValidationException", "BatchGetItem")
+            table = self.Table(name)
+            if table.latency_ms:
+                time.sleep(table.latency_ms * LATENCY_SCALE / 1000)
+            with table.lock:
+                responses[name] = _as_returned([_project(table.items[k], request.get("ProjectionExpression"))
+                                                for k in map(table._key, keys) if k in table.items])
+        return {"Responses": responses, "UnprocessedKeys": {}}
+
+    def Table(self, name):
+        if name not in self.tables:
+            if "Cache" in name:
+                key_names = ("cacheKey",)
+            elif "Idempotency" in name:
+                key_names = ("eventId",)
+            else:
+                key_names = ("userId", "sessionId")
+            self.tables[name] = InMemoryTable(name, key_names)
+        return self.tables[name]
+
+
+class FakeBedrockAgent:
+    """invoke_agent 的替身：模擬 Agent 思考時間後，分段吐出回答"""
+
+    def __init__(self, think_ms=1500, chunks=6):
+        self.think_ms = think_ms
+        self.chunks = chunks
+        self.calls = 0
+
+    def invoke_agent(self, agentId, agentAliasId, sessionId, inputText, **kwargs):
+        self.calls += 1
+        think = self.think_ms * LATENCY_SCALE / 1000
+        chunks = self.chunks
+        answer = f"以下是「{inputText[:20]}」的建議行程。" + "第一天：淺草寺、晴空塔。第二天：明治神宮、表參道。" * 4
+
+        def stream():
+            time.sleep(think * 0.7)
+            size = max(1, len(answer) // chunks)
+            for i in range(0, len(answer), size):
+                time.sleep(think * 0.3 / chunks)
+                yield {"chunk": {"bytes": answer[i:i + size].encode("utf-8")}}
+
+        return {"completion": stream(), "sessionId": sessionId}
+
+
+class FakeS3:
+    def __init__(self, latency_ms=40):
+        self.objects = {}
+        self.latency_ms = latency_ms
+        self.calls = {}
+
+    def _tick(self, op, ms=None):
+        self.calls[op] = self.calls.get(op, 0) + 1
+        time.sleep((self.latency_ms if ms is None else ms) * LATENCY_SCALE / 1000)
+
+    def put_object(self, Bucket, Key, Body, **kwargs):
+        self._tick("put_object")
+        self.objects[(Bucket, Key)] = Body
+        return {"ETag": f'"{len(Body)}"'}
+
+    def head_object(self, Bucket, Key, **kwargs):
+        self._tick("head_object", self.latency_ms / 4)
+        if (Bucket, Key) not in self.objects:
+            raise ClientError("404", "HeadObject")
+        return {"ContentLength": len(self.objects[(Bucket, Key)])}
+
+    def generate_presigned_url(self, ClientMethod, Params, ExpiresIn=3600, **kwargs):
+        self.calls["generate_presigned_url"] = self.calls.get("generate_presigned_url", 0) + 1
+        return f"https://s3.stub.local/{Params['Bucket']}/{Params['Key']}?X-Amz-Expires={ExpiresIn}"
+
+
+class FakeSQS:
+    def __init__(self):
+        self.messages = []
+
+    def send_message(self, QueueUrl, MessageBody, **kwargs):
+        self.messages.append(MessageBody)
+        return {"MessageId": str(len(self.messages))}
+
+
+LATENCY_SCALE = 1.0
+DECIMAL_NUMBERS = False
+dynamodb = FakeDynamoResource()
+bedrock_agent = FakeBedrockAgent()
+s3 = FakeS3()
+sqs = FakeSQS()
+
+
+def reset_state():
+    """清空 DynamoDB / S3 / SQS 替身裡的資料 (物件本身保留，已載入的 lambda_function 拿到的參照仍然有效)"""
+    for table in dynamodb.tables.values():
+        with table.lock:
+            table.items.clear()
+        table.calls.clear()
+    dynamodb.calls.clear()
+    s3.objects.clear()
+    s3.calls.clear()
+    sqs.messages.clear()
+
+
+def _fake_client(service_name=None, *args, **kwargs):
+    service_name = service_name or kwargs.get("service_name")
+    return {"bedrock-agent-runtime": bedrock_agent, "s3": s3, "sqs": sqs}[service_name]
+
+
+def _fake_resource(service_name, *args, **kwargs):
+    assert service_name == "dynamodb"
+    return dynamodb
+
+
+def install_aws_stand_ins(latency_scale=1.0, pdf_render_ms=900, decimal_numbers=False):
+    """在 import lambda_function 之前呼叫；decimal_numbers=True 時 DynamoDB 替身讀回的數字改成 Decimal (同 boto3)"""
+    global LATENCY_SCALE, DECIMAL_NUMBERS
+    LATENCY_SCALE = latency_scale
+    DECIMAL_NUMBERS = decimal_numbers
+
+    boto3 = types.ModuleType("boto3")
+    boto3.client = _fake_client
+    boto3.resource = _fake_resource
+    boto3_dynamodb = types.ModuleType("boto3.dynamodb")
+    boto3.dynamodb = boto3_dynamodb
+
+    botocore = types.ModuleType("botocore")
+    botocore_config = types.ModuleType("botocore.config")
+    botocore_config.Config = lambda **kwargs: kwargs
+    botocore_exceptions = types.ModuleType("botocore.exceptions")
+    botocore_exceptions.ClientError = ClientError
+    botocore.config = botocore_config
+    botocore.exceptions = botocore_exceptions
+
+    xray = types.ModuleType("aws_xray_sdk")
+    xray_core = types.ModuleType("aws_xray_sdk.core")
+
+    class _Subsegment:
+        def add_exception(self, e):
+            pass
+
+    class _Recorder:
+        def capture(self, name=None):
+            return lambda func: func
+
+        def current_subsegment(self):
+            return _Subsegment()
+
+    xray_core.xray_recorder = _Recorder()
+    xray_core.patch_all = lambda *a, **k: None
+    xray.core = xray_core
+
+    pdfkit = types.ModuleType("pdfkit")
+    pdfkit.configuration = lambda **kwargs: kwargs
+    render_counter = itertools.count()
+
+    def from_string(html, output_path=False, configuration=None, options=None, **kwargs):
+        # wkhtmltopdf 行程啟動 + 排版的時間
+        next(render_counter)
+        time.sleep(pdf_render_ms * latency_scale / 1000)
+        return b"%PDF-1.4\n% stub\n" + html.encode("utf-8")[:2048]
+
+    pdfkit.from_string = from_string
+
+    sys.modules.update({
+        "boto3": boto3,
+        "boto3.dynamodb": boto3_dynamodb,
+        "botocore": botocore,
+        "botocore.config": botocore_config,
+        "botocore.exceptions": botocore_exceptions,
+        "aws_xray_sdk": xray,
+        "aws_xray_sdk.core": xray_core,
+        "pdfkit": pdfkit,
+    })
+
+
+class FakeContext:
+    """Lambda context 的替身"""
+
+    def __init__(self, timeout_ms=30000):
+        self.deadline = time.monotonic() + timeout_ms / 1000
+        self.aws_request_id = f"bench-{next(_request_ids)}"
+        self.function_name = "bench"
+
+    def get_remaining_time_in_millis(self):
+        return max(0, int((self.deadline - time.monotonic()) * 1000))
+
+
+_request_ids = itertools.count(1)
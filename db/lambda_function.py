@@ -1,11 +1,420 @@
-import boto3
 from datetime import datetime
+import os
 import json
+import uuid
+import metrics
+import memory_codec
+from memory_cache import MemoryCache
+from lazy_init import Lazy
 
-# 初始化資料庫連線
-dynamodb = boto3.resource("dynamodb")
-table = dynamodb.Table("TravelAgentMemory")
+TABLE_NAME = "TravelAgentMemory"
 
+# 初始化資料庫連線 (第一次讀寫才建立，boto3 也延後 import)
+def _create_dynamodb():
+    import boto3
+    return boto3.resource("dynamodb")
+
+dynamodb = Lazy(_create_dynamodb)
+table = Lazy(lambda: dynamodb().Table(TABLE_NAME))
+
+# 暖機容器內的讀取快取 (MEMORY_CACHE_TTL=0 關閉)
+memory_cache = MemoryCache(
+    ttl=int(os.environ.get("MEMORY_CACHE_TTL", "30")),
+    maxsize=int(os.environ.get("MEMORY_CACHE_MAXSIZE", "256"))
+)
+
+# 每位使用者的 session 清單：sessionId = "#sessions" 的 item，sessionIds 是字串集合
+SESSION_INDEX = "#sessions"
+
+# --- 逐筆追加的對話 (append-only) ---
+# 每一輪存成獨立的 item：sessionId = "<sessionId>#t#<序號>"，同一個 userId 分區下依序號排序
+# 主 item (userId, sessionId) 的 turnCount 是原子計數器；baseTurn 之前的輪次已經併進 conversation
+TURN_SEP = "#t#"
+MAX_TURN = 999999
+APPEND_RETRIES = 3
+
+def _turn_key(session_id, seq):
+    return f"{session_id}{TURN_SEP}{seq:06d}"
+
+def _is_conflict(e):
+    return getattr(e, "response", {}).get("Error", {}).get("Code") == "ConditionalCheckFailedException"
+
+def append_turn(user_id, session_id, turn):
+    """只寫新的一輪：計數器 +1 取得序號，再以條件寫入新增 turn item；寫入量不隨對話長度增加"""
+    now = datetime.now().isoformat()
+    for _ in range(APPEND_RETRIES):
+        with metrics.timer("dynamodb.update"):
+            res = table().update_item(
+                Key={'userId': user_id, 'sessionId': session_id},
+                UpdateExpression="ADD turnCount :one, version :one SET updatedAt = :now",
+                ExpressionAttributeValues={':one': 1, ':now': now},
+                ReturnValues="UPDATED_NEW"
+            )
+        memory_cache.patch_head(user_id, session_id, res["Attributes"])
+        seq = int(res["Attributes"]["turnCount"])
+        try:
+            with metrics.timer("dynamodb.put"):
+                table().put_item(
+                    Item={
+                        'userId': user_id,
+                        'sessionId': _turn_key(session_id, seq),
+                        'turn': turn,
+                        'createdAt': now
+                    },
+                    # 序號已被用過 (例如計數器被舊版 /save_memory 覆寫歸零) 就換下一個序號
+                    ConditionExpression="attribute_not_exists(sessionId)"
+                )
+            memory_cache.put_immutable(("turn", user_id, session_id, seq), turn)
+            if seq == 1:
+                touch_session_index(user_id, session_id)
+            return seq
+        except Exception as e:
+            if not _is_conflict(e):
+                raise
+            metrics.count("dynamodb.append_conflict")
+    raise Exception("寫入衝突，請稍後再試。")
+
+def touch_session_index(user_id, session_id):
+    """新的 session 第一次寫入時登記到使用者的 session 清單，/list_sessions 一次就能取回"""
+    with metrics.timer("dynamodb.update"):
+        res = table().update_item(
+            Key={'userId': user_id, 'sessionId': SESSION_INDEX},
+            UpdateExpression="ADD sessionIds :s",
+            ExpressionAttributeValues={':s': {session_id}},
+            ReturnValues="UPDATED_OLD"
+        )
+    if not res.get('Attributes'):
+        # 清單是這次才建立的：建立之前就有的 session 不在裡面，掃一次 partition 補進去 (ADD 集合重複加也沒關係)
+        existing = {h['sessionId'] for h in _query_heads(user_id, "sessionId")} - {session_id}
+        if existing:
+            with metrics.timer("dynamodb.update"):
+                table().update_item(
+                    Key={'userId': user_id, 'sessionId': SESSION_INDEX},
+                    UpdateExpression="ADD sessionIds :s",
+                    ExpressionAttributeValues={':s': existing}
+                )
+
+def get_head(user_id, session_id):
+    """主 item：快取有的話先用強一致讀取只取 version 確認還是最新的 (別的容器可能寫過)，不同才重讀整筆"""
+    key = {'userId': user_id, 'sessionId': session_id}
+    cached = memory_cache.get_head(user_id, session_id)
+    if cached is not None:
+        with metrics.timer("dynamodb.get_version"):
+            current = table().get_item(Key=key, ProjectionExpression="version", ConsistentRead=True).get('Item')
+        # 還沒有 version 欄位的舊資料會回傳空的 Item，當作版本 0
+        if current is not None and int(current.get("version", 0)) == int(cached.get("version", 0)):
+            metrics.count("memory_cache.hit")
+            return cached
+        metrics.count("memory_cache.stale")
+    with metrics.timer("dynamodb.get"):
+        # 剛確認過版本不同時要強一致讀取，否則可能讀回跟快取一樣的舊版
+        item = table().get_item(Key=key, ConsistentRead=cached is not None).get('Item')
+    if item:
+        memory_cache.put_head(user_id, session_id, item)
+    return item
+
+def load_turns(user_id, session_id, after_seq=0):
+    """讀出 after_seq 之後的所有輪次 (依序號排序)"""
+    turns = []
+    kwargs = {
+        'KeyConditionExpression': "userId = :u AND sessionId BETWEEN :first AND :last",
+        'ExpressionAttributeValues': {
+            ':u': user_id,
+            ':first': _turn_key(session_id, after_seq + 1),
+            ':last': _turn_key(session_id, MAX_TURN)
+        }
+    }
+    while True:
+        with metrics.timer("dynamodb.query"):
+            page = table().query(**kwargs)
+        turns.extend(item['turn'] for item in page.get('Items', []))
+        if 'LastEvaluatedKey' not in page:
+            return turns
+        kwargs['ExclusiveStartKey'] = page['LastEvaluatedKey']
+
+# --- 整段 conversation：壓縮後存放，太大就切成多個 chunk item ---
+# chunk 的 sessionId = "<sessionId>#c#<世代>#<編號>"；主 item 記錄目前的世代與數量，
+# 新世代全部寫完才更新主 item，所以讀的人永遠看到完整的一版
+CHUNK_SEP = "#c#"
+
+def _chunk_key(session_id, gen, index):
+    return f"{session_id}{CHUNK_SEP}{gen}#{index:04d}"
+
+def save_conversation(user_id, session_id, conversation):
+    data = memory_codec.encode(conversation)
+    now = datetime.now().isoformat()
+    values = {':now': now, ':zero': 0, ':one': 1}
+    gen = None
+    if isinstance(data, bytes) and len(data) > memory_codec.CHUNK_BYTES:
+        gen = uuid.uuid4().hex[:8]
+        chunks = memory_codec.split(data)
+        for index, chunk in enumerate(chunks):
+            with metrics.timer("dynamodb.put"):
+                table().put_item(Item={'userId': user_id, 'sessionId': _chunk_key(session_id, gen, index), 'data': chunk})
+        update = ("SET conversationChunks = :n, conversationGen = :g, updatedAt = :now, "
+                  "baseTurn = if_not_exists(turnCount, :zero) ADD version :one REMOVE conversation")
+        values.update({':n': len(chunks), ':g': gen})
+    else:
+        update = ("SET conversation = :c, updatedAt = :now, baseTurn = if_not_exists(turnCount, :zero) "
+                  "ADD version :one REMOVE conversationChunks, conversationGen")
+        values[':c'] = data
+
+    # 用 update 而不是 put：保留 turnCount，並記下目前為止的輪次都已包含在這份 conversation 裡
+    with metrics.timer("dynamodb.update"):
+        res = table().update_item(
+            Key={'userId': user_id, 'sessionId': session_id},
+            UpdateExpression=update,
+            ExpressionAttributeValues=values,
+            ReturnValues="ALL_OLD"
+        )
+
+    # write-through：舊 item + 這次的更新 = 新 item (update 是原子的，中間不會插進別的寫入)
+    old = res.get('Attributes', {})
+    new_item = {k: v for k, v in old.items() if k not in ('conversation', 'conversationChunks', 'conversationGen')}
+    new_item.update({
+        'userId': user_id,
+        'sessionId': session_id,
+        'updatedAt': now,
+        'baseTurn': old.get('turnCount', 0),
+        'version': int(old.get('version', 0)) + 1
+    })
+    if gen:
+        new_item.update({'conversationChunks': values[':n'], 'conversationGen': gen})
+    else:
+        new_item['conversation'] = data
+    memory_cache.put_head(user_id, session_id, new_item)
+    if not old:
+        touch_session_index(user_id, session_id)
+
+    # 舊世代的 chunk 最後才刪；刪失敗只是多佔空間，不影響讀取
+    if old.get('conversationGen') and old['conversationGen'] != gen:
+        for index in range(int(old.get('conversationChunks', 0))):
+            try:
+                table().delete_item(Key={'userId': user_id, 'sessionId': _chunk_key(session_id, old['conversationGen'], index)})
+            except Exception as e:
+                print(f"Chunk cleanup error: {str(e)}")
+
+def load_conversation(user_id, session_id, item):
+    """讀回整段 conversation (舊的字串、壓縮過的 Binary、或多個 chunk 都可以)"""
+    count = int(item.get('conversationChunks', 0))
+    if not count:
+        with metrics.timer("codec.decode"):
+            return memory_codec.decode(item.get('conversation'))
+
+    gen = item['conversationGen']
+    cache_key = ("conversation", user_id, session_id, gen)
+    cached = memory_cache.get_immutable(cache_key)
+    if cached is not None:
+        return cached
+    chunks = []
+    kwargs = {
+        'KeyConditionExpression': "userId = :u AND sessionId BETWEEN :first AND :last",
+        'ExpressionAttributeValues': {
+            ':u': user_id,
+            ':first': _chunk_key(session_id, gen, 0),
+            ':last': _chunk_key(session_id, gen, count - 1)
+        }
+    }
+    while True:
+        with metrics.timer("dynamodb.query"):
+            page = table().query(**kwargs)
+        chunks.extend(i['data'] for i in page.get('Items', []))
+        if 'LastEvaluatedKey' not in page:
+            break
+        kwargs['ExclusiveStartKey'] = page['LastEvaluatedKey']
+    with metrics.timer("codec.decode"):
+        conversation = memory_codec.decode(memory_codec.join(chunks))
+    memory_cache.put_immutable(cache_key, conversation)
+    return conversation
+
+# --- 分段讀取記憶：預設只回最近幾輪，避免長對話把 Agent 的 prompt 撐大 ---
+MEMORY_LAST_N = int(os.environ.get("MEMORY_LAST_N", "20"))
+MEMORY_MAX_BYTES = int(os.environ.get("MEMORY_MAX_BYTES", "16000"))
+
+def _iter_turns_desc(user_id, session_id, from_seq, after_seq, page_size):
+    """由新到舊產出 (序號, 內容)：from_seq 往前到 after_seq + 1 為止；已快取的輪次不再查詢"""
+    while from_seq > after_seq:
+        turn = memory_cache.get_immutable(("turn", user_id, session_id, from_seq))
+        if turn is None:
+            break
+        yield from_seq, turn
+        from_seq -= 1
+    if from_seq <= after_seq:
+        return
+
+    kwargs = {
+        'KeyConditionExpression': "userId = :u AND sessionId BETWEEN :first AND :last",
+        'ExpressionAttributeValues': {
+            ':u': user_id,
+            ':first': _turn_key(session_id, after_seq + 1),
+            ':last': _turn_key(session_id, from_seq)
+        },
+        'ScanIndexForward': False,
+        'Limit': page_size
+    }
+    while True:
+        with metrics.timer("dynamodb.query"):
+            page = table().query(**kwargs)
+        for item in page.get('Items', []):
+            seq = int(item['sessionId'].rsplit(TURN_SEP, 1)[1])
+            memory_cache.put_immutable(("turn", user_id, session_id, seq), item['turn'])
+            yield seq, item['turn']
+        if 'LastEvaluatedKey' not in page:
+            return
+        kwargs['ExclusiveStartKey'] = page['LastEvaluatedKey']
+
+def read_window(user_id, session_id, item, last_n, max_bytes, cursor=None):
+    """由新到舊取，直到 last_n 輪或 max_bytes 位元組為止；回傳 (由舊到新的內容, 下一頁 cursor)
+
+    位置編號：追加的輪次是 "t<序號>"，整段 conversation 以行為單位是 "b<行號>" ("b" 為最後一行)。
+    cursor 指向「下一個還沒回傳、最新的」位置，下一頁從那裡繼續往舊的讀。
+    """
+    base = int(item.get("baseTurn", 0))
+    count = int(item.get("turnCount", 0))
+    blob = []
+
+    def blob_lines():
+        # 整段 conversation 要用到才解壓縮 / 組回 chunk；最近幾輪就夠的話完全不讀
+        if not blob:
+            conversation = load_conversation(user_id, session_id, item)
+            blob.append(conversation.split("\n") if conversation else [])
+        return blob[0]
+
+    if cursor is None:
+        cursor = f"t{count}" if count > base else "b"
+
+    entries, used = [], 0
+
+    def take(text):
+        nonlocal used
+        size = len(text.encode("utf-8"))
+        # 至少回一筆，單筆超過預算也照給，否則永遠翻不了頁
+        if len(entries) >= last_n or (entries and used + size > max_bytes):
+            return False
+        entries.append(text)
+        used += size
+        return True
+
+    if cursor.startswith("t"):
+        seq = int(cursor[1:])
+        for seq, turn in _iter_turns_desc(user_id, session_id, seq, base, last_n + 1):
+            if not take(turn):
+                return entries[::-1], f"t{seq}"
+        # 已經取滿就不用為了算 cursor 去讀整段 conversation；"b" 代表從最後一行開始
+        has_blob = bool(item.get("conversation") or item.get("conversationChunks"))
+        if len(entries) >= last_n:
+            return entries[::-1], "b" if has_blob else None
+        cursor = "b"
+
+    line = int(cursor[1:]) if len(cursor) > 1 else len(blob_lines()) - 1
+    while line >= 0:
+        if not take(blob_lines()[line]):
+            return entries[::-1], f"b{line}"
+        line -= 1
+    return entries[::-1], None
+
+def memory_response(user_id, session_id, item, params):
+    """/get_memory 與 /get_memories 共用的回傳內容"""
+    if str(params.get("full", "")).lower() in ("true", "1", "yes"):
+        # 要求完整紀錄：整段存的 conversation + 之後逐筆追加的輪次
+        conversation = load_conversation(user_id, session_id, item)
+        parts = [conversation] if conversation else []
+        if int(item.get("turnCount", 0)) > int(item.get("baseTurn", 0)):
+            parts.extend(load_turns(user_id, session_id, int(item.get("baseTurn", 0))))
+        return {
+            "status": "found",
+            "history": "\n".join(parts),
+            "summary": item.get("summary"),
+            "last_updated": item.get("updatedAt")
+        }
+    entries, next_cursor = read_window(
+        user_id, session_id, item,
+        last_n=max(1, int(params.get("lastN") or MEMORY_LAST_N)),
+        max_bytes=max(1, int(params.get("maxBytes") or MEMORY_MAX_BYTES)),
+        cursor=params.get("cursor") or None
+    )
+    return {
+        "status": "found",
+        "history": "\n".join(entries),
+        "summary": item.get("summary"),
+        # DynamoDB 讀回的數字是 Decimal，json.dumps 不認得
+        "summary_through_turn": int(item["summaryTurn"]) if item.get("summaryTurn") is not None else None,
+        "has_more": next_cursor is not None,
+        "cursor": next_cursor,
+        "last_updated": item.get("updatedAt")
+    }
+
+# --- 一次讀多個 session：batch_get_item 取代逐筆 get_item ---
+LIST_SESSIONS_LIMIT = int(os.environ.get("LIST_SESSIONS_LIMIT", "10"))
+BATCH_GET_MAX = 100  # DynamoDB 一次 batch_get_item 的上限
+# 列表只需要這幾個欄位，不必把整段 conversation 讀回來
+LIST_FIELDS = "sessionId, updatedAt, turnCount, summary"
+
+def _parse_session_ids(value):
+    """Bedrock 傳來的可能是 JSON 陣列字串，也可能是逗號分隔"""
+    if not value:
+        return []
+    if isinstance(value, list):
+        return [str(v) for v in value]
+    value = value.strip()
+    if value.startswith("["):
+        return [str(v) for v in json.loads(value)]
+    return [v.strip() for v in value.split(",") if v.strip()]
+
+def get_heads(user_id, session_ids, projection=None):
+    """回傳 {sessionId: 主 item}；每 100 筆一次 batch_get_item
+    (不看快取：逐筆確認版本要的呼叫次數比直接整批讀還多)。有 projection 時只取那幾個欄位，也不放進快取"""
+    heads, missing = {}, list(dict.fromkeys(session_ids))
+    for i in range(0, len(missing), BATCH_GET_MAX):
+        request = {TABLE_NAME: {'Keys': [{'userId': user_id, 'sessionId': sid} for sid in missing[i:i + BATCH_GET_MAX]]}}
+        if projection:
+            request[TABLE_NAME]['ProjectionExpression'] = projection
+        for attempt in range(APPEND_RETRIES + 1):
+            with metrics.timer("dynamodb.batch_get"):
+                res = dynamodb().batch_get_item(RequestItems=request)
+            for item in res.get('Responses', {}).get(TABLE_NAME, []):
+                heads[item['sessionId']] = item
+                if not projection:
+                    memory_cache.put_head(user_id, item['sessionId'], item)
+            # 被限流時 DynamoDB 會把沒讀到的 key 放在 UnprocessedKeys，補讀一次
+            request = res.get('UnprocessedKeys') or {}
+            if not request:
+                break
+        if request:
+            raise Exception("讀取多個 session 時被限流，請稍後再試。")
+    return heads
+
+def _query_heads(user_id, projection=LIST_FIELDS):
+    """還沒有 session 清單的舊使用者：掃一次整個 partition，留下主 item (只取 projection 的欄位)"""
+    heads = []
+    kwargs = {
+        'KeyConditionExpression': "userId = :u",
+        'ExpressionAttributeValues': {':u': user_id},
+        'ProjectionExpression': projection
+    }
+    while True:
+        with metrics.timer("dynamodb.query"):
+            page = table().query(**kwargs)
+        for item in page.get('Items', []):
+            sid = item['sessionId']
+            if sid != SESSION_INDEX and TURN_SEP not in sid and CHUNK_SEP not in sid:
+                heads.append(item)
+        if not page.get('LastEvaluatedKey'):
+            return heads
+        kwargs['ExclusiveStartKey'] = page['LastEvaluatedKey']
+
+def list_sessions(user_id, limit):
+    """使用者最近更新的幾個 session，新的在前；只有 LIST_FIELDS 的欄位"""
+    with metrics.timer("dynamodb.get"):
+        index = table().get_item(Key={'userId': user_id, 'sessionId': SESSION_INDEX}).get('Item')
+    if index:
+        heads = list(get_heads(user_id, sorted(index.get('sessionIds', [])), LIST_FIELDS).values())
+    else:
+        heads = _query_heads(user_id)
+    heads.sort(key=lambda h: h.get('updatedAt') or "", reverse=True)
+    return heads[:limit]
+
+@metrics.instrument("db")
 def lambda_handler(event, context):
     try:
         # 1. 取得 API 路徑 (例如 /get_memory)
@@ -20,48 +429,104 @@ def lambda_handler(event, context):
         user_id = params.get("userId")
         session_id = params.get("sessionId")
         
-        # 如果沒抓到 userId，回傳錯誤，因為這是開啟門的必要條件
-        if not user_id or not session_id:
+        # 如果沒抓到 userId，回傳錯誤，因為這是開啟門的必要條件 (列出多個 session 的功能不需要 sessionId)
+        if not user_id or (not session_id and api_path not in ("/list_sessions", "/get_memories")):
             raise Exception(f"缺少必要參數！userId: {user_id}, sessionId: {session_id}")
 
         response_data = {}
 
         # --- 功能 A：讀取記憶 (需要雙 Key) ---
         if api_path == "/get_memory":
-            db_res = table.get_item(
-                Key={
-                    'userId': user_id,
-                    'sessionId': session_id
-                }
-            )
-            item = db_res.get('Item')
+            item = get_head(user_id, session_id)
             if item:
-                # 找到舊病歷了！
-                response_data = {
-                    "status": "found",
-                    "history": item.get("conversation"),
-                    "last_updated": item.get("updatedAt")
-                }
+                # 找到舊病歷了！預設只給最近一段，較舊的用 cursor 往前翻
+                response_data = memory_response(user_id, session_id, item, params)
             else:
                 # 沒找到紀錄，視為新客人
                 response_data = {"status": "not_found", "message": "這是第一次對話，沒有舊紀錄。"}
 
+        # --- 功能 E：列出使用者最近的 session (一次 batch get，不是逐筆讀) ---
+        elif api_path == "/list_sessions":
+            limit = max(1, int(params.get("limit") or LIST_SESSIONS_LIMIT))
+            heads = list_sessions(user_id, limit)
+            response_data = {
+                "status": "found" if heads else "not_found",
+                "sessions": [
+                    {
+                        "sessionId": h["sessionId"],
+                        "last_updated": h.get("updatedAt"),
+                        "turns": int(h.get("turnCount", 0)),
+                        "summary": h.get("summary")
+                    }
+                    for h in heads
+                ]
+            }
+
+        # --- 功能 F：一次讀多個 session 的記憶 (每個都是 /get_memory 的最近一段) ---
+        elif api_path == "/get_memories":
+            session_ids = _parse_session_ids(params.get("sessionIds"))
+            if not session_ids:
+                # 沒指定就取最近的幾個 session：先用列表欄位排序，只讀回前幾個的完整主 item
+                recent = list_sessions(user_id, max(1, int(params.get("limit") or LIST_SESSIONS_LIMIT)))
+                session_ids = [h["sessionId"] for h in recent]
+            heads = get_heads(user_id, session_ids)
+            window = {k: params[k] for k in ("lastN", "maxBytes") if params.get(k)}
+            response_data = {
+                "status": "found" if heads else "not_found",
+                "memories": {
+                    sid: dict(memory_response(user_id, sid, heads[sid], window), sessionId=sid)
+                    for sid in session_ids if sid in heads
+                }
+            }
+
         # --- 功能 B：儲存記憶 (存入時也要帶雙 Key) ---
         elif api_path == "/save_memory":
             conversation = params.get("conversation")
             if not conversation:
                 raise Exception("想要存記憶，但沒給我 conversation 內容。")
 
-            table.put_item(
-                Item={
-                    'userId': user_id,
-                    'sessionId': session_id,
-                    'conversation': conversation,
-                    'updatedAt': datetime.now().isoformat()
-                }
-            )
+            save_conversation(user_id, session_id, conversation)
             response_data = {"status": "success", "message": "記憶已儲存。"}
 
+        # --- 功能 D：儲存滾動摘要 (舊對話的重點，搭配最近幾輪一起給 Agent) ---
+        elif api_path == "/save_summary":
+            summary = params.get("summary")
+            if not summary:
+                raise Exception("想要存摘要，但沒給我 summary 內容。")
+            values = {':s': summary, ':now': datetime.now().isoformat(), ':one': 1}
+            if params.get("throughTurn"):
+                # 指定摘要涵蓋到第幾輪：比現有摘要舊的就不覆蓋
+                values[':t'] = int(params["throughTurn"])
+                update = "SET summary = :s, summaryTurn = :t, summaryUpdatedAt = :now ADD version :one"
+                condition = "attribute_not_exists(summaryTurn) OR summaryTurn <= :t"
+            else:
+                values[':zero'] = 0
+                update = "SET summary = :s, summaryTurn = if_not_exists(turnCount, :zero), summaryUpdatedAt = :now ADD version :one"
+                condition = None
+            try:
+                with metrics.timer("dynamodb.update"):
+                    res = table().update_item(
+                        Key={'userId': user_id, 'sessionId': session_id},
+                        UpdateExpression=update,
+                        ExpressionAttributeValues=values,
+                        ReturnValues="UPDATED_NEW",
+                        **({'ConditionExpression': condition} if condition else {})
+                    )
+                memory_cache.patch_head(user_id, session_id, res.get("Attributes", {}))
+                response_data = {"status": "success", "message": "摘要已儲存。"}
+            except Exception as e:
+                if not _is_conflict(e):
+                    raise
+                response_data = {"status": "stale", "message": "已有更新的摘要，這次沒有覆蓋。"}
+
+        # --- 功能 C：追加一輪對話 (只寫新的部分) ---
+        elif api_path == "/append_turn":
+            turn = params.get("turn")
+            if not turn:
+                raise Exception("想要追加對話，但沒給我 turn 內容。")
+            seq = append_turn(user_id, session_id, turn)
+            response_data = {"status": "success", "turn": seq, "message": "對話已追加。"}
+
         # 3. 封裝回傳給 Bedrock 的格式
         return {
             'messageVersion': '1.0',
@@ -0,0 +1,70 @@
+"""暖機容器內的記憶快取：同一段對話中 Agent 會一再呼叫 /get_memory，不必每次都讀 DynamoDB
+
+- 主 item (userId, sessionId)：每次寫入都把 version +1；寫入後直接更新快取 (write-through)，
+  只接受版本號不比快取舊的資料。其他容器的寫入這裡看不到，所以呼叫端用快取前要先以強一致讀取
+  只取 version 比對 (見 db 的 get_head)，版本不同就重讀；快取省下的是大 item 的傳輸與解碼，
+  以及輪次 / conversation 的查詢。
+- 追加的輪次與 chunk 組回的 conversation 寫入後就不會再變，可以放久一點。
+"""
+from ttl_cache import TTLCache
+
+IMMUTABLE_TTL = 3600
+# 作廢時留下的標記：只記得最後寫入的版本，擋住之後才回來、但比這版舊的讀取結果
+_STALE = "_stale"
+
+
+class MemoryCache:
+    def __init__(self, ttl=30, maxsize=256):
+        self.ttl = ttl
+        self.heads = TTLCache(maxsize)
+        self.immutable = TTLCache(maxsize * 8)
+        self.invalidations = 0
+
+    @property
+    def enabled(self):
+        return self.ttl > 0
+
+    def get_head(self, user_id, session_id):
+        if not self.enabled:
+            return None
+        item = self.heads.get((user_id, session_id))
+        if item is None or item.get(_STALE):
+            return None
+        return dict(item)
+
+    def put_head(self, user_id, session_id, item):
+        if not self.enabled:
+            return
+        current = self.heads.get((user_id, session_id))
+        if current is not None and int(current.get("version", 0)) > int(item.get("version", 0)):
+            return
+        self.heads.set((user_id, session_id), dict(item), self.ttl)
+
+    def patch_head(self, user_id, session_id, changes):
+        """changes 是 update_item 回傳的新值 (含 version)；快取剛好是前一版才套用，否則作廢"""
+        if not self.enabled:
+            return
+        current = self.heads.get((user_id, session_id))
+        if current is not None and not current.get(_STALE) \
+                and int(current.get("version", 0)) + 1 == int(changes.get("version", 0)):
+            current = dict(current)
+            current.update(changes)
+            self.heads.set((user_id, session_id), current, self.ttl)
+        else:
+            # 沒有快取或中間有別的寫入沒看到：整筆作廢，下次重讀
+            self.invalidate(user_id, session_id, changes.get("version", 0))
+
+    def invalidate(self, user_id, session_id, version=0):
+        """version 是已知最新的版本；同時進行中的讀取若拿到更舊的資料，put_head 不會收"""
+        self.invalidations += 1
+        self.heads.set((user_id, session_id), {"version": int(version), _STALE: True}, self.ttl)
+
+    def get_immutable(self, key):
+        return self.immutable.get(key) if self.enabled else None
+
+    def put_immutable(self, key, value):
+        if self.enabled:
+            self.immutable.set(key, value, IMMUTABLE_TTL)
+
+    def stats(self):
+        return {"heads": self.heads.stats(), "immutable": self.immutable.stats(), "invalidations": self.invalidations}
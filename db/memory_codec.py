@@ -0,0 +1,42 @@
+"""conversation 的儲存格式：大的對話壓縮後存成 Binary，超過單一 item 的大小就切成多個 chunk
+
+格式 (看開頭判斷，舊資料不需要搬移)：
+- str            ：未壓縮的原文 (舊資料，或小於 COMPRESS_MIN_BYTES 的短對話)
+- b"Z1" + 資料   ：zlib 壓縮的 UTF-8 文字；之後換演算法就用新的標記 (例如 b"Z2")
+"""
+import os
+import zlib
+
+MAGIC_ZLIB = b"Z1"
+COMPRESS_MIN_BYTES = int(os.environ.get("MEMORY_COMPRESS_MIN_BYTES", "1024"))
+COMPRESS_LEVEL = int(os.environ.get("MEMORY_COMPRESS_LEVEL", "6"))
+# DynamoDB 單一 item 上限 400KB，保留空間給 key 與其他欄位
+CHUNK_BYTES = int(os.environ.get("MEMORY_CHUNK_BYTES", str(350 * 1024)))
+
+
+def encode(text):
+    """太短的維持字串 (壓縮省不了多少，還看不懂)；其餘壓縮成 bytes"""
+    raw = text.encode("utf-8")
+    if len(raw) < COMPRESS_MIN_BYTES:
+        return text
+    return MAGIC_ZLIB + zlib.compress(raw, COMPRESS_LEVEL)
+
+
+def decode(value):
+    if value is None:
+        return None
+    if isinstance(value, str):
+        return value
+    # boto3 讀回來的 Binary 型別把 bytes 放在 .value
+    data = bytes(getattr(value, "value", value))
+    if data.startswith(MAGIC_ZLIB):
+        return zlib.decompress(data[len(MAGIC_ZLIB):]).decode("utf-8")
+    raise ValueError(f"unknown conversation format: {data[:2]!r}")
+
+
+def split(data, size=CHUNK_BYTES):
+    return [data[i:i + size] for i in range(0, len(data), size)]
+
+
+def join(chunks):
+    return b"".join(bytes(getattr(c, "value", c)) for c in chunks)
@@ -0,0 +1,239 @@
+"""四個 Lambda 共用的 HTTP 客戶端 (以 Lambda Layer 部署，路徑 /opt/python)
+
+- 每個 host 一組 keep-alive 連線池，放在模組層級，暖機時沿用，不必每次重新 TLS 握手
+- 連線逾時與讀取逾時分開設定，所有呼叫都一定有 timeout
+- 冪等的 GET 遇到連線錯誤 / 429 / 5xx 會以隨機退避重試
+- 依 host 統計延遲 (次數、錯誤、p50/p95、最大值)
+"""
+import os
+import json
+import time
+import random
+import socket
+import ssl
+import threading
+import http.client
+import urllib.parse
+from collections import deque
+
+RETRY_METHODS = {"GET", "HEAD"}
+RETRY_STATUS = {429, 500, 502, 503, 504}
+
+# 重用舊連線時，對方可能早已關閉；這幾種錯誤代表請求根本沒送達，可以換新連線再送一次
+STALE_ERRORS = (http.client.RemoteDisconnected, BrokenPipeError, ConnectionResetError, http.client.CannotSendRequest)
+
+
+class Response:
+    def __init__(self, status, headers, body):
+        self.status = status
+        self.headers = headers
+        self.body = body
+
+    @property
+    def text(self):
+        return self.body.decode("utf-8", errors="replace")
+
+    def json(self):
+        return json.loads(self.body.decode("utf-8"))
+
+
+class HostStats:
+    def __init__(self, window=256):
+        self.count = 0
+        self.errors = 0
+        self.retries = 0
+        self.new_connections = 0
+        self.reused_connections = 0
+        self.max_ms = 0.0
+        self.samples = deque(maxlen=window)
+
+    def record(self, elapsed_ms):
+        self.count += 1
+        self.max_ms = max(self.max_ms, elapsed_ms)
+        self.samples.append(elapsed_ms)
+
+    def summary(self):
+        ordered = sorted(self.samples)
+
+        def pct(p):
+            if not ordered: return None
+            return round(ordered[min(len(ordered) - 1, int(len(ordered) * p))], 1)
+
+        return {
+            "count": self.count,
+            "errors": self.errors,
+            "retries": self.retries,
+            "new_connections": self.new_connections,
+            "reused_connections": self.reused_connections,
+            "p50_ms": pct(0.50),
+            "p95_ms": pct(0.95),
+            "max_ms": round(self.max_ms, 1),
+        }
+
+
+class HttpClient:
+    def __init__(self, connect_timeout=3.0, read_timeout=10.0, max_retries=2, backoff=0.2, max_idle_per_host=8):
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_idle_per_host = max_idle_per_host
+        self._ssl_context = None  # 第一次連 https 才載入憑證，縮短冷啟動
+        self._pools = {}
+        self._stats = {}
+        self._lock = threading.Lock()
+        # host → "http://127.0.0.1:8080"：把某個 host 導到別處 (離線基準測試用)
+        self.host_overrides = {}
+
+    # --- 連線池 ---
+    def _acquire(self, scheme, host, port, connect_timeout, force_new=False):
+        key = (scheme, host, port)
+        with self._lock:
+            idle = self._pools.get(key)
+            if idle and not force_new:
+                return idle.pop(), True
+        if scheme == "https":
+            if self._ssl_context is None:
+                self._ssl_context = ssl.create_default_context()
+            conn = http.client.HTTPSConnection(host, port, timeout=connect_timeout, context=self._ssl_context)
+        else:
+            conn = http.client.HTTPConnection(host, port, timeout=connect_timeout)
+        conn.connect()
+        return conn, False
+
+    def _release(self, scheme, host, port, conn):
+        key = (scheme, host, port)
+        with self._lock:
+            idle = self._pools.setdefault(key, [])
+            if len(idle) < self.max_idle_per_host:
+                idle.append(conn)
+                return
+        conn.close()
+
+    def _host_stats(self, host):
+        with self._lock:
+            if host not in self._stats:
+                self._stats[host] = HostStats()
+            return self._stats[host]
+
+    def _split_timeout(self, timeout):
+        if timeout is None:
+            return self.connect_timeout, self.read_timeout
+        if isinstance(timeout, (tuple, list)):
+            return timeout[0], timeout[1]
+        return min(self.connect_timeout, timeout), timeout
+
+    def _send_once(self, method, parsed, path, body, headers, timeout):
+        target = parsed
+        if parsed.hostname in self.host_overrides:
+            target = urllib.parse.urlsplit(self.host_overrides[parsed.hostname])
+        scheme = target.scheme
+        host = target.hostname
+        port = target.port or (443 if scheme == "https" else 80)
+        stats = self._host_stats(parsed.hostname)
+        connect_timeout, read_timeout = self._split_timeout(timeout)
+
+        # 舊連線失效時換一條新連線再送一次
+        for stale_retry in (False, True):
+            conn, reused = self._acquire(scheme, host, port, connect_timeout, force_new=stale_retry)
+            if reused:
+                stats.reused_connections += 1
+            else:
+                stats.new_connections += 1
+            try:
+                conn.sock.settimeout(read_timeout)
+                conn.request(method, path, body=body, headers=headers)
+                resp = conn.getresponse()
+                data = resp.read()
+            except STALE_ERRORS:
+                conn.close()
+                if reused:
+                    continue
+                raise
+            except Exception:
+                conn.close()
+                raise
+            if resp.will_close:
+                conn.close()
+            else:
+                self._release(scheme, host, port, conn)
+            return Response(resp.status, dict(resp.getheaders()), data)
+
+    # --- 對外介面 ---
+    def request(self, method, url, params=None, data=None, json_body=None, headers=None, timeout=None, retries=None):
+        method = method.upper()
+        parsed = urllib.parse.urlsplit(url)
+        path = parsed.path or "/"
+        query = parsed.query
+        if params:
+            extra = urllib.parse.urlencode(params)
+            query = f"{query}&{extra}" if query else extra
+        if query:
+            path = f"{path}?{query}"
+
+        headers = dict(headers or {})
+        if json_body is not None:
+            data = json.dumps(json_body, ensure_ascii=False).encode("utf-8")
+            headers.setdefault("Content-Type", "application/json")
+        elif isinstance(data, str):
+            data = data.encode("utf-8")
+
+        max_retries = self.max_retries if retries is None else retries
+        if method not in RETRY_METHODS:
+            max_retries = 0
+
+        stats = self._host_stats(parsed.hostname)
+        attempt = 0
+        while True:
+            start = time.monotonic()
+            try:
+                resp = self._send_once(method, parsed, path, data, headers, timeout)
+            except (OSError, http.client.HTTPException, socket.timeout):
+                stats.errors += 1
+                if attempt >= max_retries:
+                    raise
+            else:
+                stats.record((time.monotonic() - start) * 1000)
+                if resp.status not in RETRY_STATUS or attempt >= max_retries:
+                    return resp
+                stats.errors += 1
+
+            # Full jitter：0 ~ backoff * 2^attempt 之間隨機等待
+            stats.retries += 1
+            time.sleep(random.uniform(0, self.backoff * (2 ** attempt)))
+            attempt += 1
+
+    def get(self, url, params=None, headers=None, timeout=None):
+        return self.request("GET", url, params=params, headers=headers, timeout=timeout)
+
+    def get_json(self, url, params=None, headers=None, timeout=None):
+        return self.get(url, params=params, headers=headers, timeout=timeout).json()
+
+    def post_json(self, url, payload, headers=None, timeout=None):
+        return self.request("POST", url, json_body=payload, headers=headers, timeout=timeout)
+
+    def stats(self):
+        with self._lock:
+            hosts = dict(self._stats)
+        return {host: s.summary() for host, s in hosts.items()}
+
+    def close(self):
+        with self._lock:
+            pools, self._pools = self._pools, {}
+        for idle in pools.values():
+            for conn in idle:
+                conn.close()
+
+
+# 模組層級的共用實例：同一個容器內的所有呼叫共用連線池
+default_client = HttpClient(
+    connect_timeout=float(os.environ.get("HTTP_CONNECT_TIMEOUT", "3")),
+    read_timeout=float(os.environ.get("HTTP_READ_TIMEOUT", "10")),
+    max_retries=int(os.environ.get("HTTP_MAX_RETRIES", "2")),
+)
+
+request = default_client.request
+get = default_client.get
+get_json = default_client.get_json
+post_json = default_client.post_json
+stats = default_client.stats
@@ -0,0 +1,62 @@
+"""冷啟動優化：重的 import 與 AWS client 延到第一次用到才建立
+
+- XRAY_PATCH_ALL=1 才會 import aws_xray_sdk 並 patch_all()；預設關閉
+- EAGER_INIT=1 時在 import 階段就先建好所有 client (適合 Provisioned Concurrency，初始化不算在請求延遲內)
+"""
+import os
+import threading
+
+XRAY_ENABLED = os.environ.get("XRAY_PATCH_ALL", "0").lower() in ("1", "true", "yes")
+EAGER_INIT = os.environ.get("EAGER_INIT", "0").lower() in ("1", "true", "yes")
+
+_xray_recorder = None
+
+
+def init_xray():
+    """有開 X-Ray 才 import SDK；boto3、http.client 的呼叫會被自動追蹤"""
+    global _xray_recorder
+    if not XRAY_ENABLED or _xray_recorder is not None:
+        return _xray_recorder
+    from aws_xray_sdk.core import xray_recorder, patch_all
+    patch_all()
+    _xray_recorder = xray_recorder
+    return _xray_recorder
+
+
+def xray_capture(name):
+    """等同 @xray_recorder.capture(name)；X-Ray 沒開時直接回傳原函式，零額外成本"""
+    def decorator(func):
+        recorder = init_xray()
+        if recorder is None:
+            return func
+        return recorder.capture(name)(func)
+    return decorator
+
+
+def xray_add_exception(e):
+    if _xray_recorder is None:
+        return
+    subsegment = _xray_recorder.current_subsegment()
+    if subsegment is not None:
+        subsegment.add_exception(e)
+
+
+class Lazy:
+    """第一次呼叫才執行 factory()，之後在同一個容器內沿用同一個物件"""
+
+    def __init__(self, factory):
+        self._factory = factory
+        self._value = None
+        self._loaded = False
+        self._lock = threading.Lock()
+        if EAGER_INIT:
+            self()
+
+    def __call__(self):
+        # factory 回傳 None (例如選用的檔案不存在) 也只執行一次
+        if not self._loaded:
+            with self._lock:
+                if not self._loaded:
+                    self._value = self._factory()
+                    self._loaded = True
+        return self._value
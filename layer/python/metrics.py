@@ -0,0 +1,146 @@
+"""各階段耗時與計數：每個 invocation 結束時輸出一行 JSON (CloudWatch Embedded Metric Format)
+
+用法：
+    @metrics.instrument("db")            # 或手動 start_request / end_request
+    def lambda_handler(event, context):
+        with metrics.timer("dynamodb.get"):
+            ...
+        metrics.count("cache.hit")
+
+- METRICS_SAMPLE_RATE：0~1，被抽中的 invocation 才記錄；沒抽中時 timer() 回傳共用的空物件，幾乎沒有成本
+- correlation_id：linebot 產生後放進 Agent 的 sessionAttributes，api / db / PDF 從 event 取回，
+  同一則 LINE 訊息在四個 Lambda 的紀錄可以用同一個 ID 串起來
+"""
+import os
+import json
+import time
+import uuid
+import random
+import functools
+import threading
+
+SAMPLE_RATE = float(os.environ.get("METRICS_SAMPLE_RATE", "0"))
+NAMESPACE = os.environ.get("METRICS_NAMESPACE", "TravelAgent")
+
+# 一個 Lambda 容器同時只處理一個 invocation，用模組層級的變數就夠了
+correlation_id = None
+_function = None
+_sampled = False
+_started = 0.0
+_stages = {}
+_counters = {}
+_lock = threading.Lock()
+
+
+class _NoopTimer:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NOOP = _NoopTimer()
+
+
+class _Timer:
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        record(self.name, (time.perf_counter() - self.start) * 1000)
+        return False
+
+
+def correlation_id_from(event, context=None):
+    """優先用上游傳來的 correlation_id，其次 Lambda 的 request id"""
+    attrs = (event or {}).get("sessionAttributes") or {}
+    if attrs.get("correlation_id"):
+        return attrs["correlation_id"]
+    request_id = getattr(context, "aws_request_id", None)
+    return request_id or uuid.uuid4().hex
+
+
+def start_request(function, cid=None):
+    global correlation_id, _function, _sampled, _started, _stages, _counters
+    correlation_id = cid or uuid.uuid4().hex
+    _function = function
+    _sampled = SAMPLE_RATE > 0 and random.random() < SAMPLE_RATE
+    _started = time.perf_counter()
+    _stages = {}
+    _counters = {}
+    return correlation_id
+
+
+def instrument(function):
+    """裝飾 Lambda handler：每個 invocation 開始時 start_request，結束時 end_request"""
+    def decorator(handler):
+        @functools.wraps(handler)
+        def wrapper(event, context):
+            start_request(function, correlation_id_from(event, context))
+            try:
+                return handler(event, context)
+            finally:
+                end_request()
+        return wrapper
+    return decorator
+
+
+def is_sampled():
+    return _sampled
+
+
+def timer(name):
+    """with metrics.timer("s3.upload"): ..."""
+    return _Timer(name) if _sampled else _NOOP
+
+
+def record(name, ms):
+    """自己量好的耗時 (例如 Agent 的第一個 chunk)"""
+    if not _sampled:
+        return
+    with _lock:
+        stage = _stages.setdefault(name, [0, 0.0])
+        stage[0] += 1
+        stage[1] += ms
+
+
+def count(name, n=1):
+    if not _sampled:
+        return
+    with _lock:
+        _counters[name] = _counters.get(name, 0) + n
+
+
+def end_request(**fields):
+    """輸出這次 invocation 的所有階段耗時與計數；沒抽中就什麼都不做"""
+    if not _sampled:
+        return None
+    with _lock:
+        stages, counters = dict(_stages), dict(_counters)
+    line = {
+        "function": _function,
+        "correlation_id": correlation_id,
+        "total_ms": round((time.perf_counter() - _started) * 1000, 2),
+    }
+    line.update(fields)
+    metric_defs = [{"Name": "total_ms", "Unit": "Milliseconds"}]
+    for name, (n, ms) in stages.items():
+        line[f"{name}_ms"] = round(ms, 2)
+        metric_defs.append({"Name": f"{name}_ms", "Unit": "Milliseconds"})
+        if n > 1:
+            line[f"{name}_n"] = n
+    for name, n in counters.items():
+        line[name] = n
+        metric_defs.append({"Name": name, "Unit": "Count"})
+    line["_aws"] = {
+        "Timestamp": int(time.time() * 1000),
+        "CloudWatchMetrics": [{"Namespace": NAMESPACE, "Dimensions": [["function"]], "Metrics": metric_defs}],
+    }
+    text = json.dumps(line, ensure_ascii=False)
+    print(text)
+    return text
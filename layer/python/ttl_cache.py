@@ -0,0 +1,72 @@
+"""共用快取元件：程序內 TTL + LRU 快取，以及 DynamoDB 第二層 (api 的回應快取、linebot 的回答快取都用這裡)"""
+import json
+import time
+import threading
+from collections import OrderedDict
+
+from lazy_init import Lazy
+
+
+class TTLCache:
+    """程序內 LRU 快取，每筆有自己的到期時間；Lambda 暖機時會一直留著"""
+
+    def __init__(self, maxsize=1024):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            expires_at, value = entry
+            if expires_at < time.time():
+                del self._data[key]
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value, ttl):
+        with self._lock:
+            self._data[key] = (time.time() + ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def __len__(self):
+        return len(self._data)
+
+    def stats(self):
+        return {"size": len(self._data), "hits": self.hits, "misses": self.misses, "evictions": self.evictions}
+
+
+class DynamoCacheTier:
+    """第二層共用快取：存在 DynamoDB (cacheKey 為主鍵，expiresAt 設成 Table 的 TTL 欄位)"""
+
+    def __init__(self, table_name, region_name=None):
+        def connect():
+            import boto3
+            return boto3.resource("dynamodb", region_name=region_name).Table(table_name)
+        # 第一次查快取才 import boto3，不拖慢冷啟動
+        self.table = Lazy(connect)
+
+    def get(self, key):
+        item = self.table().get_item(Key={"cacheKey": key}).get("Item")
+        if not item or int(item.get("expiresAt", 0)) < time.time():
+            return None
+        return json.loads(item["value"])
+
+    def set(self, key, value, ttl):
+        self.table().put_item(Item={
+            "cacheKey": key,
+            "value": json.dumps(value, ensure_ascii=False),
+            "expiresAt": int(time.time() + ttl),
+        })
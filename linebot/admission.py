@@ -0,0 +1,132 @@
+"""呼叫 Agent 前的流量控制：避免單一使用者洗版或大量推播後的湧入把 Agent 的並行數吃光
+
+1. 合併 (merge)：同一批事件裡同一位使用者重複的同一句話 (連點圖文選單、連送兩次) 只留第一則，
+   由它回覆。同一位使用者的事件本來就依序處理，所以合併要在排進處理順序之前做。
+2. 每位使用者 (群組 / 聊天室則是該群組) 一個 token bucket：超過速率直接回覆「傳太快了」
+3. 全域並行上限：滿了就排隊；佇列也滿了、或等到 deadline 還沒輪到，就回覆「忙碌中」
+
+計數都是以容器為單位 (Lambda 一個容器同時只處理一個 invocation，並行來自同一批多位使用者的事件)；
+跨容器的總上限請用 Lambda 的 Reserved Concurrency 控制。
+"""
+import time
+import threading
+
+ADMITTED = "admitted"
+THROTTLED = "throttled"
+REJECTED = "rejected"
+
+
+class TokenBucket:
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+
+    def take(self):
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens < 1:
+            return False
+        self.tokens -= 1
+        return True
+
+    def is_full(self):
+        return self.tokens + (time.monotonic() - self.updated) * self.rate >= self.burst
+
+
+class AdmissionController:
+    def __init__(self, max_concurrent=4, max_waiting=8, user_rate=0.2, user_burst=3, wait_seconds=10):
+        self.max_concurrent = max_concurrent
+        self.max_waiting = max_waiting
+        self.user_rate = user_rate
+        self.user_burst = user_burst
+        self.wait_seconds = wait_seconds
+        self._cond = threading.Condition()
+        self._running = 0
+        self._waiting = 0
+        self._buckets = {}
+        self.admitted = 0
+        self.queued = 0
+        self.merged = 0
+        self.throttled = 0
+        self.rejected = 0
+
+    def _take_token(self, user_id):
+        bucket = self._buckets.get(user_id)
+        if bucket is None:
+            # 桶子已經補滿的使用者等同沒有紀錄，清掉避免字典一直長大
+            if len(self._buckets) > 10000:
+                self._buckets = {k: b for k, b in self._buckets.items() if not b.is_full()}
+            bucket = self._buckets[user_id] = TokenBucket(self.user_rate, self.user_burst)
+        return bucket.take()
+
+    def _wait_for_slot(self, deadline):
+        """已持有 self._cond；輪到了回傳 True"""
+        if self._running < self.max_concurrent:
+            return True
+        if self._waiting >= self.max_waiting:
+            return False
+        self._waiting += 1
+        self.queued += 1
+        try:
+            while self._running >= self.max_concurrent:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+            return True
+        finally:
+            self._waiting -= 1
+
+    def merge(self, items, key):
+        """同一位使用者的一批事件：key 相同的只留第一個 (key 為 None 的一律保留)，維持原本順序"""
+        seen = set()
+        kept = []
+        for item in items:
+            k = key(item)
+            if k is not None:
+                if k in seen:
+                    continue
+                seen.add(k)
+            kept.append(item)
+        dropped = len(items) - len(kept)
+        if dropped:
+            with self._cond:
+                self.merged += dropped
+        return kept
+
+    def run(self, user_id, fn, deadline=None):
+        """通過檢查就執行 fn()；回傳 (狀態, fn 的結果)，沒有執行時結果為 None"""
+        wait_until = time.monotonic() + self.wait_seconds
+        if deadline is not None:
+            wait_until = min(wait_until, deadline)
+
+        with self._cond:
+            if not self._take_token(user_id):
+                self.throttled += 1
+                return THROTTLED, None
+            if not self._wait_for_slot(wait_until):
+                self.rejected += 1
+                return REJECTED, None
+            self._running += 1
+            self.admitted += 1
+
+        try:
+            return ADMITTED, fn()
+        finally:
+            with self._cond:
+                self._running -= 1
+                self._cond.notify()
+
+    def stats(self):
+        return {
+            "admitted": self.admitted,
+            "queued": self.queued,
+            "merged": self.merged,
+            "throttled": self.throttled,
+            "rejected": self.rejected,
+            "running": self._running,
+            "waiting": self._waiting,
+        }
@@ -0,0 +1,129 @@
+"""Agent 回答快取：重複的訊息 (圖文選單、常見問題) 不必每次都呼叫 invoke_agent
+
+查詢順序：
+1. 固定回覆表 (FAST_REPLIES)：完全不需要 Agent 的訊息，例如使用規則
+2. 程序內 TTL + LRU 快取
+3. (可選) 第二層共用快取：ANSWER_CACHE_TABLE，Lambda 容器之間共用
+
+只有符合快取規則的訊息才會被快取 —— 規則要挑「答案跟使用者是誰、什麼時候問都無關」的訊息。
+命中時不會呼叫 invoke_agent，Agent 的 session 與記憶都看不到這一輪：後續會接著問的訊息
+(例如行程規劃之後的「生成PDF」) 或含即時資訊的回答 (營業中 / 已打烊、天氣) 都不能放進規則。
+規則可用 ANSWER_CACHE_RULES 覆寫，格式為 JSON：[{"name": "...", "pattern": "<regex>", "ttl": 秒數}, ...]
+(pattern 比對的是正規化之後的文字)
+"""
+import os
+import re
+import json
+import hashlib
+import unicodedata
+
+from ttl_cache import TTLCache, DynamoCacheTier
+
+# 快取內容格式變了就改版本，舊的共用快取自然失效
+KEY_VERSION = "answer:v1"
+
+# 預設不快取任何 Agent 回答：行程模板的答案要留在 Agent session 裡給「生成PDF」接著用，
+# 地點詳情含營業狀態，兩者都不適合；需要時再用 ANSWER_CACHE_RULES 開啟
+DEFAULT_RULES = []
+
+
+_COLON_SPACES = re.compile(r"\s*:\s*")
+
+
+def normalize_message(text):
+    """全形/半形統一 (「：」→「:」)、每行去頭尾空白並縮減空白、冒號前後不留空白、去掉空行、英文轉小寫"""
+    text = unicodedata.normalize("NFKC", str(text or "")).casefold()
+    lines = (_COLON_SPACES.sub(":", " ".join(line.split())) for line in text.splitlines())
+    return "\n".join(line for line in lines if line)
+
+
+def load_rules(spec=None):
+    spec = spec if spec is not None else os.environ.get("ANSWER_CACHE_RULES")
+    rules = json.loads(spec) if spec else DEFAULT_RULES
+    return [(r["name"], re.compile(r["pattern"]), int(r["ttl"])) for r in rules]
+
+
+class AnswerCache:
+    def __init__(self, fast_replies=None, rules=None, maxsize=512, shared=None):
+        # 固定回覆表也用正規化後的文字當 key，多打空白、全形半形都能命中
+        self.fast_replies = {normalize_message(k): v for k, v in (fast_replies or {}).items()}
+        self.rules = rules if rules is not None else load_rules()
+        self.local = TTLCache(maxsize)
+        self.shared = shared
+        self.fast_hits = 0
+        self.shared_hits = 0
+        self.shared_errors = 0
+        self.uncacheable = 0
+
+    def fast_reply(self, text):
+        reply = self.fast_replies.get(normalize_message(text))
+        if reply is not None:
+            self.fast_hits += 1
+        return reply
+
+    def _rule(self, norm):
+        for name, pattern, ttl in self.rules:
+            if pattern.search(norm):
+                return name, ttl
+        return None
+
+    def _key(self, rule_name, norm):
+        return hashlib.sha256(f"{KEY_VERSION}|{rule_name}|{norm}".encode("utf-8")).hexdigest()
+
+    def get(self, text):
+        norm = normalize_message(text)
+        rule = self._rule(norm)
+        if rule is None:
+            self.uncacheable += 1
+            return None
+        key = self._key(rule[0], norm)
+        answer = self.local.get(key)
+        if answer is not None or self.shared is None:
+            return answer
+        try:
+            answer = self.shared.get(key)
+        except Exception as e:
+            # 第二層壞掉就當作沒命中，照常呼叫 Agent
+            self.shared_errors += 1
+            print(f"Answer cache get error: {str(e)}")
+            return None
+        if answer is not None:
+            self.shared_hits += 1
+            self.local.set(key, answer, rule[1])
+        return answer
+
+    def set(self, text, answer):
+        norm = normalize_message(text)
+        rule = self._rule(norm)
+        if rule is None or not answer:
+            return
+        key = self._key(rule[0], norm)
+        self.local.set(key, answer, rule[1])
+        if self.shared is not None:
+            try:
+                self.shared.set(key, answer, rule[1])
+            except Exception as e:
+                self.shared_errors += 1
+                print(f"Answer cache set error: {str(e)}")
+
+    def stats(self):
+        stats = self.local.stats()
+        lookups = stats["hits"] + stats["misses"]
+        stats.update({
+            "fast_hits": self.fast_hits,
+            "shared_hits": self.shared_hits,
+            "shared_errors": self.shared_errors,
+            "uncacheable": self.uncacheable,
+            "hit_rate": round((stats["hits"] + self.shared_hits) / lookups, 3) if lookups else 0.0,
+        })
+        return stats
+
+
+def build_answer_cache(fast_replies=None):
+    """依環境變數建立；有設 ANSWER_CACHE_TABLE 才啟用第二層 (表結構同 API_CACHE_TABLE)"""
+    maxsize = int(os.environ.get("ANSWER_CACHE_MAXSIZE", "512"))
+    table_name = os.environ.get("ANSWER_CACHE_TABLE")
+    shared = None
+    if table_name:
+        shared = DynamoCacheTier(table_name, os.environ.get("ANSWER_CACHE_REGION", "ap-northeast-1"))
+    return AnswerCache(fast_replies, maxsize=maxsize, shared=shared)
@@ -0,0 +1,93 @@
+"""webhook 事件佇列：handler 收到事件只負責放進佇列，由 worker 取出後呼叫 Agent
+
+LINEBOT_QUEUE 設定後端：
+- sqs://<queue url>       正式環境，worker Lambda 由 SQS 觸發
+- file:///tmp/line.jsonl  本機 / 測試用，一行一筆 JSON
+- memory                  同一個行程內的佇列 (只適用同步模式的測試；非同步模式下 worker 收不到)
+"""
+import os
+import json
+import threading
+from collections import deque
+
+from lazy_init import Lazy
+
+
+class InMemoryQueue:
+    def __init__(self):
+        self._items = deque()
+        self._lock = threading.Lock()
+
+    def put(self, message):
+        with self._lock:
+            self._items.append(json.dumps(message, ensure_ascii=False))
+
+    def drain(self, max_messages=100):
+        with self._lock:
+            items = [self._items.popleft() for _ in range(min(max_messages, len(self._items)))]
+        return [json.loads(i) for i in items]
+
+    def __len__(self):
+        return len(self._items)
+
+
+class LocalFileQueue:
+    """JSONL 檔案佇列；drain 時先改名再讀，讀的同時可以繼續寫入新檔"""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def put(self, message):
+        line = json.dumps(message, ensure_ascii=False)
+        with self._lock, open(self.path, "a", encoding="utf-8") as f:
+            f.write(line + "\n")
+
+    def drain(self, max_messages=100):
+        processing = f"{self.path}.processing"
+        with self._lock:
+            if not os.path.exists(processing):
+                if not os.path.exists(self.path):
+                    return []
+                os.replace(self.path, processing)
+            with open(processing, encoding="utf-8") as f:
+                lines = [line for line in f.read().splitlines() if line.strip()]
+            taken, rest = lines[:max_messages], lines[max_messages:]
+            if rest:
+                with open(processing, "w", encoding="utf-8") as f:
+                    f.write("\n".join(rest) + "\n")
+            else:
+                os.remove(processing)
+        return [json.loads(line) for line in taken]
+
+
+class SqsQueue:
+    def __init__(self, queue_url, region_name="ap-northeast-1"):
+        self.queue_url = queue_url
+
+        def connect():
+            import boto3
+            return boto3.client("sqs", region_name=region_name)
+
+        self.client = Lazy(connect)
+
+    def put(self, message):
+        self.client().send_message(QueueUrl=self.queue_url, MessageBody=json.dumps(message, ensure_ascii=False))
+
+    def drain(self, max_messages=10):
+        # 正式環境由 SQS 觸發 worker；這裡給手動補跑使用
+        res = self.client().receive_message(QueueUrl=self.queue_url, MaxNumberOfMessages=min(max_messages, 10), WaitTimeSeconds=0)
+        messages = []
+        for m in res.get("Messages", []):
+            messages.append(json.loads(m["Body"]))
+            self.client().delete_message(QueueUrl=self.queue_url, ReceiptHandle=m["ReceiptHandle"])
+        return messages
+
+
+def build_queue(spec=None):
+    spec = spec if spec is not None else os.environ.get("LINEBOT_QUEUE", "memory")
+    if spec.startswith("sqs://"):
+        return SqsQueue("https://" + spec[len("sqs://"):])
+    if spec.startswith("file://"):
+        return LocalFileQueue(spec[len("file://"):])
+    return InMemoryQueue()
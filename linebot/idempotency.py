@@ -0,0 +1,167 @@
+"""webhook 去重：LINE 逾時會重送同一個事件 (webhookEventId 相同，deliveryContext.isRedelivery = true)
+
+處理事件前先「認領」webhookEventId，認領成功的才處理；已被認領過的就是重送，直接略過。
+認領是原子操作，同一事件同時送到兩個容器也只有一個會處理。
+
+認領分兩段：先拿一個短的租約 (IDEMPOTENCY_LEASE)，處理完 (或放進佇列) 才標記完成、記住 IDEMPOTENCY_TTL；
+處理失敗時，認領存在 DynamoDB 才釋放並要 LINE 重送 (只在容器記憶體內的認領，重送到別的容器會重複回覆)。
+Lambda 在處理途中逾時或當掉時，租約到期後 LINE 的重送也還能被處理，訊息不會遺失。
+
+IDEMPOTENCY_TABLE 設定後改用 DynamoDB (主鍵 eventId，expiresAt 設為 Table 的 TTL 欄位)，
+否則只在同一個容器的記憶體內去重。
+"""
+import os
+import time
+import threading
+
+from lazy_init import Lazy
+
+# LINE 重送的間隔是分鐘等級，記住 1 小時就夠了
+DEFAULT_TTL = 3600
+# 處理中的租約：要比一次處理的時間長 (Lambda 逾時)，但比 LINE 的重送間隔短
+DEFAULT_LEASE = 300
+
+
+class InMemoryIdempotencyStore:
+    # 認領只存在這個容器：重送可能被別的容器收到，那邊不知道哪些事件已經處理過
+    durable = False
+
+    def __init__(self, ttl=DEFAULT_TTL, lease=DEFAULT_LEASE):
+        self.ttl = ttl
+        self.lease = lease
+        self._claims = {}
+        self._lock = threading.Lock()
+
+    def claim(self, event_id):
+        now = time.time()
+        with self._lock:
+            expires_at = self._claims.get(event_id)
+            if expires_at is not None and expires_at > now:
+                return False
+            self._claims[event_id] = now + self.lease
+            # 順手清掉過期的，避免暖機很久的容器越吃越多記憶體
+            if len(self._claims) > 10000:
+                self._claims = {k: v for k, v in self._claims.items() if v > now}
+            return True
+
+    def complete(self, event_id):
+        with self._lock:
+            self._claims[event_id] = time.time() + self.ttl
+
+    def release(self, event_id):
+        with self._lock:
+            self._claims.pop(event_id, None)
+
+
+class DynamoIdempotencyStore:
+    """用條件寫入認領：eventId 不存在 (或已過期) 才寫得進去"""
+    durable = True
+
+    def __init__(self, table_name, ttl=DEFAULT_TTL, region_name=None, lease=DEFAULT_LEASE):
+        self.ttl = ttl
+        self.lease = lease
+
+        def connect():
+            import boto3
+            return boto3.resource("dynamodb", region_name=region_name).Table(table_name)
+
+        self.table = Lazy(connect)
+
+    def claim(self, event_id):
+        now = int(time.time())
+        try:
+            self.table().put_item(
+                Item={"eventId": event_id, "expiresAt": now + self.lease},
+                # DynamoDB 的 TTL 刪除會延遲，過期但還沒被刪的也要能重新認領
+                ConditionExpression="attribute_not_exists(eventId) OR expiresAt < :now",
+                ExpressionAttributeValues={":now": now},
+            )
+            return True
+        except Exception as e:
+            if getattr(e, "response", {}).get("Error", {}).get("Code") == "ConditionalCheckFailedException":
+                return False
+            raise
+
+    def complete(self, event_id):
+        self.table().update_item(
+            Key={"eventId": event_id},
+            UpdateExpression="SET expiresAt = :exp",
+            ExpressionAttributeValues={":exp": int(time.time()) + self.ttl},
+        )
+
+    def release(self, event_id):
+        self.table().delete_item(Key={"eventId": event_id})
+
+
+class Deduplicator:
+    def __init__(self, store):
+        self.store = store
+        self.claimed = 0
+        self.duplicates = 0
+        self.redeliveries = 0
+        self.released = 0
+        self.errors = 0
+
+    def is_new(self, e):
+        """第一次看到這個事件回傳 True；沒有 webhookEventId 的事件一律當作新的"""
+        if (e.get("deliveryContext") or {}).get("isRedelivery"):
+            self.redeliveries += 1
+        event_id = e.get("webhookEventId")
+        if not event_id:
+            return True
+        try:
+            claimed = self.store.claim(event_id)
+        except Exception as ex:
+            # 去重壞掉時寧可重複回覆，也不要漏掉使用者的訊息
+            self.errors += 1
+            print(f"Idempotency error: {str(ex)}")
+            return True
+        if claimed:
+            self.claimed += 1
+        else:
+            self.duplicates += 1
+        return claimed
+
+    @property
+    def durable(self):
+        """認領是否跨容器共用；是的話才能放心要 LINE 重送 (已處理過的事件會被擋掉)"""
+        return self.store.durable
+
+    def filter(self, events):
+        return [e for e in events if self.is_new(e)]
+
+    def _settle(self, events, action):
+        for e in events:
+            event_id = e.get("webhookEventId")
+            if not event_id:
+                continue
+            try:
+                getattr(self.store, action)(event_id)
+            except Exception as ex:
+                # 標記失敗只影響租約長短，不影響這次的回覆
+                self.errors += 1
+                print(f"Idempotency {action} error: {str(ex)}")
+
+    def complete(self, events):
+        """處理完 (或已放進佇列)：把租約延長成完整的 TTL"""
+        self._settle(events, "complete")
+
+    def release(self, events):
+        """處理失敗：釋放認領，LINE 重送時會再處理一次"""
+        self.released += len(events)
+        self._settle(events, "release")
+
+    def stats(self):
+        return {"claimed": self.claimed, "duplicates": self.duplicates, "redeliveries": self.redeliveries,
+                "released": self.released, "errors": self.errors}
+
+
+def build_deduplicator():
+    ttl = int(os.environ.get("IDEMPOTENCY_TTL", str(DEFAULT_TTL)))
+    lease = int(os.environ.get("IDEMPOTENCY_LEASE", str(DEFAULT_LEASE)))
+    table_name = os.environ.get("IDEMPOTENCY_TABLE")
+    if table_name:
+        store = DynamoIdempotencyStore(table_name, ttl, os.environ.get("IDEMPOTENCY_REGION", "ap-northeast-1"), lease)
+    else:
+        store = InMemoryIdempotencyStore(ttl, lease)
+    return Deduplicator(store)
@@ -3,31 +3,80 @@ import json
 import base64
 import hmac
 import hashlib
-import urllib.request
-import urllib.error
-import boto3
+import time
+import codecs
+from concurrent.futures import ThreadPoolExecutor
+import http_client
+import metrics
+import event_queue
+import answer_cache
+import idempotency
+import admission
+from lazy_init import Lazy, init_xray, xray_capture, xray_add_exception
 
 # ==========================================
 # 1. 新增 X-Ray 追蹤初始化
 # ==========================================
-from aws_xray_sdk.core import xray_recorder
-from aws_xray_sdk.core import patch_all
+# 設定 XRAY_PATCH_ALL=1 才會載入 SDK 並自動補丁 boto3 (Bedrock) 與 http.client (LINE API)
+init_xray()
 
-# 自動補丁：這會讓 boto3 (DynamoDB, Bedrock) 和 urllib (LINE API) 的呼叫自動被紀錄
-patch_all()
+# --- 告訴 Lambda 東京的 AI 大腦在哪 ---
+# 取得東京區 Bedrock Agent 工具 (第一次呼叫才建立，boto3 也延後 import)
+def _create_bedrock_agent():
+    import boto3
+    return boto3.client(service_name='bedrock-agent-runtime', region_name='ap-northeast-1')
 
-# --- 告訴 Lambda 東京的筆記本與 AI 大腦在哪 ---
-# 1. 取得東京區 DynamoDB 資源
-dynamodb = boto3.resource('dynamodb', region_name='ap-northeast-1')
-table = dynamodb.Table('LineBotUserData')
-
-# 2. 取得東京區 Bedrock Agent 工具
-bedrock_agent = boto3.client(service_name='bedrock-agent-runtime', region_name='ap-northeast-1')
+bedrock_agent = Lazy(_create_bedrock_agent)
 
 # --- 環境變數設定 ---
 CHANNEL_SECRET = os.environ.get("CHANNEL_SECRET", "")
 ACCESS_TOKEN = os.environ.get("CHANNEL_ACCESS_TOKEN", "")
 REPLY_ENDPOINT = "https://api.line.me/v2/bot/message/reply"
+PUSH_ENDPOINT = "https://api.line.me/v2/bot/message/push"
+LOADING_ENDPOINT = "https://api.line.me/v2/bot/chat/loading/start"
+# LINE 限制：單則文字訊息 5000 字，一次 reply / push 最多 5 則
+LINE_MAX_CHARS = 5000
+LINE_MAX_MESSAGES = 5
+
+# --- 非同步模式：handler 只驗簽、放進佇列就回 200，由 worker_handler 呼叫 Agent ---
+ASYNC_MODE = os.environ.get("LINEBOT_ASYNC_MODE", "0").lower() in ("1", "true", "yes")
+# replyToken 只在收到事件後短時間內有效，超過就改用 push
+REPLY_TOKEN_TTL = float(os.environ.get("REPLY_TOKEN_TTL", "50"))
+queue = event_queue.build_queue()
+if ASYNC_MODE and isinstance(queue, event_queue.InMemoryQueue):
+    # 行程內的佇列只有這個容器看得到，worker Lambda 永遠收不到，事件會直接遺失
+    raise Exception("LINEBOT_ASYNC_MODE=1 需要設定 LINEBOT_QUEUE=sqs://<queue url> (本機測試可用 file://)")
+# 以 webhookEventId 去重，LINE 重送的事件不會再跑一次 Agent
+dedup = idempotency.build_deduplicator()
+
+# --- 多事件並行：不同使用者同時處理，同一使用者依序處理 ---
+MAX_CONCURRENCY = int(os.environ.get("LINEBOT_MAX_CONCURRENCY", "5"))
+# 保留給回覆「忙碌中」與 Lambda 收尾的秒數
+TIME_MARGIN = float(os.environ.get("LINEBOT_TIME_MARGIN", "3"))
+BUSY_REPLY = "系統忙碌中，請稍後再試"
+THROTTLED_REPLY = "您傳送訊息的速度有點快，請稍等一下再問我喔"
+
+# --- 流量控制：每位使用者的速率上限 + 同時呼叫 Agent 的數量上限 (以容器為單位) ---
+admission_control = admission.AdmissionController(
+    max_concurrent=int(os.environ.get("ADMISSION_MAX_CONCURRENT", "4")),
+    max_waiting=int(os.environ.get("ADMISSION_MAX_WAITING", "8")),
+    user_rate=float(os.environ.get("ADMISSION_USER_RATE", "0.2")),
+    user_burst=float(os.environ.get("ADMISSION_USER_BURST", "3")),
+    wait_seconds=float(os.environ.get("ADMISSION_WAIT_SECONDS", "10")),
+)
+EMPTY_ANSWER = "抱歉，秘書這題沒給出答案。"
+
+# --- 串流模式：先顯示「輸入中」動畫，Agent 邊生成邊分段送出 ---
+STREAMING_MODE = os.environ.get("LINEBOT_STREAMING", "0").lower() in ("1", "true", "yes")
+# 第一段累積到這麼多字、或等了這麼多秒 (且有句子結尾可切) 就先送出
+STREAM_FIRST_CHARS = int(os.environ.get("STREAM_FIRST_CHARS", "150"))
+STREAM_FIRST_SECONDS = float(os.environ.get("STREAM_FIRST_SECONDS", "4"))
+# 之後每累積這麼多字推播一次 (push 要計費，不要切太碎)
+STREAM_CHUNK_CHARS = int(os.environ.get("STREAM_CHUNK_CHARS", "1500"))
+# 「輸入中」動畫秒數：LINE 只接受 5~60 秒、5 的倍數
+LOADING_SECONDS = int(os.environ.get("LOADING_SECONDS", "20"))
+# 要求 Agent 串流最終回答 (需要 bedrock:InvokeModelWithResponseStream 權限)
+AGENT_STREAM_FINAL_RESPONSE = os.environ.get("AGENT_STREAM_FINAL_RESPONSE", "1").lower() in ("1", "true", "yes")
 
 # --- Agent 資訊 ---
 AGENT_ID = 'GZ2Z3OQLS6'
@@ -52,72 +101,316 @@ def verify_line_signature(raw_body_bytes: bytes, signature: str) -> bool:
 # ==========================================
 # 2. 加入 X-Ray 裝飾器追蹤 Bedrock 呼叫耗時
 # ==========================================
-@xray_recorder.capture('get_agent_response')
+def iter_agent_chunks(user_text: str, session_id: str, stream_final_response: bool = False):
+    """呼叫 Bedrock Agent，逐段產出回答文字 (它會幫你處理知識庫與 Flow 邏輯)"""
+    started = time.perf_counter()
+    kwargs = {}
+    if stream_final_response:
+        kwargs["streamingConfigurations"] = {"streamFinalResponse": True}
+    response = bedrock_agent().invoke_agent(
+        agentId=AGENT_ID,
+        agentAliasId=AGENT_ALIAS_ID,
+        sessionId=session_id,
+        inputText=user_text,
+        sessionState={
+            'sessionAttributes': {
+                'line_user_id': session_id,
+                # action group 的 Lambda 會收到，用來串起同一則訊息在各 Lambda 的指標
+                # (放 sessionAttributes 不會進 prompt，不佔 token 也不會被模型寫進回答)
+                'correlation_id': metrics.correlation_id or ''
+            }
+        },
+        **kwargs
+    )
+
+    # 中文字是多位元組，chunk 的邊界可能切在字的中間，要用遞增式解碼
+    decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+    first_chunk = True
+    event_stream = response.get('completion')
+    if event_stream:
+        for event in event_stream:
+            if 'chunk' in event:
+                text = decoder.decode(event['chunk']['bytes'])
+                if text:
+                    if first_chunk:
+                        metrics.record("agent.first_chunk", (time.perf_counter() - started) * 1000)
+                        first_chunk = False
+                    yield text
+    tail = decoder.decode(b"", final=True)
+    if tail:
+        yield tail
+    metrics.record("agent.total", (time.perf_counter() - started) * 1000)
+
+@xray_capture('get_agent_response')
 def get_agent_response(user_text: str, session_id: str):
-    """呼叫 Bedrock Agent，它會幫你處理知識庫與 Flow 邏輯"""
     try:
-        response = bedrock_agent.invoke_agent(
-            agentId=AGENT_ID,
-            agentAliasId=AGENT_ALIAS_ID,
-            sessionId=session_id,
-            inputText=user_text,
-            sessionState={
-                'sessionAttributes': {
-                    'line_user_id': session_id 
-                }
-            }
-        )
-        
-        full_answer = ""
-        event_stream = response.get('completion')
-        if event_stream:
-            for event in event_stream:
-                if 'chunk' in event:
-                    full_answer += event['chunk']['bytes'].decode('utf-8')
-        
-        return full_answer if full_answer else "抱歉，秘書這題沒給出答案。"
+        # 用 list 收集再 join，長篇行程不會因為字串一直相加而變慢
+        full_answer = "".join(iter_agent_chunks(user_text, session_id))
+        return full_answer if full_answer else EMPTY_ANSWER
         
     except Exception as e:
         print(f"Agent Error: {str(e)}")
         # 將錯誤紀錄到 X-Ray
-        xray_recorder.current_subsegment().add_exception(e)
+        xray_add_exception(e)
         return f"系統忙碌中，請稍後再試"
 
 # ==========================================
 # 3. 加入 X-Ray 裝飾器追蹤 LINE 回傳耗時
 # ==========================================
-@xray_recorder.capture('reply_line')
-def reply_line(reply_token: str, text: str):
-    """回傳訊息給你的 LINE Bot"""
+# 切訊息時優先找段落，其次換行，最後才是句尾標點
+_BOUNDARIES = (("\n\n",), ("\n",), ("。", "！", "？", "!", "?", "；"))
+
+def _boundary(text: str, limit: int) -> int:
+    """text[:limit] 內最後一個可切開的位置 (切在分隔符號之後)；找不到回傳 0"""
+    window = text[:limit]
+    for marks in _BOUNDARIES:
+        cut = max(window.rfind(m) + len(m) if m in window else 0 for m in marks)
+        if cut > 0:
+            return cut
+    return 0
+
+def split_message(text: str, limit: int = LINE_MAX_CHARS) -> list:
+    """依段落 / 句子切成每則不超過 limit 字的訊息，空白段落不送"""
+    parts = []
+    while len(text) > limit:
+        cut = _boundary(text, limit) or limit
+        parts.append(text[:cut])
+        text = text[cut:]
+    parts.append(text)
+    return [p.strip("\n") for p in parts if p.strip()]
+
+def _text_messages(texts: list) -> list:
+    return [{"type": "text", "text": t} for t in texts]
+
+@xray_capture('reply_line')
+def reply_line(reply_token: str, text) -> bool:
+    """回傳訊息給你的 LINE Bot (text 可以是字串或已切好的多則訊息)"""
+    texts = [text] if isinstance(text, str) else text
     payload = {
         "replyToken": reply_token,
-        "messages": [{"type": "text", "text": text}],
+        "messages": _text_messages(texts[:LINE_MAX_MESSAGES]),
     }
-    data = json.dumps(payload).encode("utf-8")
-
-    req = urllib.request.Request(
-        REPLY_ENDPOINT,
-        data=data,
-        method="POST",
-        headers={
-            "Content-Type": "application/json",
-            "Authorization": f"Bearer {ACCESS_TOKEN}",
-        },
-    )
+    return _post_line(REPLY_ENDPOINT, payload, "Reply")
 
+@xray_capture('push_line')
+def push_line(user_id: str, text) -> bool:
+    """replyToken 過期時改用 push 主動推播；超過 5 則就分多次送"""
+    texts = [text] if isinstance(text, str) else text
+    ok = True
+    for i in range(0, len(texts), LINE_MAX_MESSAGES):
+        payload = {
+            "to": user_id,
+            "messages": _text_messages(texts[i:i + LINE_MAX_MESSAGES]),
+        }
+        ok = _post_line(PUSH_ENDPOINT, payload, "Push") and ok
+    return ok
+
+def start_loading(user_id: str, seconds: int = LOADING_SECONDS) -> bool:
+    """顯示「輸入中」動畫 (只有一對一聊天有效)，送出下一則訊息時自動消失"""
+    payload = {"chatId": user_id, "loadingSeconds": seconds}
+    return _post_line(LOADING_ENDPOINT, payload, "Loading")
+
+def _post_line(endpoint: str, payload: dict, label: str) -> bool:
     try:
-        with urllib.request.urlopen(req, timeout=10) as resp:
-            _ = resp.read()
+        # 共用連線池：暖機時沿用到 api.line.me 的 keep-alive 連線
+        with metrics.timer(f"line.{label.lower()}"):
+            resp = http_client.post_json(
+                endpoint,
+                payload,
+                headers={"Authorization": f"Bearer {ACCESS_TOKEN}"},
+                timeout=10,
+            )
+        # loading/start 回 202，其餘回 200
+        if not 200 <= resp.status < 300:
+            print(f"{label} error:", resp.status, resp.text)
+            return False
+        return True
     except Exception as e:
-        print("Reply error:", str(e))
-        xray_recorder.current_subsegment().add_exception(e)
+        print(f"{label} error:", str(e))
+        xray_add_exception(e)
+        return False
+
+def send_line(e: dict, text: str):
+    """優先用 replyToken 回覆 (免費)；token 已過期或回覆失敗時改用 push"""
+    texts = split_message(text) or [EMPTY_ANSWER]
+    reply_token = e.get("replyToken")
+    user_id = (e.get("source") or {}).get("userId")
+    age = time.time() - e.get("timestamp", time.time() * 1000) / 1000
+    if reply_token and age < REPLY_TOKEN_TTL and reply_line(reply_token, texts):
+        # 一次 reply 最多 5 則，剩下的用 push 補上
+        if user_id and len(texts) > LINE_MAX_MESSAGES:
+            push_line(user_id, texts[LINE_MAX_MESSAGES:])
+        return
+    if user_id:
+        push_line(user_id, texts)
+
+def _take_ready(text: str, final: bool = False):
+    """切出可以先送的部分：到最後一個段落 / 句尾為止；回傳 (要送的, 留著的)"""
+    if final:
+        return text, ""
+    cut = _boundary(text, LINE_MAX_CHARS)
+    if cut == 0 and len(text) >= LINE_MAX_CHARS:
+        cut = LINE_MAX_CHARS
+    return text[:cut], text[cut:]
+
+@xray_capture('stream_agent_response')
+def stream_agent_response(e: dict, user_text: str, user_id: str):
+    """串流模式：第一段用 reply 盡快送出，其餘依段落 / 句子切開後用 push 送"""
+    start_loading(user_id)
+    started = time.monotonic()
+    pending = []       # 還沒送出的片段
+    pending_chars = 0
+    answer = []        # 完整回答 (給回答快取用)
+    sent_first = False
+
+    def flush(final=False):
+        nonlocal pending, pending_chars, sent_first
+        ready, rest = _take_ready("".join(pending), final)
+        pending, pending_chars = ([rest], len(rest)) if rest else ([], 0)
+        if not ready.strip():
+            return
+        if sent_first:
+            push_line(user_id, split_message(ready))
+        else:
+            send_line(e, ready)
+            sent_first = True
+
+    try:
+        for piece in iter_agent_chunks(user_text, user_id, AGENT_STREAM_FINAL_RESPONSE):
+            pending.append(piece)
+            answer.append(piece)
+            pending_chars += len(piece)
+            if sent_first:
+                if pending_chars >= STREAM_CHUNK_CHARS:
+                    flush()
+            elif pending_chars >= STREAM_FIRST_CHARS or time.monotonic() - started >= STREAM_FIRST_SECONDS:
+                flush()
+        flush(final=True)
+        if not sent_first:
+            send_line(e, EMPTY_ANSWER)
+        return "".join(answer)
+    except Exception as ex:
+        print(f"Agent Error: {str(ex)}")
+        xray_add_exception(ex)
+        # 已經送出的部分保留；沒送出的告知使用者稍後再試
+        if sent_first:
+            push_line(user_id, BUSY_REPLY)
+        else:
+            send_line(e, BUSY_REPLY)
+        return None
+
 
+DEFAULT_REPLY = "收到了！但我不太確定您的意思。如果是要規劃行程，請依照格式輸入：\n地區：\n天數：\n人數："
 
-SKIP_KEYWORDS = ["行程規劃使用規則", "PDF使用規則", "地點詳情查詢規則"]
+# 固定回覆：圖文選單的按鈕文字，直接回覆不呼叫 Agent
+FAST_REPLIES = {
+    "行程規劃使用規則": "請依照格式輸入：\n地區：\n天數：\n人數：\n旅遊風格：\n美食與購物偏好：\n預算範圍\n出發日期\n旅行風格請依照(1)傳統文化（寺廟、神社）(2)現代都市（逛街、美食）(3)自然風景(4)混合型\n美食與購物偏好請依照(1)高級餐廳/米其林(2)大眾美食/街頭小食(3)逛百貨/購物商圈(4)夜生活/酒吧\n以上兩項填數字就行",
+    "PDF使用規則": DEFAULT_REPLY,
+    "地點詳情查詢規則": "請輸入 「地點 + 詳細資訊」\n例如：台北車站 詳細資訊\n（請勿只輸入地點）",
+}
+# 固定回覆 → 回答快取 → Agent
+answers = answer_cache.build_answer_cache(FAST_REPLIES)
 
 # ==========================================
-# 4. 主程式 Lambda Handler
+# 4. 處理事件 (同步模式在 handler 內處理；非同步模式由 worker 處理)
 # ==========================================
+def handle_event(e: dict, deadline: float = None):
+    if not (e.get("type") == "message" and (e.get("message") or {}).get("type") == "text"):
+        return
+
+    reply_token = e.get("replyToken")
+    user_text = e["message"]["text"]
+    user_id = e["source"].get("userId", "default-user")
+
+    fast = answers.fast_reply(user_text)
+    if fast is not None:
+        send_line(e, fast)
+        return
+    if not reply_token:
+        return
+
+    cached = answers.get(user_text)
+    if cached is not None:
+        send_line(e, cached)
+        return
+
+    if deadline is not None and time.monotonic() > deadline:
+        # 時間不夠跑 Agent 了，至少讓使用者知道要重問
+        send_line(e, BUSY_REPLY)
+        return
+
+    status, ai_response = admission_control.run(
+        _event_owner(e), lambda: _answer_with_agent(e, user_text, user_id), deadline)
+    if status == admission.THROTTLED:
+        send_line(e, THROTTLED_REPLY)
+    elif status == admission.REJECTED:
+        send_line(e, BUSY_REPLY)
+
+    # 失敗或空白的回答不快取
+    if ai_response and ai_response not in (BUSY_REPLY, EMPTY_ANSWER):
+        answers.set(user_text, ai_response)
+
+def _answer_with_agent(e: dict, user_text: str, user_id: str):
+    if STREAMING_MODE and e["source"].get("userId"):
+        return stream_agent_response(e, user_text, user_id)
+    # 這裡會進入 get_agent_response 的 X-Ray 區塊
+    ai_response = get_agent_response(user_text, user_id)
+    send_line(e, ai_response)
+    return ai_response
+
+def _event_owner(e: dict) -> str:
+    source = e.get("source") or {}
+    return source.get("userId") or source.get("groupId") or source.get("roomId") or "default-user"
+
+def _is_malformed(e: dict) -> bool:
+    """handle_event 需要的欄位缺了或型別不對 (文字訊息的 text、source)"""
+    message = e.get("message")
+    if e.get("type") != "message" or not isinstance(message, dict) or message.get("type") != "text":
+        return False
+    return not isinstance(message.get("text"), str) or not isinstance(e.get("source"), dict)
+
+def _merge_key(e: dict):
+    """同一位使用者同一批裡重複的文字訊息只處理一次；其他事件不合併"""
+    message = e.get("message") or {}
+    if e.get("type") == "message" and message.get("type") == "text":
+        return answer_cache.normalize_message(message.get("text"))
+    return None
+
+def _handle_in_order(user_events: list, deadline: float = None):
+    failed = []
+    for e in user_events:
+        try:
+            handle_event(e, deadline)
+        except Exception as ex:
+            # 單一事件失敗不影響同一批的其他事件
+            print(f"Event Error: {str(ex)}")
+            failed.append(e)
+    return failed
+
+def process_events(events: list, context=None):
+    """依 userId 分組：不同使用者並行，同一使用者維持原本順序 (同一批重複的同一句話只處理一次)，回傳處理失敗的事件"""
+    groups = {}
+    for e in events:
+        groups.setdefault(_event_owner(e), []).append(e)
+    if not groups:
+        return []
+    groups = {owner: admission_control.merge(user_events, _merge_key) for owner, user_events in groups.items()}
+
+    deadline = None
+    if context is not None and hasattr(context, "get_remaining_time_in_millis"):
+        deadline = time.monotonic() + context.get_remaining_time_in_millis() / 1000 - TIME_MARGIN
+
+    if len(groups) == 1:
+        return _handle_in_order(next(iter(groups.values())), deadline)
+
+    with ThreadPoolExecutor(max_workers=min(MAX_CONCURRENCY, len(groups))) as executor:
+        results = executor.map(lambda user_events: _handle_in_order(user_events, deadline), groups.values())
+        return [e for failed in results for e in failed]
+
+# ==========================================
+# 5. 主程式 Lambda Handler
+# ==========================================
+@metrics.instrument("linebot")
 def lambda_handler(event, context):
     body_str = event.get("body") or ""
     is_b64 = bool(event.get("isBase64Encoded"))
@@ -131,33 +424,71 @@ def lambda_handler(event, context):
     signature = _get_header(headers, "x-line-signature")
 
     # 驗證訊息是否真的從 LINE 送來
-    if not verify_line_signature(raw_body_bytes, signature):
+    with metrics.timer("verify_signature"):
+        verified = verify_line_signature(raw_body_bytes, signature)
+    if not verified:
         return {"statusCode": 401, "body": "Invalid signature"}
 
-    payload = json.loads(raw_body_bytes.decode("utf-8"))
-    events = payload.get("events", [])
-    
-    reply = "收到了！但我不太確定您的意思。如果是要規劃行程，請依照格式輸入：\n地區：\n天數：\n人數："
-    
-    for e in events:
-        if e.get("type") == "message" and (e.get("message") or {}).get("type") == "text":
-            reply_token = e.get("replyToken")
-            user_text = e["message"]["text"]
-            user_id = e["source"].get("userId", "default-user")
-            
-            if user_text in SKIP_KEYWORDS:
-                if user_text == "行程規劃使用規則":
-                    reply = "請依照格式輸入：\n地區：\n天數：\n人數：\n旅遊風格：\n美食與購物偏好：\n預算範圍\n出發日期\n旅行風格請依照(1)傳統文化（寺廟、神社）(2)現代都市（逛街、美食）(3)自然風景(4)混合型\n美食與購物偏好請依照(1)高級餐廳/米其林(2)大眾美食/街頭小食(3)逛百貨/購物商圈(4)夜生活/酒吧\n以上兩項填數字就行"
-                elif user_text == "為您生成PDF中請稍等":
-                    user_text == "生成PDF"
-                    reply = get_agent_response(user_text, user_id)
-                elif user_text == "地點詳情查詢規則":
-                    reply = "請輸入 「地點 + 詳細資訊」\n例如：台北車站 詳細資訊\n（請勿只輸入地點）"
-                return reply_line(reply_token, reply)
-
-            elif reply_token:
-                # 這裡會進入 get_agent_response 的 X-Ray 區塊
-                ai_response = get_agent_response(user_text, user_id)
-                reply_line(reply_token, ai_response)
-
-    return {"statusCode": 200, "body": "OK"}
\ No newline at end of file
+    with metrics.timer("parse_json"):
+        payload = json.loads(raw_body_bytes.decode("utf-8"))
+    # 先去重再做任何事 (放進佇列或呼叫 Agent)
+    events = dedup.filter(payload.get("events", []))
+
+    if ASYNC_MODE:
+        # 只放進佇列就回 200，LINE 不會因為等 Agent 而逾時重送
+        if events:
+            try:
+                queue.put({"events": events})
+            except Exception as ex:
+                # 沒放進佇列就釋放認領並回 500，讓 LINE 重送時能再處理
+                print(f"Queue Error: {str(ex)}")
+                dedup.release(events)
+                return {"statusCode": 500, "body": "Queue unavailable"}
+            dedup.complete(events)
+        return {"statusCode": 200, "body": "OK"}
+
+    failed = process_events(events, context)
+    # 格式不對的事件重送也一樣會失敗，當作處理完；認領跨容器共用時才要 LINE 重送，
+    # 否則重送到別的容器會把成功的事件再跑一次、重複回覆
+    retry = [e for e in failed if not _is_malformed(e)] if dedup.durable else []
+    retry_ids = {id(e) for e in retry}
+    dedup.release(retry)
+    dedup.complete([e for e in events if id(e) not in retry_ids])
+    print(f"Answer cache stats: {json.dumps(answers.stats())}")
+    print(f"Dedup stats: {json.dumps(dedup.stats())}")
+    print(f"Admission stats: {json.dumps(admission_control.stats())}")
+    if retry:
+        return {"statusCode": 500, "body": "Some events failed"}
+    return {"statusCode": 200, "body": "OK"}
+
+# ==========================================
+# 6. Worker：由 SQS 觸發 (或手動呼叫時清空本機佇列)
+# ==========================================
+@metrics.instrument("linebot-worker")
+def worker_handler(event, context):
+    records = (event or {}).get("Records")
+    if not records:
+        # 手動補跑本機佇列：失敗的事件只記 log，沒有地方可以重排
+        messages = queue.drain()
+        failed = [e for message in messages for e in process_events(message.get("events", []), context)]
+        _print_worker_stats()
+        return {"processed": len(messages), "failed": len(failed)}
+
+    # SQS 觸發：有事件失敗的訊息回報在 batchItemFailures，SQS 只會重送那幾筆 (需開啟 ReportBatchItemFailures)
+    failures = []
+    for r in records:
+        try:
+            message = json.loads(r["body"])
+        except ValueError as ex:
+            # 壞掉的訊息重送也一樣壞，直接丟掉
+            print(f"Worker Error: {str(ex)}")
+            continue
+        failed = process_events(message.get("events", []), context)
+        if any(not _is_malformed(e) for e in failed):
+            failures.append({"itemIdentifier": r["messageId"]})
+    _print_worker_stats()
+    return {"batchItemFailures": failures}
+
+def _print_worker_stats():
+    print(f"Answer cache stats: {json.dumps(answers.stats())}")
+    print(f"Admission stats: {json.dumps(admission_control.stats())}")
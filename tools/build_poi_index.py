@@ -0,0 +1,122 @@
+"""由快取下來的 Google Places 回應重建 api/poi_index.bin
+
+來源可以是：
+- JSON / JSONL 檔：每筆是 Google 的 textsearch 或 place details 回應，
+  或是 API 快取表 (API_CACHE_TABLE) 匯出的項目 ({"cacheKey": ..., "value": "<回應 JSON>"})
+- --table：直接掃描 DynamoDB 的 API 快取表
+
+用法：
+    python tools/build_poi_index.py --responses dump.jsonl --aliases aliases.json --out api/poi_index.bin
+    python tools/build_poi_index.py --table ApiResponseCache --limit 5000
+
+aliases.json 格式：{"<place_id>": ["東京站", "Tokyo Station", ...]}
+"""
+import os
+import sys
+import json
+import argparse
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "api"))
+
+import poi_index  # noqa: E402
+
+
+def iter_documents(path):
+    with open(path, encoding="utf-8") as f:
+        text = f.read().strip()
+    if not text:
+        return
+    if text.startswith("["):
+        yield from json.loads(text)
+        return
+    try:
+        yield json.loads(text)
+    except ValueError:
+        for line in text.splitlines():
+            if line.strip():
+                yield json.loads(line)
+
+
+def iter_table(table_name, region_name):
+    import boto3
+    table = boto3.resource("dynamodb", region_name=region_name).Table(table_name)
+    kwargs = {}
+    while True:
+        page = table.scan(**kwargs)
+        yield from page.get("Items", [])
+        if "LastEvaluatedKey" not in page:
+            break
+        kwargs["ExclusiveStartKey"] = page["LastEvaluatedKey"]
+
+
+def extract_places(doc):
+    """從一份回應取出地點資料 (place details 的 result，或 textsearch 的 results)"""
+    if isinstance(doc, dict) and isinstance(doc.get("value"), str):
+        doc = json.loads(doc["value"])
+    if not isinstance(doc, dict):
+        return
+    candidates = []
+    if isinstance(doc.get("result"), dict):
+        candidates.append((doc["result"], True))
+    for r in doc.get("results") or []:
+        candidates.append((r, False))
+    for r, detailed in candidates:
+        if not r.get("place_id") or not r.get("name"):
+            continue
+        yield {
+            "place_id": r["place_id"],
+            "name": r["name"],
+            "address": r.get("formatted_address"),
+            "rating": r.get("rating"),
+            "url": r.get("url"),
+            "phone": r.get("formatted_phone_number"),
+            "popularity": r.get("user_ratings_total") or 0,
+        }, detailed
+
+
+def merge(places, place, detailed):
+    current = places.get(place["place_id"])
+    if current is None:
+        places[place["place_id"]] = place
+        return
+    # details 的欄位比 textsearch 完整，以 details 為準；其餘欄位補空缺
+    for key, value in place.items():
+        if value and (detailed or not current.get(key)):
+            current[key] = value
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--responses", nargs="*", default=[], help="JSON / JSONL 回應檔")
+    parser.add_argument("--table", help="API 快取的 DynamoDB 表名")
+    parser.add_argument("--region", default="ap-northeast-1")
+    parser.add_argument("--aliases", help="別名 JSON 檔")
+    parser.add_argument("--limit", type=int, default=5000, help="最多收錄幾個地點 (依評論數排序)")
+    parser.add_argument("--out", default=os.path.join(ROOT, "api", "poi_index.bin"))
+    args = parser.parse_args()
+
+    places = {}
+    sources = [doc for path in args.responses for doc in iter_documents(path)]
+    if args.table:
+        sources += list(iter_table(args.table, args.region))
+    for doc in sources:
+        for place, detailed in extract_places(doc):
+            merge(places, place, detailed)
+
+    ranked = sorted(places.values(), key=lambda p: (-p["popularity"], p["name"]))[:args.limit]
+    records = [{k: v for k, v in p.items() if k != "popularity" and v is not None} for p in ranked]
+
+    aliases = {}
+    if args.aliases:
+        with open(args.aliases, encoding="utf-8") as f:
+            aliases = json.load(f)
+
+    data = poi_index.build_index(records, aliases)
+    with open(args.out, "wb") as f:
+        f.write(data)
+    print(f"{len(records)} places, {len(data) / 1024:.1f} KiB → {args.out}")
+
+
+if __name__ == "__main__":
+    main()
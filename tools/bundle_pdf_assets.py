@@ -0,0 +1,148 @@
+"""把 PDF 模板用到的外部資源打包成本機檔案，轉檔時完全不需要連網
+
+1. Font Awesome：只保留 template.html 用到的圖示，字型子集化後以 data URI 內嵌，
+   產生 PDF/assets/font-awesome.css (模板以 {% include %} 放進 <style>)
+2. NotoSansTC：子集化成行程會用到的字 (英數、標點、全形符號、日文假名、CJK 基本區
+   以及 --charset-file 內出現的字)，輸出給 PDF Layer 使用 (PDF_FONT_PATH)
+
+來源檔案需要先下載 Font Awesome 4.7.0 (css/font-awesome.css、fonts/fontawesome-webfont.ttf) 與 NotoSansTC-Regular.ttf。
+需要安裝 fonttools (只有打包時需要，Lambda 執行時不用)。
+
+用法：
+    python tools/bundle_pdf_assets.py --fa-css font-awesome.css --fa-font fontawesome-webfont.ttf
+    python tools/bundle_pdf_assets.py --noto NotoSansTC-Regular.ttf --noto-out build/NotoSansTC-Regular.ttf \\
+        --charset-file itineraries.txt
+"""
+import os
+import re
+import io
+import sys
+import base64
+import argparse
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+TEMPLATE_PATH = os.path.join(ROOT, "PDF", "template.html")
+FA_CSS_OUT = os.path.join(ROOT, "PDF", "assets", "font-awesome.css")
+
+# Font Awesome 4.7.0 的 .fa 基本樣式
+FA_BASE_RULE = (".fa{display:inline-block;font:normal normal normal 14px/1 FontAwesome;font-size:inherit;"
+                "text-rendering:auto;-webkit-font-smoothing:antialiased;-moz-osx-font-smoothing:grayscale}")
+
+# 行程內容會出現的字元範圍 (NotoSansTC 裡其餘的字 — 擴充區、韓文等 — 不打包)
+NOTO_RANGES = [
+    (0x0020, 0x007E),  # 英數與半形標點
+    (0x00A0, 0x00FF),  # Latin-1 (°、×、é …)
+    (0x2000, 0x206F),  # 一般標點 (—、…、‧)
+    (0x20A0, 0x20CF),  # 貨幣符號
+    (0x2100, 0x218F),  # 字母式符號、數字形式 (℃、Ⅰ)
+    (0x2190, 0x21FF),  # 箭頭
+    (0x2460, 0x24FF),  # 圈號數字
+    (0x25A0, 0x25FF),  # 幾何圖形 (●、○、■)
+    (0x3000, 0x303F),  # CJK 標點 (，。「」)
+    (0x3040, 0x30FF),  # 日文平假名、片假名 (日本地名、店名)
+    (0x3100, 0x312F),  # 注音
+    (0x4E00, 0x9FFF),  # CJK 基本區
+    (0xFF00, 0xFFEF),  # 全形英數與標點
+]
+
+_ICON_CLASS = re.compile(r"\bfa-([a-z0-9-]+)")
+_CSS_RULE = re.compile(r"([^{}]+)\{\s*content:\s*\"([^\"]+)\"\s*;?\s*\}")
+
+
+def used_icons(template_text):
+    return sorted(set(_ICON_CLASS.findall(template_text)))
+
+
+def icon_codepoints(css_text):
+    """Font Awesome CSS 內的 .fa-xxx:before{content:"\\f073"} → {"xxx": 0xf073}；也接受直接寫字元的版本"""
+    mapping = {}
+    for selectors, content in _CSS_RULE.findall(css_text):
+        codepoint = int(content[1:], 16) if content.startswith("\\") else ord(content[0])
+        for selector in selectors.split(","):
+            match = re.fullmatch(r"\s*\.fa-([a-z0-9-]+):{1,2}before\s*", selector)
+            if match:
+                mapping[match.group(1)] = codepoint
+    return mapping
+
+
+def subset_font(path, codepoints):
+    from fontTools import subset
+    options = subset.Options()
+    options.hinting = False          # PDF 裡用不到 TrueType hinting
+    options.layout_features = ["*"]  # 保留標點擠壓等排版功能
+    options.notdef_outline = True
+    options.name_IDs = ["*"]
+    font = subset.load_font(path, options)
+    subsetter = subset.Subsetter(options)
+    subsetter.populate(unicodes=codepoints)
+    subsetter.subset(font)
+    out = io.BytesIO()
+    subset.save_font(font, out, options)
+    return out.getvalue()
+
+
+def bundle_font_awesome(css_path, font_path, template_path=TEMPLATE_PATH, out_path=FA_CSS_OUT):
+    with open(template_path, encoding="utf-8") as f:
+        icons = used_icons(f.read())
+    with open(css_path, encoding="utf-8") as f:
+        mapping = icon_codepoints(f.read())
+    missing = [name for name in icons if name not in mapping]
+    if missing:
+        sys.exit(f"Font Awesome CSS 內找不到圖示：{', '.join(missing)}")
+
+    font = subset_font(font_path, [mapping[name] for name in icons])
+    data = base64.b64encode(font).decode("ascii")
+    lines = [
+        "/* 由 tools/bundle_pdf_assets.py 產生，請勿手動修改。",
+        "   Font Awesome 4.7.0 by Dave Gandy (fontawesome.io)，字型 SIL OFL 1.1、CSS MIT 授權 */",
+        "@font-face{font-family:'FontAwesome';"
+        f"src:url(data:font/truetype;charset=utf-8;base64,{data}) format('truetype');"
+        "font-weight:normal;font-style:normal}",
+        FA_BASE_RULE,
+    ]
+    lines += [f'.fa-{name}:before{{content:"\\{mapping[name]:x}"}}' for name in icons]
+    os.makedirs(os.path.dirname(out_path), exist_ok=True)
+    with open(out_path, "w", encoding="utf-8", newline="\n") as f:
+        f.write("\n".join(lines) + "\n")
+    print(f"Font Awesome：{len(icons)} 個圖示 ({', '.join(icons)})，"
+          f"字型 {os.path.getsize(font_path) / 1024:.1f} KB → {len(font) / 1024:.1f} KB，輸出 {out_path}")
+
+
+def noto_codepoints(charset_files, template_path=TEMPLATE_PATH):
+    codepoints = set()
+    for low, high in NOTO_RANGES:
+        codepoints.update(range(low, high + 1))
+    for path in [template_path] + list(charset_files):
+        with open(path, encoding="utf-8") as f:
+            codepoints.update(ord(c) for c in f.read() if not c.isspace())
+    return sorted(codepoints)
+
+
+def bundle_noto(font_path, out_path, charset_files):
+    font = subset_font(font_path, noto_codepoints(charset_files))
+    os.makedirs(os.path.dirname(os.path.abspath(out_path)), exist_ok=True)
+    with open(out_path, "wb") as f:
+        f.write(font)
+    print(f"NotoSansTC：{os.path.getsize(font_path) / 1024 / 1024:.2f} MB → {len(font) / 1024 / 1024:.2f} MB，輸出 {out_path}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--fa-css", help="Font Awesome 4.7.0 的 font-awesome.css")
+    parser.add_argument("--fa-font", help="Font Awesome 4.7.0 的 fontawesome-webfont.ttf")
+    parser.add_argument("--noto", help="原始的 NotoSansTC-Regular.ttf")
+    parser.add_argument("--noto-out", default="build/NotoSansTC-Regular.ttf", help="子集化後的字型 (放進 PDF Layer)")
+    parser.add_argument("--charset-file", action="append", default=[],
+                        help="額外要保留的字 (例如匯出的行程文字)，可指定多次")
+    args = parser.parse_args()
+
+    if not (args.fa_css and args.fa_font) and not args.noto:
+        parser.error("至少要指定 --fa-css/--fa-font 或 --noto")
+    if args.fa_css and args.fa_font:
+        bundle_font_awesome(args.fa_css, args.fa_font)
+    if args.noto:
+        bundle_noto(args.noto, args.noto_out, args.charset_file)
+
+
+if __name__ == "__main__":
+    main()
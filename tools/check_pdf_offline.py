@@ -0,0 +1,56 @@
+"""檢查 PDF 模板轉檔時不會連網：渲染範例行程，HTML 內引用了任何遠端網址 (src / href / url() / @import) 就失敗
+
+部署前執行 (需要安裝 jinja2)；結束代碼 1 表示有遠端資源，請用 tools/bundle_pdf_assets.py 打包成本機檔案。
+
+用法：python tools/check_pdf_offline.py
+"""
+import os
+import sys
+import importlib.util
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PDF_DIR = os.path.join(ROOT, "PDF")
+sys.path.insert(0, os.path.join(ROOT, "layer", "python"))
+sys.path.insert(0, PDF_DIR)
+
+import renderers  # noqa: E402
+
+SAMPLES = [
+    {},
+    {
+        "title": "京都 2 日遊", "style": "文青型",
+        "days": [{"day_number": d, "date": f"2026-04-0{d}",
+                  "activities": [{"time": "09:00", "location": "清水寺", "description": "早點到避開人潮。"},
+                                 {"time": "13:00", "location": "錦市場", "description": "午餐邊走邊吃。"}]}
+                 for d in (1, 2)],
+        "transportation": ["京都市營巴士一日券"],
+        "budget_info": ["住宿：每晚約 NT$3,800"],
+        "reminders": ["部分寺院禁止攝影"],
+    },
+]
+
+
+def load_pdf_lambda():
+    spec = importlib.util.spec_from_file_location("pdf_lambda_function", os.path.join(PDF_DIR, "lambda_function.py"))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def main():
+    pdf = load_pdf_lambda()
+    template = pdf.load_template()
+    found = set()
+    for data in SAMPLES:
+        found.update(renderers.find_remote_urls(template.render(**pdf.render_context(data))))
+
+    if found:
+        print("PDF 模板引用了遠端資源，轉檔時會連網：")
+        for url in sorted(found):
+            print(f"  {url}")
+        sys.exit(1)
+    print(f"OK：{len(SAMPLES)} 份範例行程的 HTML 都沒有引用遠端資源")
+
+
+if __name__ == "__main__":
+    main()